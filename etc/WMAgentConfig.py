@@ -87,6 +87,9 @@ config.General.workDir = workDirectory
 config.section_("JobStateMachine")
 config.JobStateMachine.couchurl = couchURL
 config.JobStateMachine.couchDBName = jobDumpDBName
+config.JobStateMachine.couchBulkTransitions = True
+config.JobStateMachine.couchBulkChunkSize = 1000
+config.JobStateMachine.couchWriteBehind = False
 
 config.section_("ACDC")
 config.ACDC.couchurl = couchURL
@@ -172,6 +175,8 @@ config.JobCreator.pollInterval = 120
 # disk, and should probably NOT be run on the same disk as the JobArchiver
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
+# With more than one worker thread the job pickles are written in parallel
+# by a pool of that many processes
 config.JobCreator.workerThreads = 1
 
 config.component_("JobSubmitter")
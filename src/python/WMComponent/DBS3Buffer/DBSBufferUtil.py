@@ -282,7 +282,9 @@ class DBSBufferUtil(WMConnectionBase):
         _findUploadableDAS_
 
         Find all the Dataset-Algo files available
-        with uploadable files.
+        with uploadable files.  das can also be a list of
+        Dataset-Algo IDs, every file carries the ID of its
+        Dataset-Algo in the 'das' key.
         """
 
         myThread = threading.currentThread()
@@ -3,18 +3,20 @@
 """
 The DBSUpload algorithm
 
-This code, all of which is in uploadDatasets works in three parts.
-Each part is carried out in its own database transaction.
+This code works as a pipeline of three stages.
+Each database step is carried out in its own transaction.
 
 1) Find all files that have not yet been uploaded to DBS,
-   and the fileset-algo pairs that go along with them.
-2) Upload these files.  This is handled through DBSInterface
-   which first sends the algo, then the dataset, and then
-   commits all of the files.  It also handles migrating to
-   global is you specify a global URL and the file blocks are
-   full (have reached the limit in the DBS config)
-3) The code cleans up at the end, check for any open blocks
-   that have exceeded their timeout.
+   and the fileset-algo pairs that go along with them.  The
+   files are loaded in bulk for several fileset-algo pairs
+   at a time.
+2) Sort the files into blocks, closing the blocks that are
+   full.  Closed blocks are written to DBSBuffer and handed to
+   the upload processes while the next files are loaded.
+3) Upload the blocks with a bounded number of blocks in flight,
+   retrying the ones that fail, and mark the uploaded blocks
+   in DBSBuffer in batches as they complete.  At the end check
+   for any open blocks that have exceeded their timeout.
 
 
 NOTE: This is complicated as hell, because you can have a
@@ -35,6 +37,7 @@ import multiprocessing
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.Services.UUID                  import makeUUID
 from WMCore.WMException                    import WMException
+from WMCore.Algorithms.BlockAssembler      import BlockAssembler
 
 
 from WMComponent.DBS3Buffer.DBSBufferUtil  import DBSBufferUtil
@@ -199,9 +202,21 @@ class DBSUploadPoller(BaseWorkerThread):
         self.wait   = getattr(self.config.DBSUpload, 'dbsWaitTime', 0.1)
         self.physicsGroup = getattr(self.config.DBSUpload, 'physicsGroup', 'DBS3Test')
 
+        # Pipeline settings
+        self.dasBatchSize   = getattr(self.config.DBSUpload, 'dasBatchSize', 50)
+        self.maxInFlight    = getattr(self.config.DBSUpload, 'maxInFlightBlocks', 2 * self.nProc)
+        self.uploadRetries  = getattr(self.config.DBSUpload, 'uploadRetries', 3)
+        self.uploadTimeout  = getattr(self.config.DBSUpload, 'uploadTimeout', 600)
+        self.statusBatch    = getattr(self.config.DBSUpload, 'statusBatchSize', 50)
+
         # List of blocks currently in processing
         self.queuedBlocks = []
 
+        # Blocks in DBSBuffer waiting for a free upload slot
+        # and the number of times each block failed this cycle
+        self.blocksToQueue = []
+        self.blockRetries  = {}
+
         # Starting up the pool:
         for x in range(self.nProc):
             p = multiprocessing.Process(target = uploadWorker,
@@ -212,7 +227,11 @@ class DBSUploadPoller(BaseWorkerThread):
 
         # Setting up any cache objects
         self.blockCache = {}
-        self.dasCache   = {}
+        self.dasInfo    = {}
+        self.assembler  = BlockAssembler(newBlock = self.createBlock,
+                                         maxFiles = self.maxBlockFiles,
+                                         maxSize = self.maxBlockSize,
+                                         maxTime = self.maxBlockTime)
 
         self.filesToUpdate = []
 
@@ -277,19 +296,23 @@ class DBSUploadPoller(BaseWorkerThread):
         _algorithm_
 
         First, load blocks
-        Then, load files
-        Then, move files into blocks
+        Then, load files and move them into blocks
         Then add new blocks in DBSBuffer
         Then add blocks to DBS
         Then mark blocks as done in DBSBuffer
+
+        Blocks are uploaded while files are still being loaded,
+        at the end we wait for all the queued blocks to finish.
+        The files loaded and the blocks closed are reported as work.
         """
 
         try:
+            self.blockRetries = {}
             self.loadBlocks()
             self.loadFiles()
             self.checkTimeout()
             self.inputBlocks()
-            self.retrieveBlocks()
+            self.retrieveBlocks(drain = True)
         except WMException:
             raise
         except Exception, ex:
@@ -356,8 +379,7 @@ class DBSUploadPoller(BaseWorkerThread):
 
         # All blocks should now be loaded and present
         # in both the block cache (which has all the info)
-        # and the dasCache (which is a list of name pointers
-        # to the keys in the block cache).           
+        # and the assembler (which indexes the open blocks).
 
         return
 
@@ -368,8 +390,10 @@ class DBSUploadPoller(BaseWorkerThread):
 
         Load all files that need to be loaded.
 
-        I will do this by DAS for now to break
-        the monstrous calls down into smaller chunks.
+        Files are loaded in bulk for dasBatchSize Dataset-Algo
+        combinations at a time to break the monstrous calls down
+        into smaller chunks.  The blocks closed by each chunk are
+        handed to the uploaders before the next chunk is loaded.
         """
 
 
@@ -378,185 +402,126 @@ class DBSUploadPoller(BaseWorkerThread):
 
         if len(dasList) < 1:
             # Then there's nothing to do
+            self.reportWork(0)
             return []
 
-        readyBlocks = []
-        for dasInfo in dasList:
+        for i in range(0, len(dasList), self.dasBatchSize):
+            dasBatch = dasList[i:i + self.dasBatchSize]
+            dasIDs   = [x['DAS_ID'] for x in dasBatch]
 
-            dasID = dasInfo['DAS_ID']
-            
             # Get the files
             try:
-                loadedFiles = self.dbsUtil.findUploadableFilesByDAS(das = dasID)
+                loadedFiles = self.dbsUtil.findUploadableFilesByDAS(das = dasIDs)
             except WMException:
                 raise
             except Exception, ex:
                 msg =  "Unhandled exception while loading uploadable files for DAS.\n"
                 msg += str(ex)
                 logging.error(msg)
-                logging.debug("DAS being loaded: %s\n" % dasID)
+                logging.debug("DAS being loaded: %s\n" % dasIDs)
                 raise DBSUploadException(msg)
 
-            # Get the blocks
-            if not dasID in self.dasCache.keys():
-                # Then we have a new DAS
-                # Add it
-                self.dasCache[dasID] = {}
-            dasBlocks = self.dasCache.get(dasID)
-
-            # Sort the files and blocks by location
-            fileDict = sortListByKey(input = loadedFiles, key = 'locations')
-
-            # Now we have both files and blocks
-            # We need a sorting algorithm of sorts...
-
-            
-
-            # Now add each file
-            for location in fileDict.keys():
-                files = fileDict.get(location)
-
-                if len(files) < 1:
-                    # Nothing to do here
-                    continue
-                
-                dasBlocks = self.dasCache[dasID].get(location, [])
-                if len(dasBlocks) > 0:
-                    # Load from cache
-                    currentBlock = self.blockCache.get(dasBlocks[0])
-                else:
-                    blockname = '%s#%s' % (files[0]['datasetPath'], makeUUID())
-                    currentBlock = DBSBlock(name = blockname,
-                                            location = location, das = dasID)
-                    # Add the era info
-                    currentBlock.setAcquisitionEra(era = dasInfo['AcquisitionEra'])
-                    currentBlock.setProcessingVer(era = dasInfo['ProcessingVer'])
-                    self.addNewBlock(block = currentBlock)
-                    dasBlocks.append(currentBlock.getName())
-
-                for newFile in files:
-                    if not newFile.get('block', 1) == None:
-                        # Then this file already has a block
-                        # It should be accounted for somewhere
-                        # Or loaded with the block
-                        continue
-                    
-                    # Check if we can put files in this block
-                    if not self.isBlockOpen(newFile = newFile,
-                                            block = currentBlock):
-                        # Then we have to close the block and get a new one
-                        currentBlock.status = 'Pending'
-                        readyBlocks.append(currentBlock)
-                        dasBlocks.remove(currentBlock.getName())
-                        currentBlock = self.getBlock(newFile = newFile,
-                                                     dasBlocks = dasBlocks,
-                                                     location = location,
-                                                     das = dasID)
-                        currentBlock.setAcquisitionEra(era = dasInfo['AcquisitionEra'])
-                        currentBlock.setProcessingVer(era = dasInfo['ProcessingVer'])
-
-                    # Now deal with the file
-                    currentBlock.addFile(dbsFile = newFile)
-                    self.filesToUpdate.append({'filelfn': newFile['lfn'],
-                                               'block': currentBlock.getName()})
-                # Done with the location
-                readyBlocks.append(currentBlock)
-
-            # Should be done with the DAS once we've added all files
-
-        # Update the blockCache with what is now ready.
-        for block in readyBlocks:
-            self.blockCache[block.getName()] = block
-                
+            self.reportWork(len(loadedFiles))
+            filesByDAS = sortListByKey(input = loadedFiles, key = 'das')
+            for dasInfo in dasBatch:
+                self.assembleBlocks(dasInfo = dasInfo,
+                                    loadedFiles = filesByDAS.get(dasInfo['DAS_ID'], []))
+
+            # Start uploading what is ready while we load the next chunk
+            self.inputBlocks()
+            self.retrieveBlocks()
+
         return
 
 
-    def checkTimeout(self):
+    def assembleBlocks(self, dasInfo, loadedFiles):
         """
-        Check all blocks for a timeout
+        _assembleBlocks_
 
+        Sort the files of a Dataset-Algo combination into blocks,
+        closing the blocks that are full.
         """
-        for block in self.blockCache.values():
-            if block.status == 'Open' and block.getTime() > self.maxBlockTime:
-                block.status = 'Pending'
-                self.blockCache[block.getName()] = block
+        dasID = dasInfo['DAS_ID']
 
-    def addNewBlock(self, block):
-        """
-        _addNewBlock_
+        if len(loadedFiles) < 1:
+            # Nothing to do here
+            return
 
-        Add a new block everywhere it has to go
-        """
-        name     = block.getName()
-        location = block.getLocation()
-        das      = block.das
-        self.blockCache[name] = block
-        if not das in self.dasCache.keys():
-            self.dasCache[das] = {}
-            self.dasCache[das][location] = []
-        elif not location in self.dasCache[das].keys():
-            self.dasCache[das][location] = []
-        if not name in self.dasCache[das][location]:
-            self.dasCache[das][location].append(name)
+        self.dasInfo[dasID] = {'datasetPath': loadedFiles[0]['datasetPath'],
+                               'AcquisitionEra': dasInfo['AcquisitionEra'],
+                               'ProcessingVer': dasInfo['ProcessingVer']}
+
+        for newFile in loadedFiles:
+            if not newFile.get('block', 1) == None:
+                # Then this file already has a block
+                # It should be accounted for somewhere
+                # Or loaded with the block
+                continue
+
+            location = newFile.get('locations', None)
+            if type(location) == set:
+                location = iter(location).next()
+
+            # Find the block for this file, closing
+            # the blocks that it doesn't fit into
+            currentBlock, closedBlocks = self.assembler.addFile(das = dasID,
+                                                                location = location,
+                                                                size = newFile['size'],
+                                                                events = newFile['events'])
+            for block in closedBlocks:
+                block.status = 'Pending'
+
+            # Now deal with the file
+            currentBlock.addFile(dbsFile = newFile)
+            self.filesToUpdate.append({'filelfn': newFile['lfn'],
+                                       'block': currentBlock.getName()})
 
         return
 
-    def isBlockOpen(self, newFile, block, doTime = False):
+
+    def checkTimeout(self):
         """
-        _isBlockOpen_
+        Check all blocks for a timeout
 
-        Check and see if a block is full
-        This will check on time, but that's disabled by default
-        The plan is to do a time check after we do everything else,
-        so open blocks about to time out can still get more
-        files put in them.
         """
+        for block in self.assembler.expire():
+            if block.status == 'Open':
+                block.status = 'Pending'
 
-        if block.status != 'Open':
-            # Then somebody has dumped this already
-            return False
-        if block.getTime() > self.maxBlockTime and doTime:
-            return False
-        if block.getSize() + newFile['size'] > self.maxBlockSize:
-            return False
-        if block.getNFiles() >= self.maxBlockFiles:
-            # Then we have to dump it because this file
-            # will put it over the limit.
-            return False
-
-        return True
-        
+    def createBlock(self, das, location):
+        """
+        _createBlock_
 
-    def getBlock(self, newFile, dasBlocks, location, das):
+        Create a new block for the assembler
         """
-        _getBlock_
+        dasInfo   = self.dasInfo[das]
+        blockname = '%s#%s' % (dasInfo['datasetPath'], makeUUID())
+        block = DBSBlock(name = blockname,
+                         location = location, das = das)
+        # Add the era info
+        block.setAcquisitionEra(era = dasInfo['AcquisitionEra'])
+        block.setProcessingVer(era = dasInfo['ProcessingVer'])
+        self.blockCache[blockname] = block
+        return blockname, block
 
-        This gets a new block by checking whether there is a
-        pre-existant block. 
+    def addNewBlock(self, block):
         """
+        _addNewBlock_
 
-        for block in dasBlocks:
-            if not self.isBlockOpen(newFile = newFile, block = block):
-                # Then the block can't fit the file
-                # Close the block
-                block.status = 'Pending'
-                self.blockCache[block.getName()] = block
-                dasBlocks.remove(block.getName())
-            else:
-                # Load it out of the cache
-                currentBlock = self.blockCache.get(block.getName())
-                return currentBlock
-        # If there are no open blocks
-        # Or we run out of blocks
-        blockname = '%s#%s' % (newFile['datasetPath'],
-                               makeUUID())
-        newBlock = DBSBlock(name = blockname,
-                            location = location, das = das)
-        self.addNewBlock(block = newBlock)
-        dasBlocks.append(blockname)
-        return newBlock
+        Add a block loaded from DBSBuffer everywhere it has to go
+        """
+        name = block.getName()
+        self.blockCache[name] = block
+        if not name in self.assembler:
+            self.assembler.addBlock(name = name, das = block.das,
+                                    location = block.getLocation(),
+                                    block = block,
+                                    nFiles = block.getNFiles(),
+                                    size = block.getSize(),
+                                    startTime = block.getStartTime(),
+                                    isOpen = block.status == 'Open')
 
-        
+        return
 
     def inputBlocks(self):
         """
@@ -564,17 +529,24 @@ class DBSUploadPoller(BaseWorkerThread):
 
         Process the blocks that have new files in them.
         1) Put them into DBSBuffer in state 'Pending'
-        2) Upload them to DBS
+        2) Queue them for upload to DBS
         """
 
         myThread = threading.currentThread()
 
         # We want to run this over all pending blocks
+        # that aren't already on their way to DBS
+        waitingBlocks     = set(self.queuedBlocks)
+        waitingBlocks.update([x.getName() for x in self.blocksToQueue])
         blocks            = []
         blockForDBSBuffer = []
         updateBlocks      = []
         for block in self.blockCache.values():
-            if block.getName() in self.queuedBlocks:
+            if block.getName() in waitingBlocks:
+                continue
+            if block.getName() in self.blockRetries and \
+                   self.blockRetries[block.getName()] > self.uploadRetries:
+                # Out of retries for this cycle
                 continue
             if block.status == 'Pending':
                 blocks.append(block)
@@ -637,8 +609,22 @@ class DBSUploadPoller(BaseWorkerThread):
 
 
         # Now that things are in DBSBuffer, we can put them in DBS
+        self.blocksToQueue.extend(blocks)
+        self.queueBlocks()
 
-        for block in blocks:
+        return
+
+
+    def queueBlocks(self):
+        """
+        _queueBlocks_
+
+        Hand waiting blocks to the upload processes until
+        maxInFlightBlocks blocks are being uploaded.
+        """
+        while len(self.blocksToQueue) > 0 and \
+                  len(self.queuedBlocks) < self.maxInFlight:
+            block = self.blocksToQueue.pop(0)
             logging.debug("Found block %s in blocks" % block.getName())
             block.setPhysicsGroup(group = self.physicsGroup)
             encodedBlock = block.data
@@ -650,15 +636,11 @@ class DBSUploadPoller(BaseWorkerThread):
                 f.close()
             self.queuedBlocks.append(block.getName())
 
-
-
-        # And all work is in and we're done for now
-
         return
 
 
 
-    def retrieveBlocks(self):
+    def retrieveBlocks(self, drain = False):
         """
         _retrieveBlocks_
 
@@ -667,37 +649,74 @@ class DBSUploadPoller(BaseWorkerThread):
         and then update it in DBSBuffer.
 
         To do this, the result queue needs to pass back the blockname
+
+        Every result frees an upload slot for a waiting block.  Failed
+        blocks are queued again up to uploadRetries times, and the
+        uploaded blocks are marked in DBSBuffer statusBatchSize at a time.
+        If drain is True wait until all queued blocks are done, or until
+        no result arrives for uploadTimeout seconds.
         """
-        myThread = threading.currentThread()
-        
-        blocksToClose = []
-        while True:
+        if drain:
+            waitTime = self.uploadTimeout
+        else:
+            # Get stuff out of the queue with a ridiculously
+            # short wait time
+            waitTime = self.wait
+
+        loadedBlocks = []
+        while len(self.queuedBlocks) > 0:
             try:
-                # Get stuff out of the queue with a ridiculously
-                # short wait time
-                blockresult = self.result.get(timeout = self.wait)
-                blocksToClose.append(blockresult)
+                result = self.result.get(timeout = waitTime)
             except Queue.Empty:
                 # This means the queue has no current results
+                if drain:
+                    logging.error("Timed out waiting for %i blocks to be uploaded to DBS" \
+                                  % len(self.queuedBlocks))
                 break
 
-        loadedBlocks = []
-        for result in blocksToClose:
             # Remove from list of work being processed
-            self.queuedBlocks.remove(result.get('name'))
+            name = result.get('name')
+            self.queuedBlocks.remove(name)
+            block = self.blockCache.get(name)
             if result.get('success', False):
-                block = self.blockCache.get(result.get('name'))
                 block.status = 'InDBS'
                 loadedBlocks.append(block)
             else:
-                logging.error("Error found in multiprocess during process of block %s" % result.get('name'))
+                logging.error("Error found in multiprocess during process of block %s" % name)
                 logging.error(result['error'])
-                # Continue to the next block
-                # Block will remain in pending status until it is transferred
+                self.blockRetries[name] = self.blockRetries.get(name, 0) + 1
+                if self.blockRetries[name] <= self.uploadRetries:
+                    self.blocksToQueue.append(block)
+                # Otherwise the block will remain in pending
+                # status until it is transferred in a later cycle
+
+            if len(loadedBlocks) >= self.statusBatch:
+                self.closeBlocks(blocks = loadedBlocks)
+                loadedBlocks = []
+
+            self.queueBlocks()
+
+        self.closeBlocks(blocks = loadedBlocks)
+
+        # And we're done
+        return
+
+
+    def closeBlocks(self, blocks):
+        """
+        _closeBlocks_
+
+        Mark blocks that are in DBS as done in DBSBuffer
+        and remove them from the caches.
+        """
+        myThread = threading.currentThread()
+
+        if len(blocks) < 1:
+            return
 
         try:
             myThread.transaction.begin()
-            self.dbsUtil.updateBlocks(blocks = loadedBlocks)
+            self.dbsUtil.updateBlocks(blocks = blocks)
             myThread.transaction.commit()
         except WMException:
             myThread.transaction.rollback()
@@ -706,32 +725,17 @@ class DBSUploadPoller(BaseWorkerThread):
             msg =  "Unhandled exception while finished closed blocks in DBSBuffer\n"
             msg += str(ex)
             logging.error(msg)
-            logging.debug("Blocks for Update: %s\n" % loadedBlocks)
+            logging.debug("Blocks for Update: %s\n" % blocks)
             myThread.transaction.rollback()
             raise DBSUploadException(msg)
 
 
-        for block in loadedBlocks:
+        for block in blocks:
             # Clean things up
-            name     = block.getName()
-            location = block.getLocation()
-            das      = block.das
-            self.dasCache[das][location].remove(name)
+            name = block.getName()
+            self.assembler.removeBlock(name)
             del self.blockCache[name]
+            self.blockRetries.pop(name, None)
 
-
-        # And we're done
+        self.reportWork(len(blocks))
         return
-
-
-    
-
-
-
-
-
-
-
-
-        
-
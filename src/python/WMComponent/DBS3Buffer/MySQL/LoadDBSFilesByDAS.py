@@ -16,7 +16,7 @@ class LoadDBSFilesByDAS(DBFormatter):
     fileInfoSQL = """SELECT files.id AS id, files.lfn AS lfn, files.filesize AS filesize,
                     files.events AS events, 
                     files.status AS status,
-                    files.block_id AS block,
+                    files.block_id AS block, files.dataset_algo AS das,
                     dbsbuffer_algo.app_name AS app_name, dbsbuffer_algo.app_ver AS app_ver,
                     dbsbuffer_algo.app_fam AS app_fam, dbsbuffer_algo.pset_hash AS pset_hash,
                     dbsbuffer_algo.config_content, dbsbuffer_dataset.path AS dataset_path,
@@ -28,7 +28,7 @@ class LoadDBSFilesByDAS(DBFormatter):
                dbsbuffer_algo_dataset_assoc.algo_id = dbsbuffer_algo.id
              INNER JOIN dbsbuffer_dataset ON
                dbsbuffer_algo_dataset_assoc.dataset_id = dbsbuffer_dataset.id
-             WHERE dbsbuffer_algo_dataset_assoc.id = :das
+             WHERE dbsbuffer_algo_dataset_assoc.id IN (%s)
              AND files.status = :status
              AND NOT EXISTS (SELECT parent FROM dbsbuffer_file_parent dbfp
                               INNER JOIN dbsbuffer_file dbf2 ON dbfp.parent = dbf2.id
@@ -219,11 +219,27 @@ class LoadDBSFilesByDAS(DBFormatter):
         Execute multiple SQL queries to extract all binding information
         Use the first query to get the fileIDs
 
+        das can be a single DAS ID or a list of them, in which case
+        the files for all of them are loaded with a single set of queries,
+        the DAS IDs go into an IN clause.
         """
-        result   = self.dbi.processData(self.fileInfoSQL, {'das': das, 'status': 'NOTUPLOADED'}, 
-                                        conn = conn,
-                                        transaction = transaction)
-        fileInfo = self.formatFileInfo(result)
+        dasIDs = self.dbi.makelist(das)
+        if len(dasIDs) == 0:
+            return []
+
+        fileInfo = []
+        maxBinds = self.dbi.maxBindsPerQuery
+        for i in range(0, len(dasIDs), maxBinds):
+            dasBinds = {'status': 'NOTUPLOADED'}
+            dasNames = []
+            for j, dasID in enumerate(dasIDs[i:i + maxBinds]):
+                dasBinds['das_%i' % j] = dasID
+                dasNames.append(':das_%i' % j)
+
+            result   = self.dbi.processData(self.fileInfoSQL % ", ".join(dasNames),
+                                            dasBinds, conn = conn,
+                                            transaction = transaction)
+            fileInfo.extend(self.formatFileInfo(result))
 
         fileIDs  = [x['id'] for x in fileInfo]
         binds    = self.getBinds(fileIDs)
@@ -278,12 +294,15 @@ class LoadDBSFilesByDAS(DBFormatter):
         Merge together two file lists based on the ID field
         """
 
+        entriesB = {}
+        for entryB in listB:
+            entriesB[entryB[field]] = entryB
+
         for entryA in listA:
-            for entryB in listB:
-                if entryA[field] == entryB[field]:
-                    # Then we've found a match
-                    entryA.update(entryB)
-                    break
+            entryB = entriesB.get(entryA[field], None)
+            if entryB != None:
+                # Then we've found a match
+                entryA.update(entryB)
 
 
         return listA
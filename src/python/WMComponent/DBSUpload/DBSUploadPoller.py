@@ -46,7 +46,7 @@ import traceback
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.ProcessPool.ProcessPool        import ProcessPool
 from WMCore.Cache.WMConfigCache            import ConfigCache
-from WMCore.Algorithms.MiscAlgos           import sortListByKey
+from WMCore.Algorithms.BlockAssembler      import BlockAssembler
 
 from WMCore.WMFactory     import WMFactory
 from WMCore.DAOFactory    import DAOFactory
@@ -165,37 +165,6 @@ def createBlock(datasetPath, location):
     return block
 
 
-def preassignBlocks(files, blocks):
-    """
-    _preassignBlocks_
-    
-    Take a dictionary of predefined blocks and a dictionary
-    of predefined files sorted by location, and assign files that were
-    already in blocks to those blocks again
-
-    Return result by memory
-    """
-    for location in files.keys():
-        if not location in blocks.keys():
-            # No blocks for this location
-            continue
-        localBlocks = blocks[location]
-        filesToRemove = []
-        for file in files[location]:
-            if file.get('blockID', None) == None:
-                continue
-            for block in localBlocks:
-                if block['ID'] == file['blockID']:
-                    block['insertedFiles'].append(file)
-                    filesToRemove.append(file)
-        # Remove files that are already in blocks
-        for file in filesToRemove:
-            files[location].remove(file)
-
-    return blocks, files
-
-
-
 class DBSUploadPollerException(WMException):
     """
     Considering how many times you're likely to see this
@@ -307,6 +276,8 @@ class DBSUploadPoller(BaseWorkerThread):
         dasList = self.uploadToDBS.findUploadableDAS()
         logging.debug("Recovered %i DAS to upload" % len(dasList))
 
+        nFiles = 0
+
         for dasInfo in dasList:
             # Go one DAS at a time
             dasID = dasInfo['DAS_ID']
@@ -331,28 +302,14 @@ class DBSUploadPoller(BaseWorkerThread):
             blocks = self.uploadToDBS.loadBlocksByDAS(das = dasID)
             logging.debug("Retrieved %i files and %i blocks from DB." % (len(files), len(blocks)))
 
-            # Sort the files and blocks by location
-            locationDict = sortListByKey(input = files, key = 'locations')
-            blockDict    = sortListByKey(input = blocks, key = 'location')
-            logging.debug("Active DAS file locations: %s" % locationDict.keys())
-            logging.debug("Active Block file locations: %s" % blockDict.keys())
-
             try:
                 # Sort files that are already in blocks
-                # back into those blocks
-                # pass by reference
-                blockDict, locationDict = preassignBlocks(files = locationDict, blocks = blockDict)
-                
-                # Now go over all the files
-                for location in locationDict.keys():
-                    # Split files into blocks
-                    locFiles  = locationDict.get(location, [])
-                    locBlocks = blockDict.get(location, [])
-                    locBlocks = self.splitFilesIntoBlocks(files = locFiles,
-                                                          blocks = locBlocks,
-                                                          dataset = dataset,
-                                                          location = location)
-                    readyBlocks.extend(locBlocks)
+                # back into those blocks and split the
+                # rest into new blocks
+                readyBlocks = self.splitFilesIntoBlocks(files = files,
+                                                        blocks = blocks,
+                                                        dataset = dataset,
+                                                        das = dasID)
             except WMException:
                 raise
             except Exception, ex:
@@ -361,8 +318,8 @@ class DBSUploadPoller(BaseWorkerThread):
                 msg += str(traceback.format_exc())
                 logging.error(msg)
                 self.sendAlert(6, msg = msg)
-                logging.debug("BlockDictionary: %s" % blockDict)
-                logging.debug("FileDictionary: %s" % locationDict)
+                logging.debug("Blocks: %s" % blocks)
+                logging.debug("Files: %s" % files)
                 raise DBSUploadPollerException(msg)
 
 
@@ -377,10 +334,12 @@ class DBSUploadPoller(BaseWorkerThread):
             self.setStatus.execute(lfns = lfnList, status = "READY", 
                                    conn = myThread.transaction.conn,
                                    transaction = myThread.transaction)
+            nFiles += len(files)
 
         # All files that were in NOTUPLOADED
         # And had uploaded parents
         # Should now be in assigned to blocks in DBSBuffer, and in the READY status
+        self.reportWork(nFiles)
         return
 
 
@@ -485,6 +444,8 @@ class DBSUploadPoller(BaseWorkerThread):
                 logging.debug("Nothing to do for DAS %i in uploadBlocks" % dasID)
                 continue
 
+            self.reportWork(len(readyBlocks))
+
             try:
                 # Now do the real action of transferring crap
                 # Damn it Anzar: Why does DBS print stuff out?
@@ -553,69 +514,75 @@ class DBSUploadPoller(BaseWorkerThread):
 
 
 
-    def splitFilesIntoBlocks(self, files, blocks, dataset, location):
+    def splitFilesIntoBlocks(self, files, blocks, dataset, das):
         """
         Break the files into blocks based on config params
 
-        Create a new block when necessary.
+        Files that are already in one of the open blocks go back
+        into that block, the others are assigned to the open block
+        for their location.  Create a new block when necessary.
+        Return the blocks that got new files or were closed.
         """
 
-        blocksToHandle = []
+        def newBlock(das, location):
+            block = createBlock(datasetPath = dataset['Path'],
+                                location = location)
+            return block['Name'], block
 
-        if len(blocks) > 1:
-            # Well, then we have a bit of a problem
-            # Decide what to do about this later
-            logging.error("More then one open block for this DAS")
+        assembler = BlockAssembler(newBlock = newBlock,
+                                   maxFiles = self.maxBlockFiles,
+                                   maxSize = self.maxBlockSize,
+                                   maxTime = self.maxBlockTime,
+                                   checkNewSize = False,
+                                   closeOnTime = True)
 
-        if len(blocks) == 0:
-            currentBlock = createBlock(datasetPath = dataset['Path'],
-                                       location = location)
-        else:
-            currentBlock = blocks[0]
+        blocksByID = {}
+        for block in blocks:
+            blocksByID[block['ID']] = block
+            assembler.addBlock(name = block['Name'], das = das,
+                               location = block['location'], block = block,
+                               nFiles = block['NumberOfFiles'],
+                               size = float(block.get('BlockSize') or 0),
+                               startTime = int(block.get('CreationDate', 0)))
 
+        blocksToHandle = []
+        handledBlocks  = set()
         for newFile in files:
-            # Check to see if blocks are full
-            if not self.isBlockOpen(block = currentBlock):
+            locations = newFile.get('locations', None)
+            if not locations:
+                logging.error("Found file with no location: %s" % newFile)
+                logging.error("Skipping")
+                continue
+            if type(locations) != set:
+                locations = set([locations])
+
+            oldBlock = blocksByID.get(newFile.get('blockID', None), None)
+            if oldBlock != None and oldBlock['location'] in locations:
+                # This file is already in the block
+                oldBlock['insertedFiles'].append(newFile)
+                continue
+
+            currentBlock, closedBlocks = assembler.addFile(das = das,
+                                                           location = iter(locations).next(),
+                                                           size = newFile['size'])
+            for block in closedBlocks + [currentBlock]:
+                if not block['Name'] in handledBlocks:
+                    handledBlocks.add(block['Name'])
+                    blocksToHandle.append(block)
+            for block in closedBlocks:
                 # Add old block to return list
-                # Create a new block
-                currentBlock['open'] = 'Pending'
-                blocksToHandle.append(currentBlock)
-                currentBlock = createBlock(datasetPath = dataset['Path'],
-                                           location = location)
+                block['open'] = 'Pending'
 
             # Now process the file
             currentBlock['newFiles'].append(newFile)
             currentBlock['BlockSize']     += newFile['size']
             currentBlock['NumberOfFiles'] += 1
 
-        if currentBlock['NumberOfFiles'] > 0:
-            blocksToHandle.append(currentBlock)
-
                 
         return blocksToHandle
 
 
 
-    def isBlockOpen(self, block):
-        """
-        _isBlockOpen_
-
-        Tells you if the block should be closed
-        """
-
-        if time.time() - int(block.get('CreationDate', 0)) >= self.maxBlockTime:
-            # We've timed out on this block
-            return False
-        if block['NumberOfFiles'] >= self.maxBlockFiles:
-            # We've got too many files
-            return False
-        if float(block.get('BlockSize')) >= self.maxBlockSize:
-            return False
-
-        return True
-
-
-
     def createBlocksInDBSBuffer(self, readyBlocks):
         """
         _createBlocksInDBSBuffer_
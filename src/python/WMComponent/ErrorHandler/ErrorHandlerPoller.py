@@ -45,7 +45,7 @@ from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.ACDC.DataCollectionService  import DataCollectionService
 from WMCore.WMSpec.WMWorkload           import WMWorkload, WMWorkloadHelper
 from WMCore.WMException                 import WMException
-from WMCore.FwkJobReport.Report         import Report
+from WMCore.FwkJobReport.Report         import loadReportSummary
 
 class ErrorHandlerException(WMException):
     """
@@ -142,18 +142,18 @@ class ErrorHandlerPoller(BaseWorkerThread):
                               % (ajob['id'], str(ajob['retry_count'])))
 
         if self.readFWJR:
-            # Then we have to check each FWJR for exit status
+            # Then we have to check each FWJR for exit status, which is in
+            # the report summary.
             for job in cooloffPre:
-                report     = Report()
                 reportPath = job['fwjr_path']
                 if not os.path.isfile(reportPath):
                     logging.error("Failed to find FWJR for job %i in location %s." % (job['id'], reportPath))
                     continue
                 try:
-                    report.load(reportPath)
+                    report = loadReportSummary(reportPath)
 
                     # Retrieve information from report
-                    times = report.getFirstStartLastStop()
+                    times = report['times']
                     startTime = times['startTime']
                     stopTime  = times['stopTime']
 
@@ -168,13 +168,13 @@ class ErrorHandlerPoller(BaseWorkerThread):
                         msg = "Job %i exhausted after running on node for %i seconds" % (job['id'], stopTime - startTime)
                         logging.error(msg)
                         exhaustJobs.append(job)
-                    elif report.getExitCode() in self.exitCodes:
-                        msg = "Job %i exhausted due to exitCode %s" % (job['id'], report.getExitCode())
+                    elif report['exitCode'] in self.exitCodes:
+                        msg = "Job %i exhausted due to exitCode %s" % (job['id'], report['exitCode'])
                         logging.error(msg)
                         self.sendAlert(4, msg = msg)
                         exhaustJobs.append(job)
-                    elif report.getExitCode() in self.passCodes:
-                        msg = "Job %i restarted immediately due to exitCode %i" % (job['id'], report.getExitCode())
+                    elif report['exitCode'] in self.passCodes:
+                        msg = "Job %i restarted immediately due to exitCode %i" % (job['id'], report['exitCode'])
                         passJobs.append(job)
                     else:
                         cooloffJobs.append(job)
@@ -258,6 +258,7 @@ class ErrorHandlerPoller(BaseWorkerThread):
         idList = self.getJobs.execute(state = 'CreateFailed')
         logging.info("Found %s failed jobs failed during creation" \
                      % len(idList))
+        self.reportWork(len(idList))
         while len(idList) > 0:
             tmpList    = idList[:self.maxProcessSize]
             idList     = idList[self.maxProcessSize:]
@@ -268,6 +269,7 @@ class ErrorHandlerPoller(BaseWorkerThread):
         idList = self.getJobs.execute(state = 'SubmitFailed')
         logging.info("Found %s failed jobs failed during submit" \
                      % len(idList))
+        self.reportWork(len(idList))
         while len(idList) > 0:
             tmpList    = idList[:self.maxProcessSize]
             idList     = idList[self.maxProcessSize:]
@@ -279,6 +281,7 @@ class ErrorHandlerPoller(BaseWorkerThread):
         idList = self.getJobs.execute(state = 'JobFailed')
         logging.info("Found %s failed jobs failed during execution" \
                      % len(idList))
+        self.reportWork(len(idList))
         while len(idList) > 0:
             tmpList = idList[:self.maxProcessSize]
             idList  = idList[self.maxProcessSize:]
@@ -40,6 +40,98 @@ class AccountantWorkerException(WMException):
     WMException based specific class
     """
 
+def createMissingFWKJR(parameters, errorCode = 999,
+                       errorDescription = 'Failure of unknown type'):
+    """
+    _createMissingFWJR_
+
+    Create a missing FWJR if the report can't be found by the code in the
+    path location.
+    """
+    report = Report()
+    report.addError("cmsRun1", 84, errorCode, errorDescription)
+    report.data.cmsRun1.status = "Failed"
+    return report
+
+def loadJobReport(parameters):
+    """
+    _loadJobReport_
+
+    Given a framework job report on disk, load it and return a
+    FwkJobReport instance.  If there is any problem loading or parsing the
+    framework job report return a report with the error instead.
+    """
+    # The jobReportPath may be prefixed with "file://" which needs to be
+    # removed so it doesn't confuse the FwkJobReport() parser.
+    jobReportPath = parameters.get("fwjr_path", None)
+    if not jobReportPath:
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99999, "FWJR path is empty")
+
+    jobReportPath = jobReportPath.replace("file://","")
+    if not os.path.exists(jobReportPath):
+        logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
+
+    if os.path.getsize(jobReportPath) == 0:
+        logging.error("Empty FwkJobReport: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
+
+    jobReport = Report()
+
+    try:
+        jobReport.load(jobReportPath)
+    except Exception, ex:
+        msg =  "Error loading jobReport %s\n" % jobReportPath
+        msg += str(ex)
+        logging.error(msg)
+        logging.debug("Failing job: %s\n" % parameters)
+        return createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
+
+    if len(jobReport.listSteps()) == 0:
+        logging.error("FwkJobReport with no steps: %s" % jobReportPath)
+        return createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
+
+    return jobReport
+
+def didJobSucceed(jobReport):
+    """
+    _didJobSucceed_
+
+    Get the status of the jobReport.  This will loop through all the steps
+    and make sure the status is 'Success'.  If a step does not return
+    'Success', the job will fail.
+    """
+    if not hasattr(jobReport, 'data'):
+        return False
+
+    if not hasattr(jobReport.data, 'steps'):
+        return False
+
+    if not jobReport.taskSuccessful():
+        return False
+
+
+    return True
+
+def loadReportWorker(parameters):
+    """
+    _loadReportWorker_
+
+    Load the framework job report for a job, decide whether the job
+    succeeded and pull out the files that have to be accounted for.  This
+    never touches the database, so the JobAccountantPoller can run it in a
+    process pool while the previous jobs are being committed.
+    """
+    jobReport  = loadJobReport(parameters)
+    jobSuccess = didJobSucceed(jobReport)
+    if jobSuccess:
+        fileList = jobReport.getAllFiles()
+    else:
+        fileList = jobReport.getAllFilesFromStep(step = 'logArch1')
+
+    return (jobReport, jobSuccess, fileList)
+
 
 class AccountantWorker(WMConnectionBase):
     """
@@ -139,87 +231,50 @@ class AccountantWorker(WMConnectionBase):
         FwkJobReport instance.  If there is any problem loading or parsing the
         framework job report return None.
         """
-        # The jobReportPath may be prefixed with "file://" which needs to be
-        # removed so it doesn't confuse the FwkJobReport() parser.
-        jobReportPath = parameters.get("fwjr_path", None)
-        if not jobReportPath:
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, "FWJR path is empty")
-
-        jobReportPath = jobReportPath.replace("file://","")
-        if not os.path.exists(jobReportPath):
-            logging.error("Bad FwkJobReport Path: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
-
-        if os.path.getsize(jobReportPath) == 0:
-            logging.error("Empty FwkJobReport: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99998, 'jobReport of size 0: %s ' % jobReportPath)
-
-        jobReport = Report()
-
-        try:
-            jobReport.load(jobReportPath)
-        except Exception, ex:
-            msg =  "Error loading jobReport %s\n" % jobReportPath
-            msg += str(ex)
-            logging.error(msg)
-            logging.debug("Failing job: %s\n" % parameters)
-            return self.createMissingFWKJR(parameters, 99997, 'Cannot load jobReport')
-
-        if len(jobReport.listSteps()) == 0:
-            logging.error("FwkJobReport with no steps: %s" % jobReportPath)
-            return self.createMissingFWKJR(parameters, 99997, 'jobReport with no steps: %s ' % jobReportPath)
-
-        return jobReport
+        return loadJobReport(parameters)
 
     def didJobSucceed(self, jobReport):
         """
         _didJobSucceed_
 
-        Get the status of the jobReport.  This will loop through all the steps
-        and make sure the status is 'Success'.  If a step does not return
-        'Success', the job will fail.
+        Get the status of the jobReport.
         """
-        if not hasattr(jobReport, 'data'):
-            return False
-
-        if not hasattr(jobReport.data, 'steps'):
-            return False
-
-        if not jobReport.taskSuccessful():
-            return False
+        return didJobSucceed(jobReport)
 
-
-        return True
-
-    def __call__(self, parameters):
+    def __call__(self, parameters, jobReports = None):
         """
         __call__
 
         Handle a completed job.  The parameters dictionary will contain the job
         ID and the path to the framework job report.
+
+        jobReports can hold the output of loadReportWorker() for each job in
+        parameters if the reports were already loaded, otherwise they are
+        loaded here.
         """
         returnList = []
         self.reset()
 
-        for job in parameters:
+        for (i, job) in enumerate(parameters):
             logging.info("Handling %s" % job["fwjr_path"])
 
             # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job)
+            if jobReports == None:
+                (fwkJobReport, jobSuccess, fileList) = loadReportWorker(job)
+            else:
+                (fwkJobReport, jobSuccess, fileList) = jobReports[i]
             fwkJobReport.setJobID(job['id'])
-            jobSuccess = None
 
-            if not self.didJobSucceed(fwkJobReport):
+            if not jobSuccess:
                 logging.error("I have a bad jobReport for %i" %(job['id']))
                 self.handleFailed(jobID = job["id"],
-                                  fwkJobReport = fwkJobReport)
-                jobSuccess = False
+                                  fwkJobReport = fwkJobReport,
+                                  fileList = fileList)
             else:
                 self.handleSuccessful(jobID = job["id"],
                                       fwkJobReport = fwkJobReport,
-                                      fwkJobReportPath = job['fwjr_path'])
-                jobSuccess = True
+                                      fwkJobReportPath = job['fwjr_path'],
+                                      fileList = fileList)
 
             if self.returnJobReport:
                 returnList.append({'id': job["id"], 'jobSuccess': jobSuccess,
@@ -400,7 +455,8 @@ class AccountantWorker(WMConnectionBase):
                 file.location = self.phedex.getBestNodeName(file.location, self.locLists)
 
 
-    def handleSuccessful(self, jobID, fwkJobReport, fwkJobReportPath = None):
+    def handleSuccessful(self, jobID, fwkJobReport, fwkJobReportPath = None,
+                         fileList = None):
         """
         _handleSuccessful_
 
@@ -423,7 +479,8 @@ class AccountantWorker(WMConnectionBase):
                                                 conn = self.getDBConn(),
                                                 transaction = self.existingTransaction())
 
-        fileList = fwkJobReport.getAllFiles()
+        if fileList == None:
+            fileList = fwkJobReport.getAllFiles()
 
         for fwjrFile in fileList:
             wmbsFile = self.addFileToWMBS(jobType, fwjrFile, wmbsJob["mask"],
@@ -446,7 +503,7 @@ class AccountantWorker(WMConnectionBase):
 
         return
 
-    def handleFailed(self, jobID, fwkJobReport):
+    def handleFailed(self, jobID, fwkJobReport, fileList = None):
         """
         _handleFailed_
 
@@ -472,7 +529,8 @@ class AccountantWorker(WMConnectionBase):
                                                 conn = self.getDBConn(),
                                                 transaction = self.existingTransaction())
 
-        fileList = fwkJobReport.getAllFilesFromStep(step = 'logArch1')
+        if fileList == None:
+            fileList = fwkJobReport.getAllFilesFromStep(step = 'logArch1')
 
         for fwjrFile in fileList:
             wmbsFile = self.addFileToWMBS(jobType, fwjrFile, wmbsJob["mask"],
@@ -501,10 +559,7 @@ class AccountantWorker(WMConnectionBase):
         Create a missing FWJR if the report can't be found by the code in the
         path location.
         """
-        report = Report()
-        report.addError("cmsRun1", 84, errorCode, errorDescription)
-        report.data.cmsRun1.status = "Failed"
-        return report
+        return createMissingFWKJR(parameters, errorCode, errorDescription)
 
     def createFilesInDBSBuffer(self):
         """
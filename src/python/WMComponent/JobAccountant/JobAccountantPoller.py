@@ -3,6 +3,10 @@
 _JobAccountantPoller_
 
 Poll WMBS for complete jobs and process their framework job reports.
+
+If more than one worker thread is configured the framework job reports are
+loaded by a pool of processes, the reports for the next slice of jobs are
+loaded while the current slice is written to the database.
 """
 
 
@@ -11,13 +15,14 @@ Poll WMBS for complete jobs and process their framework job reports.
 import time
 import threading
 import logging
+import multiprocessing
 
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 
 from WMCore.Agent.Harness import Harness
 from WMCore.DAOFactory import DAOFactory
 
-from WMComponent.JobAccountant.AccountantWorker import AccountantWorker
+from WMComponent.JobAccountant.AccountantWorker import AccountantWorker, loadReportWorker
 
 from WMCore.WMException import WMException
 
@@ -36,6 +41,13 @@ class JobAccountantPoller(BaseWorkerThread):
         self.config = config
         self.accountantWorkSize = getattr(self.config.JobAccountant,
                                           'accountantWorkSize', 100)
+        self.accountantCycleSize = getattr(self.config.JobAccountant,
+                                           'accountantCycleSize', None)
+        self.workerThreads      = getattr(self.config.JobAccountant,
+                                          'workerThreads', 1)
+        self.loadTimeout        = getattr(self.config.JobAccountant,
+                                          'reportLoadTimeout', 600)
+        self.loaderPool         = None
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available    
         self.initAlerts(compName = "JobAccountant")        
@@ -57,31 +69,85 @@ class JobAccountantPoller(BaseWorkerThread):
         daoFactory = DAOFactory(package = "WMCore.WMBS", logger = myThread.logger,
                                 dbinterface = myThread.dbi)
         self.getJobsAction = daoFactory(classname = "Jobs.GetFWJRByState")
+
+        if self.workerThreads > 1:
+            # The pool is forked before any reports are loaded, the
+            # processes only read reports from disk and never use the
+            # database connections they inherit.
+            self.loaderPool = multiprocessing.Pool(processes = self.workerThreads)
         return
-    
+
+    def terminate(self, parameters = None):
+        """
+        _terminate_
+
+        Shut down the report loading pool.
+        """
+        if self.loaderPool != None:
+            self.loaderPool.terminate()
+            self.loaderPool.join()
+            self.loaderPool = None
+        return
+
+    def loadReports(self, jobs):
+        """
+        _loadReports_
+
+        Start loading the reports for a slice of jobs in the loader pool.
+        Return None if there is no pool, the worker will load the reports
+        itself.
+        """
+        if self.loaderPool == None:
+            return None
+
+        return self.loaderPool.map_async(loadReportWorker, jobs)
+
     def algorithm(self, parameters = None):
         """
         _algorithm_
 
         Poll WMBS for jobs in the 'Complete' state and then pass them to the
-        accountant worker.
+        accountant worker.  If accountantCycleSize is set at most that many
+        jobs are accounted for in a cycle, and the cycle is reported as full
+        if there were more.
         """
         completeJobs = self.getJobsAction.execute(state = "complete")
-        logging.info("Jobs: %s" % completeJobs)
+        logging.info("Found %i complete jobs" % len(completeJobs))
 
         if len(completeJobs) == 0:
             # Then we have no work to do.  Bye!
             logging.debug("No work to do; exiting")
+            self.reportWork(0)
             return
 
-        while len(completeJobs) > self.accountantWorkSize:
+        cycleFull = False
+        if self.accountantCycleSize and len(completeJobs) > self.accountantCycleSize:
+            logging.info("Accounting for %i jobs in this cycle" % self.accountantCycleSize)
+            completeJobs = completeJobs[:self.accountantCycleSize]
+            cycleFull = True
+
+        jobSlices = [completeJobs[i:i + self.accountantWorkSize]
+                     for i in range(0, len(completeJobs), self.accountantWorkSize)]
+
+        pendingReports = self.loadReports(jobSlices[0])
+        for (i, jobsSlice) in enumerate(jobSlices):
             try:
-                jobsSlice = completeJobs[:self.accountantWorkSize]
-                completeJobs = completeJobs[self.accountantWorkSize:]
-                self.accountantWorker(jobsSlice)
+                jobReports = None
+                if pendingReports != None:
+                    jobReports = pendingReports.get(self.loadTimeout)
+                if i + 1 < len(jobSlices):
+                    # Load the next slice while this one goes into the database
+                    pendingReports = self.loadReports(jobSlices[i + 1])
+                self.accountantWorker(jobsSlice, jobReports)
             except WMException:
+                myThread = threading.currentThread()
+                if getattr(myThread, 'transaction', None) != None:
+                    myThread.transaction.rollback()
                 raise
             except Exception, ex:
+                myThread = threading.currentThread()
+                if getattr(myThread, 'transaction', None) != None:
+                    myThread.transaction.rollback()
                 msg =  "Hit general exception in JobAccountantPoller while using worker.\n"
                 msg += str(ex)
                 logging.error(msg)
@@ -90,23 +156,5 @@ class JobAccountantPoller(BaseWorkerThread):
                 logging.debug(jobsSlice)
                 raise JobAccountantPollerException(msg)
 
-        try:
-            self.accountantWorker(completeJobs)
-        except WMException:
-            myThread = threading.currentThread()
-            if getattr(myThread, 'transaction', None) != None:
-                myThread.transaction.rollback()
-            raise
-        except Exception, ex:
-            myThread = threading.currentThread()
-            if getattr(myThread, 'transaction', None) != None:
-                myThread.transaction.rollback()
-            msg =  "Hit general exception in JobAccountantPoller in last worker use.\n"
-            msg += str(ex)
-            logging.error(msg)
-            self.sendAlert(6, msg = msg)
-            logging.debug("jobs left:")
-            logging.debug(completeJobs)
-            raise JobAccountantPollerException(msg)
-
+        self.reportWork(len(completeJobs), full = cycleFull)
         return
@@ -16,11 +16,10 @@ import logging
 import traceback
 import threading
 import multiprocessing
-#import time
-#import cProfile, pstats
 
 
 from WMCore.WorkerThreads.BaseWorkerThread  import BaseWorkerThread
+from WMCore.WorkerThreads.WakeupChannel     import wakeComponent
 from WMCore.DAOFactory                      import DAOFactory
 from WMCore.WMException                     import WMException
 from WMCore.ProcessPool.ProcessPool         import ProcessPool
@@ -103,7 +102,7 @@ def runSplitter(jobFactory, splitParams):
 def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
             wmTaskPrio = None, owner = None, ownerDN = None,
             ownerGroup = '', ownerRole = '',
-            scramArch = None, swVersion = None ):
+            scramArch = None, swVersion = None, writePickle = True):
         """
         _saveJob_
 
@@ -127,19 +126,46 @@ def saveJob(job, workflow, sandbox, wmTask = None, jobNumber = 0,
         job['ownerRole']   = ownerRole
         job['scramArch'] = scramArch
         job['swVersion'] = swVersion
-        output = open(os.path.join(cacheDir, 'job.pkl'), 'w')
-        cPickle.dump(job, output, cPickle.HIGHEST_PROTOCOL)
-        output.close()
 
+        if writePickle:
+            writeJobPickle(job)
 
         return
 
 
-def creatorProcess(work, jobCacheDir):
+def writeJobPickle(job):
+    """
+    _writeJobPickle_
+
+    Write the job pickle into the job's cache directory
+    """
+    output = open(os.path.join(job['cache_dir'], 'job.pkl'), 'w')
+    cPickle.dump(job, output, cPickle.HIGHEST_PROTOCOL)
+    output.close()
+    return
+
+
+def writeJobPickles(jobs):
+    """
+    _writeJobPickles_
+
+    Pickle a batch of jobs into their cache directories.  This runs in the
+    JobCreator pickle pool and never touches the database.  The jobs of a
+    subscription share one task object, so it only crosses the pool pipe
+    once per batch while every job.pkl still gets a full copy of it.
+    """
+    for job in jobs:
+        writeJobPickle(job)
+
+    return len(jobs)
+
+
+def creatorProcess(work, jobCacheDir, writePickles = True):
     """
     _creatorProcess_
 
-    Creator work areas and pickle job objects
+    Creator work areas and pickle job objects.  If writePickles is False the
+    jobs are prepared but the pickles are left for the caller to write.
     """
     createWorkArea  = CreateWorkArea()
 
@@ -193,7 +219,8 @@ def creatorProcess(work, jobCacheDir):
                     ownerGroup = ownerGroup,
                     ownerRole = ownerRole,
                     scramArch = scramArch,
-                    swVersion = swVersion )
+                    swVersion = swVersion,
+                    writePickle = writePickles)
 
     except Exception, ex:
         # Register as failure; move on
@@ -328,6 +355,14 @@ class JobCreatorPoller(BaseWorkerThread):
 
         BaseWorkerThread.__init__(self)
 
+        # With more than one worker the job pickles are written by a pool of
+        # processes while all the database work stays in this thread.  The
+        # pool is forked before the poller does any database work.
+        self.workerThreads      = getattr(config.JobCreator, 'workerThreads', 1)
+        self.pickleTimeout      = getattr(config.JobCreator, 'pickleTimeout', 600)
+        self.picklePool         = None
+        self.startPicklePool()
+
         myThread = threading.currentThread()
 
         #DAO factory for WMBS objects
@@ -336,9 +371,15 @@ class JobCreatorPoller(BaseWorkerThread):
                                      dbinterface = myThread.dbi)
 
         self.setBulkCache     = self.daoFactory(classname = "Jobs.SetCache")
+        self.setSubmitInfo    = self.daoFactory(classname = "Jobs.SetSubmitInfo")
         self.countJobs        = self.daoFactory(classname = "Jobs.GetNumberOfJobsPerWorkflow")
         self.subscriptionList = self.daoFactory(classname = "Subscriptions.ListIncomplete")
 
+        # Only store the submit info once the WMBS schema has been upgraded,
+        # the JobSubmitter unpickles the jobs until then.
+        upgradeAction      = self.daoFactory(classname = "Upgrade")
+        self.storeSubmitInfo = not "wmbs_job_submit_info" in upgradeAction.pending()
+
         #information
         self.config = config
 
@@ -346,6 +387,9 @@ class JobCreatorPoller(BaseWorkerThread):
         self.defaultJobType     = config.JobCreator.defaultJobType
         self.limit              = getattr(config.JobCreator, 'fileLoadLimit', 500)
 
+        # Components to wake up once new jobs were created
+        self.wakeComponents     = getattr(config.JobCreator, 'wakeComponents', ['JobSubmitter'])
+
         # initialize the alert framework (if available - config.Alert present)
         #    self.sendAlert will be then be available
         self.initAlerts(compName = "JobCreator")
@@ -418,8 +462,13 @@ class JobCreatorPoller(BaseWorkerThread):
         Actually runs the code
         """
         logging.debug("Running JSM.JobCreator")
+
+        # Replace a pool that was torn down after a timeout while no
+        # transaction is open
+        self.startPicklePool()
+
         try:
-            self.pollSubscriptions()
+            nJobs = self.pollSubscriptions()
         except WMException:
             #self.close()
             myThread = threading.currentThread()
@@ -436,6 +485,13 @@ class JobCreatorPoller(BaseWorkerThread):
             msg = "Failed to execute JobCreator \n%s\n" % (ex)
             raise JobCreatorException(msg)
 
+        self.reportWork(nJobs)
+        if nJobs > 0:
+            for componentName in self.wakeComponents:
+                wakeComponent(self.config, componentName)
+
+        return
+
     def terminate(self, params):
         """
         _terminate_
@@ -445,11 +501,28 @@ class JobCreatorPoller(BaseWorkerThread):
         logging.debug("terminating. doing one more pass before we die")
         self.algorithm(params)
 
+        if self.picklePool != None:
+            self.picklePool.close()
+            self.picklePool.join()
+            self.picklePool = None
+        return
+
+    def startPicklePool(self):
+        """
+        _startPicklePool_
+
+        Start the pool of processes that write the job pickles if we're
+        configured to use one and it isn't running.
+        """
+        if self.workerThreads > 1 and self.picklePool == None:
+            self.picklePool = multiprocessing.Pool(self.workerThreads)
+        return
+
 
     def pollSubscriptions(self):
         """
         Poller for looking in all active subscriptions for jobs that need to be made.
-
+        Return the number of jobs that were created.
         """
         logging.info("Beginning JobCreator.pollSubscriptions() cycle.")
         myThread = threading.currentThread()
@@ -457,6 +530,10 @@ class JobCreatorPoller(BaseWorkerThread):
         #First, get list of Subscriptions
         subscriptions    = self.subscriptionList.execute()
 
+        # Many subscriptions share a spec, only load each one once per cycle
+        wmWorkloadCache  = {}
+        nJobs            = 0
+
         # Okay, now we have a list of subscriptions
         for subscriptionID in subscriptions:
             wmbsSubscription = Subscription(id = subscriptionID)
@@ -475,7 +552,9 @@ class JobCreatorPoller(BaseWorkerThread):
             workflow         = Workflow(id = wmbsSubscription["workflow"].id)
             workflow.load()
             wmbsSubscription['workflow'] = workflow
-            wmWorkload       = retrieveWMSpec(workflow = workflow)
+            if not workflow.spec in wmWorkloadCache:
+                wmWorkloadCache[workflow.spec] = retrieveWMSpec(workflow = workflow)
+            wmWorkload       = wmWorkloadCache[workflow.spec]
 
             if not workflow.task or not wmWorkload:
                 # Then we have a problem
@@ -563,8 +642,10 @@ class JobCreatorPoller(BaseWorkerThread):
                                'ownerRole': wmWorkload.getOwner().get('vorole', '')}
 
                 tempSubscription = Subscription(id = wmbsSubscription['id'])
+                writePickles     = self.picklePool == None
 
                 nameDictList = []
+                submitJobs   = []
                 for wmbsJobGroup in wmbsJobGroups:
                     # For each jobGroup, put a dictionary
                     # together and run it with creatorProcess
@@ -578,7 +659,8 @@ class JobCreatorPoller(BaseWorkerThread):
                     tempDict['jobNumber'] = jobNumber
 
                     jobGroup = creatorProcess(work = tempDict,
-                                              jobCacheDir = self.jobCacheDir)
+                                              jobCacheDir = self.jobCacheDir,
+                                              writePickles = writePickles)
                     jobNumber += jobsInGroup
 
                     # Set jobCache for group
@@ -587,12 +669,24 @@ class JobCreatorPoller(BaseWorkerThread):
                                              'cacheDir':job['cache_dir']})
                         job["user"] = wmWorkload.getOwner()["name"]
                         job["group"] = wmWorkload.getOwner()["group"]
+                        submitJobs.append(job)
+
+                if not writePickles:
+                    jobs = []
+                    for wmbsJobGroup in wmbsJobGroups:
+                        jobs.extend(wmbsJobGroup.jobs)
+                    self.writePicklesInParallel(jobs = jobs)
+
                 # Set the caches in the database
                 try:
                     if len(nameDictList) > 0:
                         self.setBulkCache.execute(jobDictList = nameDictList,
                                                   conn = myThread.transaction.conn,
                                                   transaction = True)
+                        if self.storeSubmitInfo:
+                            self.setSubmitInfo.execute(jobs = submitJobs,
+                                                       conn = myThread.transaction.conn,
+                                                       transaction = True)
                 except WMException:
                     raise
                 except Exception, ex:
@@ -610,6 +704,7 @@ class JobCreatorPoller(BaseWorkerThread):
                 # Now end the transaction so that everything is wrapped
                 # in a single rollback
                 myThread.transaction.commit()
+                nJobs += len(submitJobs)
 
 
             # END: While loop over jobFactory
@@ -617,7 +712,7 @@ class JobCreatorPoller(BaseWorkerThread):
             # Close the jobFactory
             wmbsJobFactory.close()
 
-        return
+        return nJobs
 
 
 # This is the code for the multiprocessing based queue retrieval system
@@ -673,6 +768,43 @@ class JobCreatorPoller(BaseWorkerThread):
 #        return
 
 
+    def writePicklesInParallel(self, jobs):
+        """
+        _writePicklesInParallel_
+
+        Have the pickle pool pickle the jobs and write them to disk, with a
+        single deadline of pickleTimeout seconds for all of them.  The jobs
+        are split into one batch per worker so the shared task is only sent
+        once per worker.  Raise a JobCreatorException if any of the writes
+        fails or the deadline passes, in which case the pool is torn down and
+        replaced at the start of the next cycle.
+        """
+        if len(jobs) == 0:
+            return
+
+        nWorkers = min(self.workerThreads, len(jobs))
+        batches  = [jobs[i::nWorkers] for i in range(nWorkers)]
+
+        try:
+            self.picklePool.map_async(writeJobPickles, batches).get(self.pickleTimeout)
+        except multiprocessing.TimeoutError:
+            msg =  "Timed out after %i seconds writing %i job pickles" % (self.pickleTimeout,
+                                                                         len(jobs))
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            self.picklePool.terminate()
+            self.picklePool = None
+            raise JobCreatorException(msg)
+        except Exception, ex:
+            msg =  "Encountered exception writing job pickles\n"
+            msg += str(ex)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobCreatorException(msg)
+
+        logging.info("Wrote %i job pickles with %i processes" % (len(jobs), nWorkers))
+        return
+
     def advanceJobGroup(self, wmbsJobGroup):
         """
         _advanceJobGroup_
@@ -15,6 +15,7 @@ import threading
 import os.path
 import cPickle
 import traceback
+import Queue
 
 # WMBS objects
 from WMCore.DAOFactory        import DAOFactory
@@ -28,6 +29,8 @@ from WMCore.WMBase                            import getWMBASE
 from WMCore.WMException                       import WMException
 from WMCore.BossAir.BossAirAPI                import BossAirAPI
 
+from WMComponent.JobSubmitter.SubmitQueue     import SubmitQueue
+
 def siteListCompare(a, b):
     """
     _siteListCompare_
@@ -44,6 +47,66 @@ def siteListCompare(a, b):
     return -1
 
 
+class JobPackageWriter(threading.Thread):
+    """
+    _JobPackageWriter_
+
+    Write job packages to disk in the background so that building the packages
+    isn't held up by the latency of the filesystem.
+    """
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.queue  = Queue.Queue()
+        self.errors = []
+        return
+
+    def write(self, jobPackage, batchDir):
+        """
+        _write_
+
+        Queue a job package to be written into the batch directory.  The
+        package must not be modified afterwards.
+        """
+        self.queue.put((jobPackage, batchDir))
+        return
+
+    def wait(self):
+        """
+        _wait_
+
+        Wait until all the queued packages have been written and return the
+        errors hit while writing them.
+        """
+        self.queue.join()
+        errors = self.errors
+        self.errors = []
+        return errors
+
+    def run(self):
+        """
+        _run_
+
+        Write packages as they are queued.
+        """
+        while True:
+            (jobPackage, batchDir) = self.queue.get()
+            try:
+                try:
+                    if not os.path.exists(batchDir):
+                        os.makedirs(batchDir)
+
+                    jobPackage.save(os.path.join(batchDir, "JobPackage.pkl"))
+                except Exception, ex:
+                    msg =  "Error while writing job package to %s\n" % batchDir
+                    msg += str(ex)
+                    msg += str(traceback.format_exc())
+                    self.errors.append(msg)
+            finally:
+                self.queue.task_done()
+
+        return
+
 class JobSubmitterPollerException(WMException):
     """
     _JobSubmitterPollerException_
@@ -83,9 +146,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.bossAir = BossAirAPI(config = self.config)
 
         # Additions for caching-based JobSubmitter
-        self.cachedJobIDs   = set()
-        self.cachedJobs     = {}
-        self.jobDataCache   = {}
+        self.cachedJobs     = SubmitQueue()
         self.jobsToPackage  = {}
         self.sandboxPackage = {}
         self.siteKeys       = {}
@@ -95,6 +156,10 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.packageSize    = getattr(self.config.JobSubmitter, 'packageSize', 500)
         self.collSize       = getattr(self.config.JobSubmitter, 'collectionSize',
                                       self.packageSize * 1000)
+        self.siteChunkSize  = getattr(self.config.JobSubmitter, 'siteChunkSize', 5000)
+        self.packageCollections = {}
+        self.packageWriter  = JobPackageWriter()
+        self.packageWriter.start()
 
         # initialize the alert framework (if available)
         self.initAlerts(compName = "JobSubmitter")
@@ -121,6 +186,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         # Now the DAOs
         self.listJobsAction = self.daoFactory(classname = "Jobs.ListForSubmitter")
+        self.listSitesAction = self.daoFactory(classname = "Jobs.ListSubmitSites")
         self.setLocationAction = self.daoFactory(classname = "Jobs.SetLocation")
 
         # Now the error report
@@ -129,6 +195,14 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         self.locationAction = self.daoFactory(classname = "Locations.GetSiteInfo")
 
+        # The submit info tables only exist once the WMBS schema has been
+        # upgraded, until then every job is unpickled.  Restart the component
+        # after running the upgrade.
+        upgradeAction = self.daoFactory(classname = "Upgrade")
+        self.useSubmitInfo = not "wmbs_job_submit_info" in upgradeAction.pending()
+        if not self.useSubmitInfo:
+            logging.warning("WMBS schema has no submit info tables, run wmcore-db-init --upgrade")
+
         # Call once to fill the siteKeys
         # TODO: Make this less clumsy!
         self.getThresholds()
@@ -137,36 +211,44 @@ class JobSubmitterPoller(BaseWorkerThread):
     def getPackageCollection(self, sandboxDir):
         """
         _getPackageCollection_
-        
-        Given a jobID figure out which packageCollection
-        it should belong in.
-        """
-
-        rawList     = os.listdir(sandboxDir)
-        collections = []
-        numberList  = []
-        for entry in rawList:
-            if 'PackageCollection' in entry:
-                collections.append(entry)
-
-        # If we have no collections, return 0 (PackageCollection_0)
-        if len(collections) < 1:
-            return 0
-
-        # Loop over the list of PackageCollections
-        for collection in collections:
-            collectionPath = os.path.join(sandboxDir, collection)
-            packageList    = os.listdir(collectionPath)
-            collectionNum  = int(collection.split('_')[1])
-            if len(packageList) < self.collSize:
-                return collectionNum
-            else:
-                numberList.append(collectionNum)
 
-        # If we got here, then all collections are full.  We'll need
-        # a new one.  Find the highest number, increment by one
-        numberList.sort()
-        return numberList[-1] + 1
+        Figure out which packageCollection the next batch for a sandbox should
+        go into.  The sandbox directory is only scanned the first time, after
+        that the number of batches in the current collection is tracked in
+        memory.  Every call counts as a new batch in the collection returned.
+        """
+        if not self.packageCollections.has_key(sandboxDir):
+            self.packageCollections[sandboxDir] = self.scanPackageCollections(sandboxDir)
+
+        collection = self.packageCollections[sandboxDir]
+        if collection[1] >= self.collSize:
+            # The current collection is full, start a new one
+            collection[0] += 1
+            collection[1] = 0
+
+        collection[1] += 1
+        return collection[0]
+
+    def scanPackageCollections(self, sandboxDir):
+        """
+        _scanPackageCollections_
+
+        Find the highest numbered packageCollection for a sandbox and the
+        number of batches it contains.  Return them as a list.
+        """
+        collectionNum = 0
+        for entry in os.listdir(sandboxDir):
+            if entry.startswith('PackageCollection_'):
+                try:
+                    collectionNum = max(collectionNum, int(entry.split('_')[1]))
+                except ValueError:
+                    continue
+
+        collectionPath = os.path.join(sandboxDir, 'PackageCollection_%i' % collectionNum)
+        if not os.path.isdir(collectionPath):
+            return [collectionNum, 0]
+
+        return [collectionNum, len(os.listdir(collectionPath))]
 
     def addJobsToPackage(self, loadedJob):
         """
@@ -199,11 +281,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         batchDir = jobPackage['directory']
 
         if len(jobPackage.keys()) == self.packageSize:
-            if not os.path.exists(batchDir):
-                os.makedirs(batchDir)
-
-            batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+            self.packageWriter.write(jobPackage, batchDir)
             del self.jobsToPackage[loadedJob["workflow"]]
 
         return batchDir
@@ -212,24 +290,100 @@ class JobSubmitterPoller(BaseWorkerThread):
         """
         _flushJobPackages_
 
-        Write any jobs packages to disk that haven't been written out already.
+        Write any jobs packages to disk that haven't been written out already
+        and wait for the package writer to finish.
         """
         workflowNames = self.jobsToPackage.keys()
         for workflowName in workflowNames:
-            batchID    = self.jobsToPackage[workflowName]["batchid"]
-            id         = self.jobsToPackage[workflowName]["id"]
             jobPackage = self.jobsToPackage[workflowName]["package"]
-            batchDir   = jobPackage['directory']
-
-            if not os.path.exists(batchDir):
-                os.makedirs(batchDir)
-
-            batchPath = os.path.join(batchDir, "JobPackage.pkl")
-            jobPackage.save(batchPath)
+            self.packageWriter.write(jobPackage, jobPackage['directory'])
             del self.jobsToPackage[workflowName]
 
+        errors = self.packageWriter.wait()
+        if len(errors) > 0:
+            msg = "\n".join(errors)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobSubmitterPollerException(msg)
+
         return
 
+    def loadJobPickle(self, cacheDir):
+        """
+        _loadJobPickle_
+
+        Load a job from the pickle in its cache directory.  Return None if
+        the pickle doesn't exist.
+        """
+        pickledJobPath = os.path.join(cacheDir, "job.pkl")
+
+        if not os.path.isfile(pickledJobPath):
+            # Then we have a problem - there's no file
+            logging.error("Could not find pickled jobObject %s" % pickledJobPath)
+            return None
+        try:
+            jobHandle = open(pickledJobPath, "r")
+            loadedJob = cPickle.load(jobHandle)
+            jobHandle.close()
+        except Exception, ex:
+            msg =  "Error while loading pickled job object %s\n" % pickledJobPath
+            msg += str(ex)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
+            raise JobSubmitterPollerException(msg)
+
+        return loadedJob
+
+    def submitInfoFromIndex(self, newJob, sites):
+        """
+        _submitInfoFromIndex_
+
+        Build the submit information for a job from the columns returned by
+        Jobs.ListForSubmitter and the site lists returned by
+        Jobs.ListSubmitSites.
+        """
+        return {"sandbox": newJob["sandbox"],
+                "ownerDN": newJob["owner_dn"],
+                "ownerGroup": newJob["owner_group"] or '',
+                "ownerRole": newJob["owner_role"] or '',
+                "priority": newJob["priority"],
+                "scramArch": newJob["scram_arch"],
+                "swVersion": newJob["sw_version"],
+                "siteWhitelist": sites["siteWhitelist"],
+                "siteBlacklist": sites["siteBlacklist"],
+                "locations": sites["locations"]}
+
+    def submitInfoFromJob(self, loadedJob):
+        """
+        _submitInfoFromJob_
+
+        Build the submit information for a job from the unpickled job.
+        """
+        return {"sandbox": loadedJob["sandbox"],
+                "ownerDN": loadedJob.get("ownerDN", None),
+                "ownerGroup": loadedJob.get("ownerGroup", ''),
+                "ownerRole": loadedJob.get("ownerRole", ''),
+                "priority": loadedJob.get("priority", None),
+                "scramArch": loadedJob.get("scramArch", None),
+                "swVersion": loadedJob.get("swVersion", None),
+                "siteWhitelist": loadedJob["siteWhitelist"],
+                "siteBlacklist": loadedJob["siteBlacklist"],
+                "locations": loadedJob["input_files"][0]["locations"]}
+
+    def packageJob(self, cachedJob):
+        """
+        _packageJob_
+
+        Load a cached job from its pickle and add it to a job package.  Return
+        the batch directory or None if the job couldn't be loaded.
+        """
+        loadedJob = self.loadJobPickle(cachedJob[4])
+        if loadedJob == None:
+            return None
+
+        loadedJob['retry_count'] = cachedJob[1]
+        return self.addJobsToPackage(loadedJob)
+
     def refreshCache(self):
         """
         _refreshCache_
@@ -239,10 +393,14 @@ class JobSubmitterPoller(BaseWorkerThread):
         don't unpickle them and combine their site white and black list with
         the list of locations they can run at.  Add them to the cache.
 
+        The information needed to schedule a job is stored in WMBS by the
+        JobCreator and returned by the query, so only jobs created without it
+        have to be unpickled.
+
         Each entry in the cache is a tuple with five items:
           - WMBS Job ID
           - Retry count
-          - Batch ID
+          - Batch ID, None until the job is packaged
           - Path to sanbox
           - Path to cache directory
         """
@@ -250,41 +408,41 @@ class JobSubmitterPoller(BaseWorkerThread):
         dbJobs = set()
 
         logging.info("Querying WMBS for jobs to be submitted...")
-        newJobs = self.listJobsAction.execute()
-        logging.info("Found %s new jobs to be submitted." % len(newJobs))
+        newJobs = []
+        for newJob in self.listJobsAction.execute(stream = True,
+                                                  submitInfo = self.useSubmitInfo):
+            dbJobs.add(newJob['id'])
+            if not newJob['id'] in self.cachedJobs:
+                newJobs.append(newJob)
+
+        # The site lists are loaded a chunk of jobs at a time, in the same
+        # order as the jobs are processed.
+        infoJobs = []
+        if self.useSubmitInfo:
+            infoJobs = [x['id'] for x in newJobs if x["sandbox"] != None]
+        jobSites = {}
 
         logging.info("Determining possible sites for new jobs...")
         jobCount = 0
         for newJob in newJobs:
             jobID = newJob['id']
-            dbJobs.add(jobID)
-            if jobID in self.cachedJobIDs:
-                continue
-
             jobCount += 1
             if jobCount % 5000 == 0:
-                logging.info("Processed %d/%d new jobs." % (jobCount, len(newJobs)))
+                logging.info("Processed %d new jobs." % jobCount)
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.error("Could not find pickled jobObject %s" % pickledJobPath)
-                badJobs.append(newJob)
-                continue
-            try:
-                jobHandle = open(pickledJobPath, "r")
-                loadedJob = cPickle.load(jobHandle)
-                jobHandle.close()
-            except Exception, ex:
-                msg =  "Error while loading pickled job object %s\n" % pickledJobPath
-                msg += str(ex)
-                logging.error(msg)
-                self.sendAlert(6, msg = msg)
-                raise JobSubmitterPollerException(msg)
-
-
-            loadedJob['retry_count'] = newJob['retry_count']
+            if self.useSubmitInfo and newJob["sandbox"] != None:
+                if not jobSites.has_key(jobID):
+                    jobSites = self.listSitesAction.execute(jobs = infoJobs[:self.siteChunkSize])
+                    del infoJobs[:self.siteChunkSize]
+                submitInfo = self.submitInfoFromIndex(newJob, jobSites[jobID])
+            else:
+                # The job was created before the JobCreator stored its submit
+                # information in WMBS, we have to unpickle it.
+                loadedJob = self.loadJobPickle(newJob["cache_dir"])
+                if loadedJob == None:
+                    badJobs.append(newJob)
+                    continue
+                submitInfo = self.submitInfoFromJob(loadedJob)
 
             # Grab the possible locations
             # This should be in terms of siteNames
@@ -292,7 +450,7 @@ class JobSubmitterPoller(BaseWorkerThread):
             # And each of them can be a separate location
             # Note that all the files in a job have the same set of locations
             possibleLocations = set()
-            rawLocations      = loadedJob["input_files"][0]["locations"]
+            rawLocations      = submitInfo["locations"]
 
             # Transform se into siteNames
             for loc in rawLocations:
@@ -304,14 +462,14 @@ class JobSubmitterPoller(BaseWorkerThread):
                     for siteName in self.siteKeys[loc]:
                         possibleLocations.add(siteName)
 
-            if len(loadedJob["siteWhitelist"]) > 0:
+            if len(submitInfo["siteWhitelist"]) > 0:
                 whiteList = []
-                for cmsName in loadedJob["siteWhitelist"]:
+                for cmsName in submitInfo["siteWhitelist"]:
                     whiteList.extend(self.cmsNames.get(cmsName, []))
                 possibleLocations = possibleLocations & set(whiteList)
-            if len(loadedJob["siteBlacklist"]) > 0:
+            if len(submitInfo["siteBlacklist"]) > 0:
                 blackList = []
-                for cmsName in loadedJob["siteBlacklist"]:
+                for cmsName in submitInfo["siteBlacklist"]:
                     blackList.extend(self.cmsNames.get(cmsName, []))
                 possibleLocations = possibleLocations - set(blackList)
 
@@ -325,39 +483,26 @@ class JobSubmitterPoller(BaseWorkerThread):
                 badJobs.append(newJob)
                 continue
 
-            batchDir = self.addJobsToPackage(loadedJob)
-            self.cachedJobIDs.add(jobID)
-
-            for possibleLocation in possibleLocations:
-                if not self.cachedJobs.has_key(possibleLocation):
-                    self.cachedJobs[possibleLocation] = {}
-                if not self.cachedJobs[possibleLocation].has_key(newJob["type"]):
-                    self.cachedJobs[possibleLocation][newJob["type"]] = {}
-
-                locTypeCache = self.cachedJobs[possibleLocation][newJob["type"]]
-                workflowName = newJob['workflow']
-                if not locTypeCache.has_key(workflowName):
-                    locTypeCache[workflowName] = set()
-                if not self.jobDataCache.has_key(workflowName):
-                    self.jobDataCache[workflowName] = {}
-
-                locTypeCache[workflowName].add(jobID)
-
-            # Now that we're out of that loop, put the job data in the cache
+            # Put the job in the queues of all the sites it can run at.
+            # The job is only packaged once it has been assigned to a site.
             jobInfo = (jobID,
                        newJob["retry_count"],
-                       batchDir,
-                       loadedJob["sandbox"],
-                       loadedJob["cache_dir"],
-                       loadedJob.get("ownerDN", None),
-                       loadedJob.get("ownerGroup", ''),
-                       loadedJob.get("ownerRole", ''),
-                       loadedJob.get("priority", None),
+                       None,
+                       submitInfo["sandbox"],
+                       newJob["cache_dir"],
+                       submitInfo["ownerDN"],
+                       submitInfo["ownerGroup"],
+                       submitInfo["ownerRole"],
+                       submitInfo["priority"],
                        frozenset(possibleLocations),
-                       loadedJob.get("scramArch", None),
-                       loadedJob.get("swVersion", None))
-            
-            self.jobDataCache[workflowName][jobID] = jobInfo
+                       submitInfo["scramArch"],
+                       submitInfo["swVersion"])
+
+            self.cachedJobs.addJob(jobID, newJob["type"], newJob["workflow"],
+                                   submitInfo["priority"], possibleLocations,
+                                   jobInfo)
+
+        logging.info("Found %s new jobs to be submitted." % jobCount)
 
         if len(badJobs) > 0:
             logging.error("The following jobs have no possible sites to run at: %s" % badJobs)
@@ -366,29 +511,14 @@ class JobSubmitterPoller(BaseWorkerThread):
                 job['fwjr']         = self.noSiteErrorReport
             self.changeState.propagate(badJobs, "submitfailed", "created")
 
-        # If there are any leftover jobs, we want to get rid of them.
-        self.flushJobPackages()
         logging.info("Done with refreshCache() loop, pruning killed jobs.")
 
         # We need to remove any jobs from the cache that were not returned in
         # the last call to the database.
-        jobIDsToPurge = self.cachedJobIDs - dbJobs
-        self.cachedJobIDs -= jobIDsToPurge
-
-        if len(jobIDsToPurge) == 0:
-            return
-
-        for siteName in self.cachedJobs.keys():
-            for taskType in self.cachedJobs[siteName].keys():
-                for workflow in self.cachedJobs[siteName][taskType].keys():
-                    for cachedJobID in list(self.cachedJobs[siteName][taskType][workflow]):
-                        if cachedJobID in jobIDsToPurge:
-                            self.cachedJobs[siteName][taskType][workflow].remove(cachedJobID)
-                            try:
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except KeyError:
-                                # Already gone
-                                pass
+        jobIDsToPurge = self.cachedJobs.jobIDs() - dbJobs
+
+        for cachedJobID in jobIDsToPurge:
+            self.cachedJobs.removeJob(cachedJobID)
 
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
@@ -443,14 +573,15 @@ class JobSubmitterPoller(BaseWorkerThread):
           - SE name of the site to run at
         """
         jobsToSubmit = {}
-        jobsToPrune = {}
+        assignedJobs = []
+        badJobs = []
 
         rcThresholds = self.getThresholds()
 
         for siteName in rcThresholds.keys():
 
             totalRunning = None
-            if not self.cachedJobs.has_key(siteName):
+            if not self.cachedJobs.hasJobs(siteName):
                 logging.debug("No jobs for site %s" % siteName)
                 continue
             logging.debug("Have site %s" % siteName)
@@ -474,118 +605,79 @@ class JobSubmitterPoller(BaseWorkerThread):
                     logging.error(msg)
                     continue
 
-                # Ignore this threshold if we've cleaned out the site
-                if not self.cachedJobs.has_key(siteName):
-                    continue
-
                 # Ignore this threshold if we have no jobs
                 # for it
-                if not self.cachedJobs[siteName].has_key(taskType):
+                if not self.cachedJobs.hasJobs(siteName, taskType):
                     continue
 
-                taskCache = self.cachedJobs[siteName][taskType]
-
                 # Calculate number of jobs we need
                 nJobsRequired = min((totalSlots - totalRunning), (maxSlots - taskRunning))
-                breakLoop = False
                 logging.debug("nJobsRequired for task %s: %i" % (taskType, nJobsRequired))
 
                 while nJobsRequired > 0:
-                    # Do this until we have all the jobs for this threshold
-
-                    # Pull a job out of the cache for the task/site.  Verify that we
-                    # haven't already used this job in this polling cycle.
-                    cachedJob = None
-                    cachedJobWorkflow = None
-
-                    workflows = taskCache.keys()
-                    workflows.sort()
-
-                    for workflow in workflows:
-                        # Run a while loop until you get a job
-                        while len(taskCache[workflow]) > 0:
-                            cachedJobID = taskCache[workflow].pop()
-                            try:
-                                cachedJob   = self.jobDataCache[workflow].get(cachedJobID, None)
-                                del self.jobDataCache[workflow][cachedJobID]
-                            except:
-                                pass
-
-                            if cachedJobID not in jobsToPrune.get(workflow, set()):
-                                cachedJobWorkflow = workflow
-                                break
-                            else:
-                                cachedJob = None
-
-                        # Remove the entry in the cache for the workflow if it is empty.
-                        if len(self.cachedJobs[siteName][taskType][workflow]) == 0:
-                            del self.cachedJobs[siteName][taskType][workflow]
-                        if self.jobDataCache.has_key(workflow) and len(self.jobDataCache[workflow].keys()) == 0:
-                            del self.jobDataCache[workflow]
-
-                        if cachedJob:
-                            # We found a job, bail out and handle it.
-                            break
-
-                    # Check to see if we need to delete this site from the cache
-                    if len(self.cachedJobs[siteName][taskType].keys()) == 0:
-                        del self.cachedJobs[siteName][taskType]
-                        breakLoop = True
-                    if len(self.cachedJobs[siteName].keys()) == 0:
-                        del self.cachedJobs[siteName]
-                        breakLoop = True
+                    # Do this until we have all the jobs for this threshold.
+                    # Pulling a job out of the queue for this site removes it
+                    # from the queues of all other sites.
+                    cachedJob = self.cachedJobs.popJob(siteName, taskType)
 
                     if not cachedJob:
                         # We didn't find a job, bail out.
                         # This site and task type is done
                         break
 
-                    self.cachedJobIDs.remove(cachedJob[0])
-
-                    if not jobsToPrune.has_key(cachedJobWorkflow):
-                        jobsToPrune[cachedJobWorkflow] = set()
-
-                    jobsToPrune[cachedJobWorkflow].add(cachedJob[0])
-
-                    # Sort jobs by jobPackage
-                    package = cachedJob[2]
-                    if not package in jobsToSubmit.keys():
-                        jobsToSubmit[package] = []
-
-                    # Add the sandbox to a global list
-                    self.sandboxPackage[package] = cachedJob[3]
-
-                    # Create a job dictionary object
-                    jobDict = {'id': cachedJob[0],
-                               'retry_count': cachedJob[1],
-                               'custom': {'location': siteName},
-                               'cache_dir': cachedJob[4],
-                               'packageDir': package,
-                               'userdn': cachedJob[5],
-                               'usergroup': cachedJob[6],
-                               'userrole': cachedJob[7],
-                               'priority': cachedJob[8],
-                               'taskType': taskType,
-                               'possibleSites': cachedJob[9],
-                               'scramArch': cachedJob[10],
-                               'swVersion': cachedJob[11]}
-
-                    # Add to jobsToSubmit
-                    jobsToSubmit[package].append(jobDict)
+                    # The jobs are packaged once all of them have been assigned
+                    assignedJobs.append((cachedJob, siteName, taskType))
 
                     # Deal with accounting
                     nJobsRequired -= 1
                     totalRunning  += 1
 
-                    if breakLoop:
-                        break
+        # Package the jobs in the order they were created and sort them by
+        # package.
+        assignedJobs.sort(key = lambda x: x[0][0])
+        for (cachedJob, siteName, taskType) in assignedJobs:
+            package = cachedJob[2]
+            if package == None:
+                package = self.packageJob(cachedJob)
+            if package == None:
+                badJobs.append({'id': cachedJob[0],
+                                'retry_count': cachedJob[1],
+                                'cache_dir': cachedJob[4]})
+                continue
 
-        # Remove the jobs that we're going to submit from the cache.
-        for siteName in self.cachedJobs.keys():
-            for taskType in self.cachedJobs[siteName].keys():
-                for workflow in self.cachedJobs[siteName][taskType].keys():
-                    if workflow in jobsToPrune.keys():
-                        self.cachedJobs[siteName][taskType][workflow] -= jobsToPrune[workflow]
+            if not package in jobsToSubmit.keys():
+                jobsToSubmit[package] = []
+
+            # Add the sandbox to a global list
+            self.sandboxPackage[package] = cachedJob[3]
+
+            # Create a job dictionary object
+            jobDict = {'id': cachedJob[0],
+                       'retry_count': cachedJob[1],
+                       'custom': {'location': siteName},
+                       'cache_dir': cachedJob[4],
+                       'packageDir': package,
+                       'userdn': cachedJob[5],
+                       'usergroup': cachedJob[6],
+                       'userrole': cachedJob[7],
+                       'priority': cachedJob[8],
+                       'taskType': taskType,
+                       'possibleSites': cachedJob[9],
+                       'scramArch': cachedJob[10],
+                       'swVersion': cachedJob[11]}
+
+            # Add to jobsToSubmit
+            jobsToSubmit[package].append(jobDict)
+
+        # Write out the packages for the jobs we're about to submit.
+        self.flushJobPackages()
+
+        if len(badJobs) > 0:
+            logging.error("The following jobs have no job pickle: %s" % badJobs)
+            for job in badJobs:
+                job['couch_record'] = None
+                job['fwjr']         = self.noSiteErrorReport
+            self.changeState.propagate(badJobs, "submitfailed", "created")
 
         logging.info("Have %s packages to submit." % len(jobsToSubmit))
         logging.info("Done assigning site locations.")
@@ -668,7 +760,9 @@ class JobSubmitterPoller(BaseWorkerThread):
             myThread = threading.currentThread()
             self.refreshCache()
             jobsToSubmit = self.assignJobLocations()
+            nJobs = sum([len(x) for x in jobsToSubmit.values()])
             self.submitJobs(jobsToSubmit = jobsToSubmit)
+            self.reportWork(nJobs)
 
 
         except WMException:
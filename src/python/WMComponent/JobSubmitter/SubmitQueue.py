@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+_SubmitQueue_
+
+Cache of the jobs waiting to be submitted by the JobSubmitter.  Jobs are kept
+in one priority heap per site and task type so that pulling the next job for
+a site is a heap pop, and a reverse index from each job to the sites it can
+run at lets a job be dropped without walking the other heaps.  Entries for
+jobs that were dropped are discarded lazily when they reach the top of a
+heap, a heap is compacted once more than half of its entries are stale.
+"""
+
+import heapq
+
+class SubmitQueue(object):
+    """
+    _SubmitQueue_
+
+    Per site, per task type priority queues of cached jobs.  Jobs with a
+    higher priority come out first, ties are broken by workflow and then by
+    job ID.
+    """
+    def __init__(self):
+        self.queues = {}
+        self.staleEntries = {}
+        self.jobs = {}
+        self.serial = 0
+        return
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __contains__(self, jobID):
+        return jobID in self.jobs
+
+    def jobIDs(self):
+        """
+        _jobIDs_
+
+        Return the set of cached job IDs.
+        """
+        return set(self.jobs.keys())
+
+    def getJob(self, jobID):
+        """
+        _getJob_
+
+        Return the cached information for a job, or None if the job isn't in
+        the cache.
+        """
+        if not jobID in self.jobs:
+            return None
+        return self.jobs[jobID][1]
+
+    def sites(self):
+        """
+        _sites_
+
+        Return the sites that have jobs queued.
+        """
+        return self.queues.keys()
+
+    def hasJobs(self, siteName, taskType = None):
+        """
+        _hasJobs_
+
+        Tell if there are any jobs queued for a site, optionally only for the
+        given task type.  This may count jobs that were already removed but
+        haven't been discarded from the heap yet.
+        """
+        if not siteName in self.queues:
+            return False
+        if taskType == None:
+            return True
+        return taskType in self.queues[siteName]
+
+    def addJob(self, jobID, taskType, workflow, priority, sites, jobInfo):
+        """
+        _addJob_
+
+        Add a job to the queues of all the sites it can run at.  Adding a job
+        that is already cached replaces it.
+        """
+        if jobID in self.jobs:
+            self.removeJob(jobID)
+
+        self.serial += 1
+        entry = (-(priority or 0), workflow, jobID, self.serial)
+        self.jobs[jobID] = (self.serial, jobInfo, taskType, frozenset(sites))
+
+        for siteName in sites:
+            siteQueues = self.queues.setdefault(siteName, {})
+            heapq.heappush(siteQueues.setdefault(taskType, []), entry)
+
+        return
+
+    def removeJob(self, jobID):
+        """
+        _removeJob_
+
+        Remove a job from the cache and return its information.  The heap
+        entries at the other sites are left behind and discarded later.
+        """
+        if not jobID in self.jobs:
+            return None
+
+        (serial, jobInfo, taskType, sites) = self.jobs.pop(jobID)
+        for siteName in sites:
+            key = (siteName, taskType)
+            self.staleEntries[key] = self.staleEntries.get(key, 0) + 1
+            self.compact(siteName, taskType)
+
+        return jobInfo
+
+    def popJob(self, siteName, taskType):
+        """
+        _popJob_
+
+        Remove the highest priority job for the given site and task type from
+        the cache and return its information.  Return None if there are no
+        jobs left for the site and task type.
+        """
+        heap = self.queues.get(siteName, {}).get(taskType, None)
+        jobInfo = None
+
+        while heap:
+            entry = heapq.heappop(heap)
+            jobID = entry[2]
+            if self.jobs.get(jobID, (None,))[0] == entry[3]:
+                jobInfo = self.removeJob(jobID)
+                self.discardEntry(siteName, taskType)
+                break
+            self.discardEntry(siteName, taskType)
+
+        # Removing the job may have compacted or dropped the heap
+        heap = self.queues.get(siteName, {}).get(taskType, None)
+        if heap != None and len(heap) == 0:
+            self.dropQueue(siteName, taskType)
+
+        return jobInfo
+
+    def discardEntry(self, siteName, taskType):
+        """
+        _discardEntry_
+
+        Account for a stale entry that was popped off a heap.
+        """
+        key = (siteName, taskType)
+        if self.staleEntries.get(key, 0) > 0:
+            self.staleEntries[key] -= 1
+        return
+
+    def compact(self, siteName, taskType):
+        """
+        _compact_
+
+        Rebuild the heap for a site and task type once more than half of its
+        entries belong to jobs that are no longer cached.
+        """
+        key = (siteName, taskType)
+        heap = self.queues.get(siteName, {}).get(taskType, None)
+        if heap == None:
+            self.staleEntries.pop(key, None)
+            return
+
+        if self.staleEntries.get(key, 0) * 2 <= len(heap):
+            return
+
+        liveEntries = [x for x in heap if self.jobs.get(x[2], (None,))[0] == x[3]]
+        if len(liveEntries) == 0:
+            self.dropQueue(siteName, taskType)
+            return
+
+        heapq.heapify(liveEntries)
+        self.queues[siteName][taskType] = liveEntries
+        self.staleEntries[key] = 0
+        return
+
+    def dropQueue(self, siteName, taskType):
+        """
+        _dropQueue_
+
+        Remove the heap for a site and task type, and the site itself if it
+        has no other heaps.
+        """
+        self.staleEntries.pop((siteName, taskType), None)
+        siteQueues = self.queues.get(siteName, {})
+        siteQueues.pop(taskType, None)
+        if len(siteQueues) == 0:
+            self.queues.pop(siteName, None)
+        return
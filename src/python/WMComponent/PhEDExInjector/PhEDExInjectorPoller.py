@@ -3,13 +3,22 @@
 _PhEDExInjectorPoller_
 
 Poll the DBSBuffer database and inject files as they are created.
+
+Files for different PhEDEx nodes are injected concurrently by a bounded
+number of threads, each with its own connection to the data service.  The
+files for a node are split into injections of at most maxInjectionFiles
+files, every injection is retried a few times and the status of its files
+is committed as soon as it succeeds, so one slow or failing node doesn't
+hold back the others.
 """
 
 import threading
 import logging
 import traceback
+import Queue
 
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
+from WMCore.WorkerThreads.CycleStats import currentStats, runWithStats
 
 from WMCore.Services.PhEDEx import XMLDrop
 from WMCore.Services.PhEDEx.PhEDEx import PhEDEx
@@ -48,6 +57,11 @@ class PhEDExInjectorPoller(BaseWorkerThread):
         self.dbsUrl = config.DBSInterface.globalDBSUrl 
         self.group = getattr(config.PhEDExInjector, "group", "DataOps")
 
+        self.injectionThreads = getattr(config.PhEDExInjector, "injectionThreads", 5)
+        self.injectionTimeout = getattr(config.PhEDExInjector, "injectionTimeout", 300)
+        self.injectionRetries = getattr(config.PhEDExInjector, "injectionRetries", 2)
+        self.maxInjectionFiles = getattr(config.PhEDExInjector, "maxInjectionFiles", 5000)
+
         # This will be used to map SE names which are stored in the DBSBuffer to
         # PhEDEx node names.  The first key will be the "kind" which consists
         # of one of the following: MSS, Disk, Buffer.  The next key will be the
@@ -128,34 +142,118 @@ class PhEDExInjectorPoller(BaseWorkerThread):
 
         return injectionSpec.save()
     
+    def mapLocation(self, siteName):
+        """
+        _mapLocation_
+
+        SE names can be stored in DBSBuffer as that is what is returned in
+        the framework job report.  We'll try to map the SE name to a
+        PhEDEx node name here.  Return None if there is no mapping.
+        """
+        location = None
+
+        if siteName in self.nodeNames:
+            location = siteName
+        else:
+            if self.seMap.has_key("Buffer") and \
+                   self.seMap["Buffer"].has_key(siteName):
+                location = self.seMap["Buffer"][siteName]
+            elif self.seMap.has_key("MSS") and \
+                     self.seMap["MSS"].has_key(siteName):
+                location = self.seMap["MSS"][siteName]
+            elif self.seMap.has_key("Disk") and \
+                     self.seMap["Disk"].has_key(siteName):
+                location = self.seMap["Disk"][siteName]
+
+        return location
+
+    def splitInjectionData(self, injectionData):
+        """
+        _splitInjectionData_
+
+        Split the injection data for a node into pieces with at most
+        maxInjectionFiles files each.  Blocks with more files than that are
+        split across several pieces.
+        """
+        pieces = []
+        piece = {}
+        nFiles = 0
+
+        for datasetPath in injectionData:
+            for blockName, fileBlock in injectionData[datasetPath].iteritems():
+                files = fileBlock["files"]
+                start = 0
+                while True:
+                    if nFiles >= self.maxInjectionFiles:
+                        pieces.append(piece)
+                        piece = {}
+                        nFiles = 0
+
+                    end = start + self.maxInjectionFiles - nFiles
+                    blockPiece = {"is-open": fileBlock["is-open"],
+                                  "files": files[start:end]}
+                    piece.setdefault(datasetPath, {})[blockName] = blockPiece
+                    nFiles += len(blockPiece["files"])
+
+                    start = end
+                    if start >= len(files):
+                        break
+
+        if len(piece) > 0:
+            pieces.append(piece)
+
+        return pieces
+
+    def injectionWorker(self, pending, done):
+        """
+        _injectionWorker_
+
+        Take (location, injectionData) pairs from the pending queue, inject
+        them and put (location, injectionData, result, error) on the done
+        queue.  Failed injections are retried injectionRetries times.
+        """
+        phedex = PhEDEx({"endpoint": self.config.PhEDExInjector.phedexurl,
+                         "timeout": self.injectionTimeout}, "json")
+
+        while True:
+            try:
+                (location, injectionData) = pending.get_nowait()
+            except Queue.Empty:
+                break
+
+            xmlData = self.createInjectionSpec(injectionData)
+            injectRes = None
+            error = None
+            for attempt in range(self.injectionRetries + 1):
+                try:
+                    injectRes = phedex.injectBlocks(location, xmlData)
+                    error = None
+                    break
+                except Exception, ex:
+                    # If we get an error here, assume that it's temporary (it usually is)
+                    error = "Encountered error while attempting to inject blocks to PhEDEx node %s.\n" % location
+                    error += str(ex)
+                    logging.error(error)
+                    logging.debug("Traceback: %s" % str(traceback.format_exc()))
+
+            done.put((location, injectionData, injectRes, error))
+
+        return
+
     def injectFiles(self):
         """
         _injectFiles_
 
-        Inject any uninjected files in PhEDEx.
+        Inject any uninjected files in PhEDEx.  The status of the files is
+        committed in its own transaction after each successful injection.
         """
         myThread = threading.currentThread()
         uninjectedFiles = self.getUninjected.execute()
 
-        injectedFiles = []
+        pending = Queue.Queue()
+        nInjections = 0
         for siteName in uninjectedFiles.keys():
-            # SE names can be stored in DBSBuffer as that is what is returned in
-            # the framework job report.  We'll try to map the SE name to a
-            # PhEDEx node name here. 
-            location = None
-
-            if siteName in self.nodeNames:
-                location = siteName
-            else:
-                if self.seMap.has_key("Buffer") and \
-                       self.seMap["Buffer"].has_key(siteName):
-                    location = self.seMap["Buffer"][siteName]                    
-                elif self.seMap.has_key("MSS") and \
-                         self.seMap["MSS"].has_key(siteName):
-                    location = self.seMap["MSS"][siteName]
-                elif self.seMap.has_key("Disk") and \
-                         self.seMap["Disk"].has_key(siteName):
-                    location = self.seMap["Disk"][siteName]
+            location = self.mapLocation(siteName)
 
             if location == None:
                 msg = "Could not map SE %s to PhEDEx node." % siteName
@@ -163,35 +261,64 @@ class PhEDExInjectorPoller(BaseWorkerThread):
                 self.sendAlert(7, msg = msg)
                 continue
 
-            xmlData = self.createInjectionSpec(uninjectedFiles[siteName])
+            for injectionData in self.splitInjectionData(uninjectedFiles[siteName]):
+                pending.put((location, injectionData))
+                nInjections += 1
+
+        if nInjections == 0:
+            self.reportWork(0)
+            return
+
+        done = Queue.Queue()
+        for i in range(min(self.injectionThreads, nInjections)):
+            worker = threading.Thread(target = runWithStats,
+                                      args = (currentStats(), self.injectionWorker,
+                                              pending, done))
+            worker.setDaemon(True)
+            worker.start()
+
+        # Every attempt can take up to injectionTimeout
+        waitTime = self.injectionTimeout * (self.injectionRetries + 1) + 60
+        failedNodes = set()
+        for i in range(nInjections):
             try:
-                injectRes = self.phedex.injectBlocks(location, xmlData)
-            except Exception, ex:
-                # If we get an error here, assume that it's temporary (it usually is)
-                # log it, and ignore it in the algorithm() loop
-                msg =  "Encountered error while attempting to inject blocks to PhEDEx.\n"
-                msg += str(ex)
+                (location, injectionData, injectRes, error) = done.get(timeout = waitTime)
+            except Queue.Empty:
+                msg = "Timed out waiting for %i PhEDEx injections." % (nInjections - i)
                 logging.error(msg)
-                logging.debug("Traceback: %s" % str(traceback.format_exc()))
-                raise PhEDExInjectorPassableError(msg)
+                self.sendAlert(6, msg = msg)
+                break
+
+            if error != None:
+                failedNodes.add(location)
+                continue
             logging.info("Injection result: %s" % injectRes)
 
-            if not injectRes.has_key("error"):
-                for datasetName in uninjectedFiles[siteName]:
-                    for blockName in uninjectedFiles[siteName][datasetName]:
-                        for file in uninjectedFiles[siteName][datasetName][blockName]["files"]:
-                            injectedFiles.append(file["lfn"])
-            else:
+            if injectRes.has_key("error"):
                 msg = ("Error injecting data %s: %s" %
-                       (uninjectedFiles[siteName], injectRes["error"]))
+                       (injectionData, injectRes["error"]))
                 logging.error(msg)
                 self.sendAlert(6, msg = msg)
+                continue
+
+            injectedFiles = []
+            for datasetName in injectionData:
+                for blockName in injectionData[datasetName]:
+                    for file in injectionData[datasetName][blockName]["files"]:
+                        injectedFiles.append(file["lfn"])
 
-        if len(injectedFiles) > 0:
             logging.debug("Injecting files: %s" % injectedFiles)
-            self.setStatus.execute(injectedFiles, 1, 
+            myThread.transaction.begin()
+            self.setStatus.execute(injectedFiles, 1,
                                    conn = myThread.transaction.conn,
                                    transaction = myThread.transaction)
+            myThread.transaction.commit()
+            self.reportWork(len(injectedFiles))
+
+        if len(failedNodes) > 0:
+            msg = "Failed to inject blocks to PhEDEx nodes: %s" % ", ".join(failedNodes)
+            logging.error(msg)
+            self.sendAlert(6, msg = msg)
 
         return
 
@@ -206,23 +333,7 @@ class PhEDExInjectorPoller(BaseWorkerThread):
 
         closedBlocks = []
         for siteName in migratedBlocks.keys():
-            # SE names can be stored in DBSBuffer as that is what is returned in
-            # the framework job report.  We'll try to map the SE name to a
-            # PhEDEx node name here. 
-            location = None
-
-            if siteName in self.nodeNames:
-                location = siteName
-            else:
-                if self.seMap.has_key("Buffer") and \
-                       self.seMap["Buffer"].has_key(siteName):
-                    location = self.seMap["Buffer"][siteName]                    
-                elif self.seMap.has_key("MSS") and \
-                         self.seMap["MSS"].has_key(siteName):
-                    location = self.seMap["MSS"][siteName]
-                elif self.seMap.has_key("Disk") and \
-                         self.seMap["Disk"].has_key(siteName):
-                    location = self.seMap["Disk"][siteName]
+            location = self.mapLocation(siteName)
 
             if location == None:
                 msg = "Could not map SE %s to PhEDEx node." % siteName
@@ -251,7 +362,7 @@ class PhEDExInjectorPoller(BaseWorkerThread):
                                         conn = myThread.transaction.conn,
                                         transaction = myThread.transaction)
 
-
+        self.reportWork(len(closedBlocks))
         return
 
     def algorithm(self, parameters):
@@ -259,12 +370,13 @@ class PhEDExInjectorPoller(BaseWorkerThread):
         _algorithm_
 
         Poll the database for uninjected files and attempt to inject them into
-        PhEDEx.
+        PhEDEx.  Injected files are committed as they are injected, closing
+        blocks is done in a single transaction.
         """
         myThread = threading.currentThread()
-        myThread.transaction.begin()
         try:
             self.injectFiles()
+            myThread.transaction.begin()
             self.closeBlocks()
             myThread.transaction.commit()
         except PhEDExInjectorPassableError, ex:
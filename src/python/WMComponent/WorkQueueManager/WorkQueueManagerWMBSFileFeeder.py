@@ -65,6 +65,7 @@ class WorkQueueManagerWMBSFileFeeder(BaseWorkerThread):
         self.previousWorkList = self.queue.getWork(resources)
         self.queue.logger.info("%s of units of work acquired for file creation" 
                                % len(self.previousWorkList))
+        self.reportWork(len(self.previousWorkList))
         return
 
     def checkJobCreation(self):
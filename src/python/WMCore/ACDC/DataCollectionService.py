@@ -19,6 +19,7 @@ import WMCore.ACDC.CollectionTypes as CollectionTypes
 from WMCore.WMException      import WMException
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run  import Run
+from WMCore.DataStructs.LumiMask import LumiMask
 
 class ACDCDCSException(WMException):
     """
@@ -207,6 +208,17 @@ class DataCollectionService(CouchService):
 
         Note that the run numbers are strings.
         """
+        return self.getLumiMask(collectionID, taskName, user, group).goodRunList()
+
+    @CouchUtils.connectToCouch
+    def getLumiMask(self, collectionID, taskName, user = "cmsdataops",
+                    group = "cmsdataops"):
+        """
+        _getLumiMask_
+
+        Query ACDC for all of the files in the given collection and task and
+        return the runs and lumis they contain as a LumiMask.
+        """
         results = self.couchdb.loadView("ACDC", "owner_coll_fileset_files",
                                         {"startkey": [group, user,
                                                       collectionID, taskName],
@@ -214,36 +226,10 @@ class DataCollectionService(CouchService):
                                                     collectionID, taskName, {}]}, [])
 
         allRuns = {}
-        whiteList = {}
-
         for result in results["rows"]:
             for run in result["value"]["runs"]:
                 if not allRuns.has_key(run["run_number"]):
                     allRuns[run["run_number"]] = []
                 allRuns[run["run_number"]].extend(run["lumis"])
 
-        for run in allRuns.keys():
-            lumis = []
-            lumis.extend(set(allRuns[run]))
-            lumis.sort()
-
-            whiteList[str(run)] = []
-            lastLumi = None
-            currentSet = None
-
-            while len(lumis) > 0:
-                currentLumi = lumis.pop(0)
-                if currentLumi - 1 != lastLumi:
-                    if currentSet == None:
-                        currentSet = [currentLumi]
-                    else:
-                        currentSet.append(lastLumi)
-                        whiteList[str(run)].append(currentSet)
-                        currentSet = [currentLumi]
-
-                lastLumi = currentLumi
-
-            currentSet.append(lastLumi)
-            whiteList[str(run)].append(currentSet)
-
-        return whiteList
+        return LumiMask.fromRunLumis(allRuns)
@@ -58,6 +58,10 @@ class CreateAgentBase(DBCreator):
              pid           INTEGER,
              last_error    INTEGER,
              error_message VARCHAR(1000),
+             cycle_time    FLOAT,
+             db_time       FLOAT,
+             http_time     FLOAT,
+             cycle_items   INTEGER,
              UNIQUE (component_id, name))"""
         
         self.constraints["FK_wm_component_worker"] = \
@@ -0,0 +1,31 @@
+"""
+_GetWorkerCycles_
+
+MySQL implementation of GetWorkerCycles
+"""
+
+__all__ = []
+
+
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class GetWorkerCycles(DBFormatter):
+    """
+    _GetWorkerCycles_
+
+    Retrieve the stats of the last cycle of every worker that recorded one.
+    """
+    sql = """SELECT comp.name as name, worker.name as worker_name,
+                    worker.cycle_time, worker.db_time, worker.http_time,
+                    worker.cycle_items
+             FROM wm_workers worker
+             INNER JOIN wm_components comp ON comp.id = worker.component_id
+             WHERE worker.cycle_time IS NOT NULL
+             """
+
+    def execute(self, conn = None, transaction = False):
+
+        result = self.dbi.processData(self.sql, conn = conn,
+                             transaction = transaction)
+        return self.formatDict(result)
@@ -19,21 +19,29 @@ class UpdateWorker(DBFormatter):
     sqlpart2 = """WHERE component_id = :component_id
                    AND name = :worker_name"""
 
+    cycleColumns = ["cycle_time", "db_time", "http_time", "cycle_items"]
+
     def execute(self, componentID, workerName, state = None,
-                pid = None, conn = None, transaction = False):
+                pid = None, cycle = None, conn = None, transaction = False):
         
         binds = {"component_id": componentID, 
                  "worker_name": workerName, 
                  "last_updated": int(time.time())}
                  
+        sql = self.sqlpart1
         if state:
             binds["state"] = state
-            self.sqlpart1 += ", state = :state" 
+            sql += ", state = :state" 
         if pid:
             binds["pid"] = pid
-            self.sqlpart1 += ", pid = :pid"
+            sql += ", pid = :pid"
+        if cycle:
+            # Stats of the last cycle, see WMCore.WorkerThreads.CycleStats
+            for column in self.cycleColumns:
+                binds[column] = cycle.get(column, None)
+                sql += ", %s = :%s" % (column, column)
         
-        sql = self.sqlpart1 + " " + self.sqlpart2
+        sql += " " + self.sqlpart2
             
         self.dbi.processData(sql, binds, conn = conn,
                              transaction = transaction)
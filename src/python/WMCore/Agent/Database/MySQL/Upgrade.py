@@ -0,0 +1,31 @@
+"""
+_Upgrade_
+
+Implementation of Upgrade for MySQL.
+
+Bring the Agent schema of an existing database up to date.
+"""
+
+from WMCore.Database.DBUpgrade import DBUpgrade
+
+cycleStatsProbe = """SELECT cycle_time, db_time, http_time, cycle_items
+                       FROM wm_workers WHERE 1 = 0"""
+
+class Upgrade(DBUpgrade):
+    """
+    Class to upgrade the Agent schema in a MySQL database
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the base class's constructor and add all upgrades.
+        """
+        DBUpgrade.__init__(self, logger, dbi, params)
+
+        self.addStatements("wm_workers_cycle", cycleStatsProbe,
+                           ["""ALTER TABLE wm_workers ADD COLUMN cycle_time FLOAT,
+                                                      ADD COLUMN db_time FLOAT,
+                                                      ADD COLUMN http_time FLOAT,
+                                                      ADD COLUMN cycle_items INT(11)"""])
+        return
@@ -0,0 +1,27 @@
+"""
+_Upgrade_
+
+Implementation of Upgrade for Oracle.
+"""
+
+from WMCore.Database.DBUpgrade import DBUpgrade
+from WMCore.Agent.Database.MySQL.Upgrade import cycleStatsProbe
+
+class Upgrade(DBUpgrade):
+    """
+    Class to upgrade the Agent schema in an Oracle database
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the base class's constructor and add all upgrades.
+        """
+        DBUpgrade.__init__(self, logger, dbi, params)
+
+        self.addStatements("wm_workers_cycle", cycleStatsProbe,
+                           ["""ALTER TABLE wm_workers ADD (cycle_time  FLOAT,
+                                                           db_time     FLOAT,
+                                                           http_time   FLOAT,
+                                                           cycle_items INTEGER)"""])
+        return
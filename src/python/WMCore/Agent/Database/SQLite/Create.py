@@ -32,6 +32,10 @@ class Create(CreateAgentBase):
              pid           INTEGER,
              last_error    INTEGER,
              error_message VARCHAR(1000),
+             cycle_time    FLOAT,
+             db_time       FLOAT,
+             http_time     FLOAT,
+             cycle_items   INTEGER,
              UNIQUE (component_id, name))"""
          
         # constraints added in table definition
@@ -0,0 +1,15 @@
+"""
+_GetWorkerCycles_
+
+SQLite implementation of GetWorkerCycles
+"""
+
+__all__ = []
+
+
+
+from WMCore.Agent.Database.MySQL.GetWorkerCycles import GetWorkerCycles \
+     as GetWorkerCyclesMySQL
+
+class GetWorkerCycles(GetWorkerCyclesMySQL):
+    pass
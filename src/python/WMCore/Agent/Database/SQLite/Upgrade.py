@@ -0,0 +1,28 @@
+"""
+_Upgrade_
+
+Implementation of Upgrade for SQLite.
+"""
+
+from WMCore.Database.DBUpgrade import DBUpgrade
+from WMCore.Agent.Database.MySQL.Upgrade import cycleStatsProbe
+
+class Upgrade(DBUpgrade):
+    """
+    Class to upgrade the Agent schema in a SQLite database
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the base class's constructor and add all upgrades.  SQLite only
+        adds one column per statement.
+        """
+        DBUpgrade.__init__(self, logger, dbi, params)
+
+        self.addStatements("wm_workers_cycle", cycleStatsProbe,
+                           ["ALTER TABLE wm_workers ADD COLUMN cycle_time FLOAT",
+                            "ALTER TABLE wm_workers ADD COLUMN db_time FLOAT",
+                            "ALTER TABLE wm_workers ADD COLUMN http_time FLOAT",
+                            "ALTER TABLE wm_workers ADD COLUMN cycle_items INTEGER"])
+        return
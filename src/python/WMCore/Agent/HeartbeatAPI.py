@@ -31,6 +31,7 @@ class HeartbeatAPI(WMConnectionBase):
         
         self.componentName = componentName
         self.pid = os.getpid()
+        self.cycleColumns = None
         
     def registerComponent(self):
         
@@ -39,8 +40,18 @@ class HeartbeatAPI(WMConnectionBase):
                              conn = self.getDBConn(),
                              transaction = self.existingTransaction())
         
-    def updateWorkerHeartbeat(self, workerName, state = "Start", pid = None):
-        
+    def updateWorkerHeartbeat(self, workerName, state = "Start", pid = None,
+                              cycle = None):
+        """
+        _updateWorkerHeartbeat_
+
+        Record that a worker is alive.  cycle is an optional dictionary with
+        the stats of the last cycle of the worker, it is dropped if the
+        database doesn't have the cycle stats columns yet.
+        """
+        if cycle and not self.hasCycleColumns():
+            cycle = None
+
         existAction = self.daofactory(classname = "ExistWorker")
         componentID = existAction.execute(self.componentName, workerName, 
                                     conn = self.getDBConn(),
@@ -52,10 +63,26 @@ class HeartbeatAPI(WMConnectionBase):
                            transaction = self.existingTransaction())
         else:
             action = self.daofactory(classname = "UpdateWorker")
-            action.execute(componentID, workerName, state, pid,
+            action.execute(componentID, workerName, state, pid, cycle,
                            conn = self.getDBConn(),
                            transaction = self.existingTransaction())
     
+    def hasCycleColumns(self):
+        """
+        _hasCycleColumns_
+
+        Check once whether wm_workers has the cycle stats columns.  Agents
+        created before they were added need the wm_workers_cycle upgrade.
+        """
+        if self.cycleColumns == None:
+            upgrade = self.daofactory(classname = "Upgrade")
+            self.cycleColumns = not "wm_workers_cycle" in upgrade.pending()
+            if not self.cycleColumns:
+                logging.warning("wm_workers has no cycle stats columns, run "
+                                "wmcore-db-init --upgrade --modules=WMCore.Agent.Database "
+                                "to record the cycle stats with the heartbeat.")
+        return self.cycleColumns
+
     def updateWorkerError(self, workerName, errorMessage):
         
         action = self.daofactory(classname = "UpdateWorkerError")
@@ -79,7 +106,18 @@ class HeartbeatAPI(WMConnectionBase):
                                         transaction = self.existingTransaction())
         
         return results
-        
-            
-    
-        
+
+    def getWorkerCycles(self):
+        """
+        _getWorkerCycles_
+
+        Return the stats of the last cycle of every worker that recorded one.
+        """
+        if not self.hasCycleColumns():
+            return []
+
+        workerCycles = self.daofactory(classname = "GetWorkerCycles")
+        results = workerCycles.execute(conn = self.getDBConn(),
+                                       transaction = self.existingTransaction())
+
+        return results
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+"""
+_BlockAssembler_
+
+Assign files to blocks for the DBS upload pollers.
+
+Open blocks are indexed by (dataset-algo, location) so finding the block a
+new file goes into is a dictionary lookup, and every block keeps running
+file, size and event counters so checking whether a file still fits doesn't
+walk the files already in the block.  Block timeouts are kept in a heap, so
+finding the blocks that timed out only touches the expired ones.
+
+The blocks themselves are opaque to the assembler: they are created by the
+newBlock(das, location) callback, which returns the name of the new block and
+the block, and are handed back to the caller, who adds the files to them and
+handles them once they are closed.
+"""
+
+import time
+import heapq
+
+class BlockRecord(object):
+    """
+    _BlockRecord_
+
+    Bookkeeping for a single block.
+    """
+    __slots__ = ['name', 'key', 'block', 'nFiles', 'size', 'events',
+                 'startTime', 'isOpen']
+
+    def __init__(self, name, key, block, nFiles = 0, size = 0, events = 0,
+                 startTime = None):
+        self.name      = name
+        self.key       = key
+        self.block     = block
+        self.nFiles    = nFiles
+        self.size      = size
+        self.events    = events
+        self.startTime = startTime
+        self.isOpen    = True
+        return
+
+class BlockAssembler(object):
+    """
+    _BlockAssembler_
+
+    Per (dataset-algo, location) index of open blocks.  A block is closed
+    when it reaches maxFiles files or maxEvents events, or when the next file
+    would take it over maxSize.  With checkNewSize set to False a block is
+    only closed once it already has maxSize bytes, and with closeOnTime set
+    to True a block that is older than maxTime is closed when the next file
+    arrives instead of waiting for expire().
+    """
+    def __init__(self, newBlock, maxFiles, maxSize, maxTime, maxEvents = None,
+                 checkNewSize = True, closeOnTime = False):
+        self.newBlock     = newBlock
+        self.maxFiles     = maxFiles
+        self.maxSize      = maxSize
+        self.maxTime      = maxTime
+        self.maxEvents    = maxEvents
+        self.checkNewSize = checkNewSize
+        self.closeOnTime  = closeOnTime
+
+        self.records    = {}
+        self.openBlocks = {}
+        self.timeouts   = []
+        return
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def getRecord(self, name):
+        """
+        _getRecord_
+
+        Return the bookkeeping record for a block, or None.
+        """
+        return self.records.get(name, None)
+
+    def addBlock(self, name, das, location, block, nFiles = 0, size = 0,
+                 events = 0, startTime = None, isOpen = True):
+        """
+        _addBlock_
+
+        Register a block that already exists, for example one loaded from
+        DBSBuffer.  Open blocks are used for new files in the order they were
+        added.
+        """
+        if startTime == None:
+            startTime = time.time()
+
+        key = (das, location)
+        record = BlockRecord(name = name, key = key, block = block,
+                             nFiles = nFiles, size = size, events = events,
+                             startTime = startTime)
+        self.records[name] = record
+
+        if isOpen:
+            self.openBlocks.setdefault(key, []).append(name)
+            heapq.heappush(self.timeouts, (startTime + self.maxTime, name))
+        else:
+            record.isOpen = False
+
+        return record
+
+    def removeBlock(self, name):
+        """
+        _removeBlock_
+
+        Forget about a block, for example once it is in DBS.  Its timeout
+        heap entry is discarded lazily.
+        """
+        record = self.records.pop(name, None)
+        if record != None and record.isOpen:
+            self.dropOpenBlock(record)
+        return
+
+    def closeBlock(self, name):
+        """
+        _closeBlock_
+
+        Stop putting files into a block.  Return the block, or None if the
+        block wasn't open.
+        """
+        record = self.records.get(name, None)
+        if record == None or not record.isOpen:
+            return None
+
+        record.isOpen = False
+        self.dropOpenBlock(record)
+        return record.block
+
+    def dropOpenBlock(self, record):
+        """
+        _dropOpenBlock_
+
+        Remove a block from the open block index.
+        """
+        openBlocks = self.openBlocks.get(record.key, [])
+        if len(openBlocks) > 0 and openBlocks[0] == record.name:
+            openBlocks.pop(0)
+        elif record.name in openBlocks:
+            openBlocks.remove(record.name)
+
+        if len(openBlocks) == 0:
+            self.openBlocks.pop(record.key, None)
+        return
+
+    def fits(self, record, size, events, now):
+        """
+        _fits_
+
+        Check whether a file still fits into a block.
+        """
+        if self.closeOnTime and now - record.startTime >= self.maxTime:
+            return False
+        if record.nFiles >= self.maxFiles:
+            return False
+        if self.maxEvents != None and record.events >= self.maxEvents:
+            return False
+        if self.checkNewSize:
+            if record.size + size > self.maxSize:
+                return False
+        elif record.size >= self.maxSize:
+            return False
+
+        return True
+
+    def addFile(self, das, location, size, events = 0):
+        """
+        _addFile_
+
+        Account for a new file and return (block, closedBlocks), where block
+        is the block the file goes into and closedBlocks is the list of
+        blocks that were closed to make room for it.  An empty block always
+        takes the file, so a file larger than maxSize gets a block of its
+        own.
+        """
+        key    = (das, location)
+        now    = time.time()
+        closed = []
+        record = None
+
+        openBlocks = self.openBlocks.get(key, None)
+        while openBlocks:
+            record = self.records[openBlocks[0]]
+            if record.nFiles == 0 or self.fits(record, size, events, now):
+                break
+            closed.append(self.closeBlock(record.name))
+            record = None
+
+        if record == None:
+            (name, block) = self.newBlock(das, location)
+            record = self.addBlock(name = name, das = das,
+                                   location = location, block = block,
+                                   startTime = now)
+
+        record.nFiles += 1
+        record.size   += size
+        record.events += events
+        return record.block, closed
+
+    def expire(self, now = None):
+        """
+        _expire_
+
+        Close and return all the open blocks that are older than maxTime.
+        """
+        if now == None:
+            now = time.time()
+
+        expired = []
+        while len(self.timeouts) > 0 and self.timeouts[0][0] < now:
+            (expiry, name) = heapq.heappop(self.timeouts)
+            block = self.closeBlock(name)
+            if block != None:
+                expired.append(block)
+
+        return expired
@@ -12,6 +12,7 @@ import time
 import Queue
 import os.path
 import logging
+import tempfile
 import threading
 import traceback
 import subprocess
@@ -24,6 +25,7 @@ from WMCore.DAOFactory                 import DAOFactory
 from WMCore.WMException                import WMException
 from WMCore.WMInit                     import getWMBASE
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
+from WMCore.BossAir.Plugins.CondorQParser import parseClassAds
 from WMCore.FwkJobReport.Report        import Report
 from WMCore.Algorithms                 import SubprocessAlgos
 
@@ -186,6 +188,9 @@ class CondorPlugin(BasePlugin):
         self.submitWMSMode = getattr(config.BossAir, 'submitWMSMode', False)
         self.errorThreshold= getattr(config.BossAir, 'submitErrorThreshold', 10)
         self.errorCount    = 0
+        self.bulkSubmit    = getattr(config.BossAir, 'condorBulkSubmit', False)
+        self.bulkSize      = getattr(config.BossAir, 'condorBulkSubmitSize', 5000)
+        self.killBatchSize = getattr(config.BossAir, 'condorRmBatchSize', 100)
 
 
         # Build ourselves a pool
@@ -351,28 +356,35 @@ class CondorPlugin(BasePlugin):
         # Now assume that what we get is the following; a mostly
         # unordered list of jobs with random sandboxes.
         # We intend to sort them by sandbox.
+        # In bulk mode we also sort them by site and submit each group
+        # as a single cluster so the site attributes are only written once.
+
+        if self.bulkSubmit:
+            jobsPerSubmit = self.bulkSize
+        else:
+            jobsPerSubmit = self.config.JobSubmitter.jobsPerWorker
 
         submitDict = {}
         nSubmits   = 0
         for job in jobs:
-            sandbox = job['sandbox']
-            if not sandbox in submitDict.keys():
-                submitDict[sandbox] = []
-            submitDict[sandbox].append(job)
+            if self.bulkSubmit:
+                groupKey = (job['sandbox'], job['location'])
+            else:
+                groupKey = job['sandbox']
+            submitDict.setdefault(groupKey, []).append(job)
 
 
         # Now submit the bastards
         queueError = False
-        for sandbox in submitDict.keys():
-            jobList = submitDict.get(sandbox, [])
-            idList = [x['jobid'] for x in jobList]
+        for groupKey in submitDict.keys():
+            jobList = submitDict.get(groupKey, [])
             if queueError:
                 # If the queue has failed, then we must not process
                 # any more jobs this cycle.
                 continue
             while len(jobList) > 0:
-                jobsReady = jobList[:self.config.JobSubmitter.jobsPerWorker]
-                jobList   = jobList[self.config.JobSubmitter.jobsPerWorker:]
+                jobsReady = jobList[:jobsPerSubmit]
+                jobList   = jobList[jobsPerSubmit:]
                 idList    = [x['id'] for x in jobsReady]
                 jdlList = self.makeSubmit(jobList = jobsReady)
                 if not jdlList or jdlList == []:
@@ -417,6 +429,10 @@ class CondorPlugin(BasePlugin):
 
         # Now we should have sent all jobs to be submitted
         # Going to do the rest of it now
+        jobsByID = {}
+        for job in jobs:
+            jobsByID[job.get('id', None)] = job
+
         for n in range(nSubmits):
             try:
                 res = self.result.get(block = True, timeout = timeout)
@@ -470,19 +486,17 @@ class CondorPlugin(BasePlugin):
                 condorErrorReport = Report()
                 condorErrorReport.addError("JobSubmit", 61202, "CondorError", errorMsg)
                 for jobID in idList:
-                    for job in jobs:
-                        if job.get('id', None) == jobID:
-                            job['fwjr'] = condorErrorReport
-                            failedJobs.append(job)
-                            break
+                    job = jobsByID.get(jobID, None)
+                    if job != None:
+                        job['fwjr'] = condorErrorReport
+                        failedJobs.append(job)
             else:
                 if self.errorCount > 0:
                     self.errorCount -= 1
                 for jobID in idList:
-                    for job in jobs:
-                        if job.get('id', None) == jobID:
-                            successfulJobs.append(job)
-                            break
+                    job = jobsByID.get(jobID, None)
+                    if job != None:
+                        successfulJobs.append(job)
 
             # If we get a lot of errors in a row it's probably time to
             # report this to the operators.
@@ -550,12 +564,12 @@ class CondorPlugin(BasePlugin):
         jobInfo = self.getClassAds()
         if jobInfo == None:
             return runningList, changeList, completeList
-        if len(jobInfo.keys()) == 0:
+        if len(jobInfo) == 0:
             noInfoFlag = True
 
         for job in jobs:
             # Now go over the jobs from WMBS and see what we have
-            if not job['jobid'] in jobInfo.keys():
+            if not job['jobid'] in jobInfo:
                 # Two options here, either put in removed, or not
                 # Only cycle through Removed if condor_q is sending
                 # us no information
@@ -690,15 +704,22 @@ class CondorPlugin(BasePlugin):
         """
         Kill a list of jobs based on the WMBS job names
 
+        The jobs are removed in batches, one condor_rm with a constraint
+        matching all of the jobs in the batch.
         """
 
-        for job in jobs:
-            jobID = job['jobid']
-            # This is a very long and painful command to run
-            command = 'condor_rm -constraint \"WMAgent_JobID =?= %i\"' % (jobID)
+        jobIDs = [job['jobid'] for job in jobs]
+        while len(jobIDs) > 0:
+            idList = jobIDs[:self.killBatchSize]
+            jobIDs = jobIDs[self.killBatchSize:]
+            constraint = " || ".join(["WMAgent_JobID =?= %i" % jobID for jobID in idList])
+            command = ['condor_rm', '-constraint', constraint]
             proc = subprocess.Popen(command, stderr = subprocess.PIPE,
-                                    stdout = subprocess.PIPE, shell = True)
+                                    stdout = subprocess.PIPE, shell = False)
             out, err = proc.communicate()
+            if not proc.returncode == 0:
+                # condor_rm also fails if some of the jobs are already gone
+                logging.debug("condor_rm returned %s for %i jobs: %s" % (proc.returncode, len(idList), err))
 
         return
 
@@ -807,6 +828,9 @@ class CondorPlugin(BasePlugin):
 
         jdl = self.initSubmit(jobList)
 
+        # Condor keeps the values of the previous proc for the next Queue
+        # statement, so per-proc attributes are only written when they change
+        lastValues = {}
 
         # For each script we have to do queue a separate directory, etc.
         for job in jobList:
@@ -814,24 +838,25 @@ class CondorPlugin(BasePlugin):
                 # Then I don't know how we got here either
                 logging.error("Was passed a nonexistant job.  Ignoring")
                 continue
-            jdl.append("initialdir = %s\n" % job['cache_dir'])
-            jdl.append("transfer_input_files = %s, %s/%s, %s\n" \
+            procJdl = []
+            procJdl.append("initialdir = %s\n" % job['cache_dir'])
+            procJdl.append("transfer_input_files = %s, %s/%s, %s\n" \
                        % (job['sandbox'], job['packageDir'],
                           'JobPackage.pkl', self.unpacker))
             argString = "arguments = %s %i\n" \
                         % (os.path.basename(job['sandbox']), job['id'])
-            jdl.append(argString)
+            procJdl.append(argString)
 
-            jdl.extend(self.customizePerJob(job))
+            procJdl.extend(self.customizePerJob(job))
 
             # Transfer the output files
-            jdl.append("transfer_output_files = Report.%i.pkl\n" % (job["retry_count"]))
+            procJdl.append("transfer_output_files = Report.%i.pkl\n" % (job["retry_count"]))
 
             # Add priority if necessary
             if job.get('priority', None) != None:
                 try:
                     prio = int(job['priority'])
-                    jdl.append("priority = %i\n" % prio)
+                    procJdl.append("priority = %i\n" % prio)
                 except ValueError:
                     logging.error("Priority for job %i not castable to an int\n" % job['id'])
                     logging.error("Not setting priority")
@@ -841,7 +866,15 @@ class CondorPlugin(BasePlugin):
                     logging.error(str(ex))
                     logging.error("Not setting priority")
 
-            jdl.append("+WMAgent_JobID = %s\n" % job['jobid'])
+            procJdl.append("+WMAgent_JobID = %s\n" % job['jobid'])
+
+            for line in procJdl:
+                if '=' in line:
+                    attribute = line.split('=', 1)[0].strip()
+                    if lastValues.get(attribute, None) == line:
+                        continue
+                    lastValues[attribute] = line
+                jdl.append(line)
 
             jdl.append("Queue 1\n")
 
@@ -896,18 +929,19 @@ class CondorPlugin(BasePlugin):
 
         constraint = "\"WMAgent_JobID =!= UNDEFINED\""
 
-
-        jobInfo = {}
-
         command = ['condor_q', '-constraint', 'WMAgent_JobID =!= UNDEFINED',
                    '-constraint', 'WMAgent_AgentName == \"%s\"' % (self.agent),
                    '-format', '(JobStatus:\%s)  ', 'JobStatus',
                    '-format', '(stateTime:\%s)  ', 'EnteredCurrentStatus',
                    '-format', '(WMAgentID:\%d):::',  'WMAgent_JobID']
 
-        pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = subprocess.PIPE, shell = False)
-        stdout, stderr = pipe.communicate()
-        classAdsRaw = stdout.split(':::')
+        # Parse the output while condor_q is still writing it, stderr goes
+        # to a temporary file so that it can't block the pipe
+        stderr = tempfile.TemporaryFile()
+        pipe = subprocess.Popen(command, stdout = subprocess.PIPE, stderr = stderr, shell = False)
+        jobInfo = parseClassAds(pipe.stdout)
+        pipe.wait()
+        stderr.close()
 
         if not pipe.returncode == 0:
             # Then things have gotten bad - condor_q is not responding
@@ -915,35 +949,6 @@ class CondorPlugin(BasePlugin):
             logging.error("Skipping classAd processing this round")
             return None
 
-
-        if classAdsRaw == '':
-            # We have no jobs
-            return jobInfo
-
-        for ad in classAdsRaw:
-            # There should be one for every job
-            if not re.search("\(", ad):
-                # There is no ad.
-                # Don't know what happened here
-                continue
-            statements = ad.split('(')
-            tmpDict = {}
-            for statement in statements:
-                # One for each value
-                if not re.search(':', statement):
-                    # Then we have an empty statement
-                    continue
-                key = str(statement.split(':')[0])
-                value = statement.split(':')[1].split(')')[0]
-                tmpDict[key] = value
-            if not 'WMAgentID' in tmpDict.keys():
-                # Then we have an invalid job somehow
-                logging.error("Invalid job discovered in condor_q")
-                logging.error(tmpDict)
-                continue
-            else:
-                jobInfo[int(tmpDict['WMAgentID'])] = tmpDict
-
         logging.info("Retrieved %i classAds" % len(jobInfo))
 
 
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+_CondorQParser_
+
+Parser for the output of the condor_q command run by the CondorPlugin.  Every
+job is printed as a list of (key:value) statements terminated by ':::', e.g.
+
+  (JobStatus:2)  (stateTime:1325376000)  (WMAgentID:42):::
+
+The output is read from the stream in chunks and parsed one job at a time, so
+the whole condor_q output never has to be held in memory at once.  Jobs are
+returned in a dictionary keyed by WMAgent job ID.
+"""
+
+import logging
+
+def parseClassAd(ad):
+    """
+    _parseClassAd_
+
+    Parse the statements printed for a single job into a dictionary.
+    """
+    classAd = {}
+    for statement in ad.split(')'):
+        statement = statement.strip().lstrip('(')
+        key, sep, value = statement.partition(':')
+        if not sep:
+            # Then we have an empty statement
+            continue
+        classAd[key] = value
+    return classAd
+
+def parseClassAds(stream, chunkSize = 65536):
+    """
+    _parseClassAds_
+
+    Read condor_q output from a file like object and return a dictionary of
+    classAds keyed by the integer WMAgent job ID.  Jobs without a WMAgentID
+    are logged and skipped.
+    """
+    jobInfo = {}
+    remainder = ''
+
+    while True:
+        chunk = stream.read(chunkSize)
+        if not chunk:
+            break
+
+        ads = (remainder + chunk).split(':::')
+        remainder = ads.pop()
+
+        for ad in ads:
+            addClassAd(jobInfo, ad)
+
+    addClassAd(jobInfo, remainder)
+    return jobInfo
+
+def addClassAd(jobInfo, ad):
+    """
+    _addClassAd_
+
+    Parse a single job and add it to the jobInfo dictionary.
+    """
+    if not '(' in ad:
+        # There is no ad.
+        return
+
+    classAd = parseClassAd(ad)
+    if not 'WMAgentID' in classAd:
+        # Then we have an invalid job somehow
+        logging.error("Invalid job discovered in condor_q")
+        logging.error(classAd)
+        return
+
+    try:
+        jobInfo[int(classAd['WMAgentID'])] = classAd
+    except ValueError:
+        logging.error("Invalid WMAgentID discovered in condor_q")
+        logging.error(classAd)
+
+    return
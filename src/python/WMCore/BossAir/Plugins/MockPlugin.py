@@ -6,15 +6,36 @@ Base class for BossAir plugins
 """
 
 import os
-import cPickle as pickle
 import logging
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
+from WMCore.FwkJobReport.Report import Report
 from datetime import datetime
 from datetime import timedelta
 from random import randint
 import multiprocessing , Queue
 
 
+def loadReport(filename):
+    """
+    _loadReport_
+
+    Load the data of a persisted report.
+    """
+    report = Report()
+    report.unpersist(filename)
+    return report.data
+
+def persistReport(data, filename):
+    """
+    _persistReport_
+
+    Persist report data as the final report of a job.
+    """
+    report = Report()
+    report.data = data
+    report.persist(filename, summary = True)
+    return
+
 def processWorker(myinput, tmp):
     try:
         while True:
@@ -33,9 +54,8 @@ def processWorker(myinput, tmp):
             if jj['cache_dir'].count("Analysis/LogCollect") > 0:
                if lcreport is not None: 
                     lcreport.task = "/" + taskName + "/Analysis/LogCollect"
-                    f = open(outfile, 'w')
-                    logging.debug('Process worker is dumping the LogCollect report to ' + f.name)
-                    pickle.dump(lcreport, f)
+                    logging.debug('Process worker is dumping the LogCollect report to ' + outfile)
+                    persistReport(lcreport, outfile)
                     continue
                else:
                     msg = "Parameter lcFakeReport is mandatory if you are using logCollect jobs"
@@ -58,10 +78,8 @@ def processWorker(myinput, tmp):
             report.task = "/" + taskName + "/Analysis"
 
             #pickle the report again
-            f = open(outfile, 'w')
-            logging.debug('Process worker is dumping the report to ' + f.name)
-            pickle.dump(report, f)
-            f.close()
+            logging.debug('Process worker is dumping the report to ' + outfile)
+            persistReport(report, outfile)
     except Exception, ex:
         logging.exception(ex)
 
@@ -161,15 +179,11 @@ class MockPlugin(BasePlugin):
             self.start( self.myinput )
 
         #for each job we will need to modify the default Report (the output of each job).
-        f = open(self.fakeReport)
-        report = pickle.load(f)
-        f.close()
+        report = loadReport(self.fakeReport)
 
         lcreport = getattr(self.config.BossAir.MockPlugin, 'lcFakeReport', None)
         if lcreport != None:
-            f = open(lcreport)
-            lcreport = pickle.load(f)
-            f.close()
+            lcreport = loadReport(lcreport)
 
         for jj in jobs:
             if not self.jobsScheduledEnd.has_key(jj['id']):
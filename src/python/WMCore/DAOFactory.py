@@ -4,25 +4,43 @@ A basic action is a thing that will run a SQL statement
 A more complex one would be something that ran multiple SQL 
 objects to produce a single output.
 """
+import threading
+
 from WMCore.Database.Dialects import MySQLDialect
 from WMCore.Database.Dialects import SQLiteDialect
 from WMCore.Database.Dialects import OracleDialect
 
+# DAO classes that have already been imported, keyed by module name.
+_daoClasses = {}
+
+# DAO instances handed out by factories that cache instances.  DAOs are not
+# meant to be shared between threads so every thread gets its own cache.
+_daoInstances = threading.local()
+
 class DAOFactory(object):
-    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner=""):
+    def __init__(self, package='WMCore', logger=None, dbinterface=None, owner="",
+                 cacheInstances = False):
         self.package = package
         self.logger = logger
         self.dbinterface = dbinterface
         self.owner = owner
+        self.cacheInstances = cacheInstances
         #self.logger.debug("Instantiating DAOFactory for %s package" % self.package)
         self.dialects = {"Oracle" : OracleDialect,
                     "MySQL" : MySQLDialect,
                     "SQLite" : SQLiteDialect}
-    
-    def __call__(self, classname):
+        self.dialect = None
+
+    def getDialect(self):
         """
-        Somewhat fugly method to load generic SQL classes...
+        _getDialect_
+
+        Determine the dialect of the database interface, this is only done the
+        first time the factory is called.
         """
+        if self.dialect != None:
+            return self.dialect
+
         if not isinstance(self.dbinterface, str):
 
             dia = self.dbinterface.engine.dialect
@@ -36,12 +54,39 @@ class DAOFactory(object):
         else:
             dialect = 'CouchDB'
 
-        
-        module = "%s.%s.%s" % (self.package, dialect, classname)
-        #self.logger.debug("importing %s, %s" % (module, classname))
-        module = __import__(module, globals(), locals(), [classname])#, -1)
-        instance = getattr(module, classname.split('.')[-1])
+        self.dialect = dialect
+        return self.dialect
+    
+    def __call__(self, classname):
+        """
+        Somewhat fugly method to load generic SQL classes...
+
+        DAO classes are only imported once per process.  If the factory was
+        created with cacheInstances the DAO instances are reused as well, in
+        that case DAOs must not keep any per call state in the instance.
+        """
+        module = "%s.%s.%s" % (self.package, self.getDialect(), classname)
+
+        if self.cacheInstances:
+            if not hasattr(_daoInstances, "instances"):
+                _daoInstances.instances = {}
+            instanceKey = (module, id(self.logger), id(self.dbinterface), self.owner)
+            if _daoInstances.instances.has_key(instanceKey):
+                return _daoInstances.instances[instanceKey]
+
+        instance = _daoClasses.get(module, None)
+        if instance == None:
+            #self.logger.debug("importing %s, %s" % (module, classname))
+            daoModule = __import__(module, globals(), locals(), [classname])#, -1)
+            instance = getattr(daoModule, classname.split('.')[-1])
+            _daoClasses[module] = instance
+
         if self.owner:
-            return instance(self.logger, self.dbinterface, self.owner)
+            dao = instance(self.logger, self.dbinterface, self.owner)
         else:
-            return instance(self.logger, self.dbinterface)
+            dao = instance(self.logger, self.dbinterface)
+
+        if self.cacheInstances:
+            _daoInstances.instances[instanceKey] = dao
+
+        return dao
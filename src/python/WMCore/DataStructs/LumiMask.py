@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+_LumiMask_
+
+Compiled form of a good run/lumi list.  A good run list is a dictionary keyed
+by run number (as a string) whose values are lists of inclusive lumi ranges:
+
+  {"1": [[1, 4], [6, 10]],
+   "3": [[5, 10]]}
+
+The mask merges and sorts the ranges for each run once so that checking a run
+or a lumi against it is a dictionary lookup plus a binary search instead of a
+scan over every range.
+"""
+
+import bisect
+import logging
+
+class LumiMask(object):
+    """
+    _LumiMask_
+
+    Sorted, non overlapping lumi intervals for each run.  An empty mask
+    accepts every run and lumi.
+    """
+    def __init__(self, goodRunList = None):
+        self.starts = {}
+        self.ends = {}
+
+        if goodRunList == None:
+            goodRunList = {}
+
+        for run in goodRunList.keys():
+            ranges = []
+            for lumiRange in goodRunList[run]:
+                if not len(lumiRange) == 2:
+                    # Then we're very confused and should ignore the range
+                    logging.error("Invalid run range %s for run %s!  Ignoring it!" % (lumiRange, run))
+                    continue
+                ranges.append((lumiRange[0], lumiRange[1]))
+            ranges.sort()
+
+            starts = []
+            ends = []
+            for (start, end) in ranges:
+                if len(ends) > 0 and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+
+            self.starts[int(run)] = starts
+            self.ends[int(run)] = ends
+
+        self.empty = len(goodRunList) == 0
+        return
+
+    def isGoodRun(self, run):
+        """
+        _isGoodRun_
+
+        Tell if this run is in the mask.
+        """
+        if self.empty:
+            return True
+
+        return int(run) in self.starts
+
+    def isGoodLumi(self, run, lumi):
+        """
+        _isGoodLumi_
+
+        Tell if this lumi of this run is in the mask.
+        """
+        if self.empty:
+            return True
+
+        starts = self.starts.get(int(run), None)
+        if starts == None:
+            return False
+
+        index = bisect.bisect_right(starts, lumi) - 1
+        return index >= 0 and lumi <= self.ends[int(run)][index]
+
+    def runs(self):
+        """
+        _runs_
+
+        Return the sorted list of runs in the mask.
+        """
+        return sorted(self.starts.keys())
+
+    def lumiRanges(self, run):
+        """
+        _lumiRanges_
+
+        Return the merged lumi ranges for a run as a list of [first, last]
+        pairs.
+        """
+        return [[start, end] for (start, end) in zip(self.starts.get(int(run), []),
+                                                     self.ends.get(int(run), []))]
+
+    def goodRunList(self):
+        """
+        _goodRunList_
+
+        Return the mask in the good run list format it was built from.
+        """
+        goodRunList = {}
+        for run in self.starts.keys():
+            goodRunList[str(run)] = self.lumiRanges(run)
+        return goodRunList
+
+    @classmethod
+    def fromRunLumis(cls, runLumis):
+        """
+        _fromRunLumis_
+
+        Build a mask from a dictionary of run numbers to lists of individual
+        lumis.
+        """
+        goodRunList = {}
+        for run in runLumis.keys():
+            goodRunList[str(run)] = [[lumi, lumi] for lumi in runLumis[run]]
+        return cls(goodRunList)
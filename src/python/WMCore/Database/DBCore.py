@@ -9,11 +9,48 @@ Core Database APIs
 
 
 
+import re
 from copy import copy   
 from WMCore.DataStructs.WMObject import WMObject
 from WMCore.Database.ResultSet import ResultSet
+from WMCore.WorkerThreads.CycleStats import startTimer, stopTimer
 import WMCore.WMLogging
 
+# Selects that contain any of these can't have a list of binds folded into an
+# IN clause without changing the result: aggregates and distinct rows are
+# computed over all values instead of per value, limits apply to the whole
+# list, ordering is global instead of per bind, negations invert the match and
+# OR or CASE can make a row match for some values but not for others.
+_inListExcludes = re.compile(r"\b(count|sum|min|max|avg)\s*\(|\bgroup\s+by\b|" \
+                             r"\bhaving\b|\bdistinct\b|\blimit\b|\brownum\b|" \
+                             r"\border\s+by\b|\bunion\b|\bminus\b|\bintersect\b|" \
+                             r"\bnot\b|\bconnect\s+by\b|\bor\b|\bcase\b", re.IGNORECASE)
+
+# Tokens that decide whether a condition is part of the top level WHERE clause
+_whereTokens = re.compile(r"'[^']*'|\(|\)|\bwhere\b|\bon\b", re.IGNORECASE)
+
+def _inTopLevelWhere(sql, position):
+    """
+    _inTopLevelWhere_
+
+    Check whether position is in the WHERE clause of the outer select, and
+    not in a subquery, a parenthesized expression or a join condition.
+    """
+    depth = 0
+    inWhere = False
+    for token in _whereTokens.finditer(sql, 0, position):
+        token = token.group(0).lower()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token == "where":
+            inWhere = True
+        elif depth == 0 and token == "on":
+            inWhere = False
+
+    return depth == 0 and inWhere
+
 class DBInterface(WMObject):    
     """
     Base class for doing SQL operations using a SQLAlchemy engine, or
@@ -37,6 +74,8 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        self.inListSelects = True
+        self.streamFetchSize = 1000
     
     def buildbinds(self, sequence, thename, therest = [{}]):
         """
@@ -52,6 +91,61 @@ class DBInterface(WMObject):
                     binds.append(thebind)
         return binds
 
+    def inListSelect(self, s, b):
+        """
+        _inListSelect_
+
+        Rewrite a select that has a single bind variable compared for equality,
+        e.g. "WHERE id = :id", into one select with an IN clause holding all
+        the values in the list of binds, e.g. "WHERE id IN (:id_0, :id_1)".
+        Returns a tuple of the new SQL and bind dictionary or None if the
+        select can't be rewritten without changing its result, which includes
+        binds in subqueries, parentheses or join conditions.  The caller is
+        responsible for keeping the number of binds under maxBindsPerQuery.
+        """
+        if not self.inListSelects or len(b) < 2:
+            return None
+        if type(b[0]) != dict or len(b[0].keys()) != 1:
+            return None
+        if _inListExcludes.search(s):
+            return None
+
+        bindName = b[0].keys()[0]
+        bindPattern = re.compile(r":%s\b" % re.escape(bindName), re.IGNORECASE)
+        if len(bindPattern.findall(s)) != 1:
+            return None
+
+        equalityPattern = re.compile(r"(?<![<>!^])=\s*:%s\b" % re.escape(bindName),
+                                     re.IGNORECASE)
+        if len(equalityPattern.findall(s)) != 1:
+            return None
+        if not _inTopLevelWhere(s, equalityPattern.search(s).start()):
+            return None
+
+        values = []
+        for bind in b:
+            if type(bind) != dict or bind.keys() != [bindName]:
+                return None
+            values.append(bind[bindName])
+
+        # Duplicate values would return duplicate rows when run one bind at a
+        # time, keep that behaviour by not rewriting those selects.
+        try:
+            if len(set(values)) != len(values):
+                return None
+        except TypeError:
+            return None
+
+        inBinds = {}
+        inBindNames = []
+        for i, value in enumerate(values):
+            inBindName = "%s_%d" % (bindName, i)
+            inBinds[inBindName] = value
+            inBindNames.append(":%s" % inBindName)
+
+        inSQL = equalityPattern.sub("IN (%s)" % ", ".join(inBindNames), s)
+        return (inSQL, inBinds)
+
     def executebinds(self, s = None, b = None, connection = None,
                      returnCursor = False):
         """
@@ -85,16 +179,23 @@ class DBInterface(WMObject):
         
         Can't executemany() selects - so do each combination of binds here instead.
         This will return a list of sqlalchemy.engine.base.ResultProxy object's 
-        one for each set of binds. 
+        one for each set of binds.  Selects with a single bind variable are
+        run once with all the values in an IN clause, see inListSelect().
         
         returns a list of sqlalchemy.engine.base.ResultProxy objects
         """
         
         s = s.strip()
-        if s.lower().endswith('select', 0, 6):
+        if s.lower().startswith('select'):
             """
             Trying to select many
             """
+            inList = self.inListSelect(s, b)
+            if inList != None:
+                return self.makelist(self.executebinds(inList[0], inList[1],
+                                                       connection = connection,
+                                                       returnCursor = returnCursor))
+
             if returnCursor:
                 result = []
                 for bind in b:
@@ -128,6 +229,7 @@ class DBInterface(WMObject):
         set transaction = True if you already have an active transaction        
         
         """
+        stats = startTimer("db")
         connection = None
         try:
             if not conn: 
@@ -201,5 +303,53 @@ class DBInterface(WMObject):
         finally:
             if not conn and connection != None:
                 connection.close() # Return connection to the pool
+            stopTimer(stats, "db")
         return result
         
+
+    def processDataStream(self, sqlstmt, binds = {}, conn = None, size = None):
+        """
+        _processDataStream_
+
+        Generator version of processData for selects.  Instead of reading the
+        results into ResultSets the rows are fetched from the cursor size rows
+        at a time (streamFetchSize by default) and yielded as lists of rows,
+        so huge result sets can be processed in bounded memory.  The statements
+        are run once for each set of binds, the connection is held until the
+        generator is exhausted or closed.
+        """
+        if size == None:
+            size = self.streamFetchSize
+
+        connection = None
+        try:
+            if not conn:
+                connection = self.connection()
+            else:
+                connection = conn
+
+            binds = self.makelist(binds)
+            if len(binds) == 0 or binds[0] == {}:
+                binds = [None]
+
+            for s in self.makelist(sqlstmt):
+                for b in binds:
+                    resultProxy = self.executebinds(s, b, connection = connection,
+                                                    returnCursor = True)
+                    try:
+                        # Have the driver fetch as many rows per round trip as
+                        # we hand out, cx_Oracle defaults to 50.
+                        cursor = getattr(resultProxy, "cursor", None)
+                        if cursor != None and hasattr(cursor, "arraysize"):
+                            cursor.arraysize = size
+
+                        while not resultProxy.closed:
+                            rows = resultProxy.fetchmany(size)
+                            if not rows:
+                                break
+                            yield rows
+                    finally:
+                        resultProxy.close()
+        finally:
+            if not conn and connection != None:
+                connection.close() # Return connection to the pool
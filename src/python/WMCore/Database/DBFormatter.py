@@ -11,8 +11,33 @@ interactions.
 import datetime
 import time
 
+from collections import namedtuple
+
 from WMCore.DataStructs.WMObject import WMObject
 
+# Row classes created by formatNamedTuple(), keyed by the tuple of column names.
+# Creating a namedtuple class is expensive so we only do it once per query.
+_rowClasses = {}
+
+def convertRow(row):
+    """
+    _convertRow_
+
+    Return the values of a row as a list, converting unicode values to str.
+    """
+    return [str(x) if type(x) == unicode else x for x in row]
+
+def rowClass(columns):
+    """
+    _rowClass_
+
+    Return the lightweight row class for the given list of column names.
+    """
+    columns = tuple(columns)
+    if not _rowClasses.has_key(columns):
+        _rowClasses[columns] = namedtuple("Row", columns)
+    return _rowClasses[columns]
+
 class DBFormatter(WMObject):
     def __init__(self, logger, dbinterface):
         """
@@ -71,23 +96,50 @@ class DBFormatter(WMObject):
         """
         dictOut = []
         for r in result:
-            descriptions = r.keys
+            # WARNING: Oracle returns table names in CAP!
+            descriptions = [str(x.lower()) for x in r.keys]
             for i in r.fetchall():
-                #WARNING: this can generate errors for some stupid reason
-                # in both oracle and mysql.
-                entry = {}
-                for index in xrange(0,len(descriptions)):
-                    # WARNING: Oracle returns table names in CAP!
-                    if type(i[index]) == unicode:
-                        entry[str(descriptions[index].lower())] = str(i[index])
-                    else:
-                        entry[str(descriptions[index].lower())] = i[index]
-
-                dictOut.append(entry) 
+                dictOut.append(dict(zip(descriptions, convertRow(i))))
 
             r.close()
             
         return dictOut 
+
+    def formatNamedTuple(self, result):
+        """
+        _formatNamedTuple_
+
+        Returns an array of named tuples representing the results.  The row
+        values can be accessed by lower case column name as attributes, they
+        are cheaper to create and hold than the dictionaries from formatDict.
+        """
+        tupleOut = []
+        for r in result:
+            Row = rowClass([str(x.lower()) for x in r.keys])
+            for i in r.fetchall():
+                tupleOut.append(Row._make(convertRow(i)))
+
+            r.close()
+
+        return tupleOut
+    
+    def formatDictStream(self, batches):
+        """
+        _formatDictStream_
+
+        Generator version of formatDict for the batches of rows yielded by
+        DBInterface.processDataStream(), yields one dictionary per row.
+        """
+        descriptions = None
+        for rows in batches:
+            if descriptions == None and len(rows) > 0:
+                # WARNING: Oracle returns table names in CAP!
+                descriptions = [str(x.lower()) for x in rows[0].keys()]
+
+            for i in rows:
+                yield dict(zip(descriptions, convertRow(i)))
+
+        return
     
     def formatOneDict(self, result):
         """
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+_DBUpgrade_
+
+Base class for bringing the schema of an existing database up to date.
+
+"""
+
+import threading
+
+from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.WMException import WMException
+from WMCore.WMExceptions import WMEXCEPTION
+
+class DBUpgrade(DBFormatter):
+    """
+    _DBUpgrade_
+
+    Generic class for upgrading database schemas.  Each upgrade has a name, a
+    probe select that only succeeds once the upgrade has been applied and an
+    action that applies it.  Upgrades are only applied if their probe fails,
+    so running them against an up to date database does nothing.
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the constructor of the parent class and create an empty list of
+        upgrades.
+        """
+        myThread = threading.currentThread()
+
+        if logger == None:
+            logger = myThread.logger
+        if dbi == None:
+            dbi = myThread.dbi
+
+        DBFormatter.__init__(self, logger, dbi)
+        self.upgrades = []
+        return
+
+    def addStatements(self, name, probe, statements):
+        """
+        _addStatements_
+
+        Add an upgrade that runs a list of statements, e.g. ALTER TABLEs.
+        """
+        def action():
+            for statement in statements:
+                self.dbi.processData(statement)
+            return
+
+        self.upgrades.append((name, probe, action))
+        return
+
+    def addTables(self, name, probe, creator, tables, indexes = [],
+                  constraints = []):
+        """
+        _addTables_
+
+        Add an upgrade that creates some of the tables of a DBCreator.  Only
+        the given tables, indexes and constraints are kept in the creator, so
+        they are created with the same SQL and the same dialect specific
+        substitutions as on a fresh install.
+        """
+        creator.create = dict([(x, creator.create[x]) for x in tables])
+        creator.indexes = dict([(x, creator.indexes[x]) for x in indexes])
+        creator.constraints = dict([(x, creator.constraints[x]) for x in constraints])
+        creator.inserts = {}
+        if hasattr(creator, "requiredTables"):
+            creator.requiredTables = tables
+
+        self.upgrades.append((name, probe, creator.execute))
+        return
+
+    def isApplied(self, probe):
+        """
+        _isApplied_
+
+        Run a probe select outside of any transaction and return whether it
+        succeeded.
+        """
+        try:
+            self.dbi.processData(probe)
+        except Exception:
+            return False
+        return True
+
+    def pending(self):
+        """
+        _pending_
+
+        Return the names of the upgrades that haven't been applied.
+        """
+        return [name for (name, probe, action) in self.upgrades \
+                if not self.isApplied(probe)]
+
+    def execute(self, conn = None, transaction = False):
+        """
+        _execute_
+
+        Apply all pending upgrades in order and return their names.  Schema
+        changes commit implicitly on most databases, so every upgrade runs on
+        its own connection instead of in the caller's transaction.
+        """
+        applied = []
+        for (name, probe, action) in self.upgrades:
+            if self.isApplied(probe):
+                continue
+
+            self.logger.info("Applying schema upgrade %s" % name)
+            try:
+                action()
+            except Exception, ex:
+                msg = WMEXCEPTION['WMCore-2'] + '\n\n' + name + '\n\n' + str(ex)
+                self.logger.debug(msg)
+                raise WMException(msg, 'WMCore-2')
+            applied.append(name)
+
+        return applied
@@ -39,6 +39,16 @@ def stringLengthCompare(a, b):
         return 1
 
 class MySQLInterface(DBInterface):
+    def __init__(self, logger, engine):
+        DBInterface.__init__(self, logger, engine)
+
+        # Substituted SQL and bind variable order, keyed by the original SQL
+        # and the bind variable names.  DAOs run the same statements over and
+        # over so we only have to parse each one once.
+        self.substituteCache = {}
+        self.maxSubstituteCacheSize = 1000
+        return
+
     def substitute(self, origSQL, origBindsList):
         """
         _substitute_
@@ -65,6 +75,32 @@ class MySQLInterface(DBInterface):
         origBindsList = self.makelist(origBindsList)
         origBind = origBindsList[0]
 
+        cacheKey = (origSQL, tuple(sorted(origBind.keys())))
+        if not self.substituteCache.has_key(cacheKey):
+            if len(self.substituteCache) >= self.maxSubstituteCacheSize:
+                self.substituteCache = {}
+            self.substituteCache[cacheKey] = self.parseBinds(origSQL, origBind)
+
+        (updatedSQL, bindVarNames) = self.substituteCache[cacheKey]
+
+        mySQLBindVarsList = []
+        for origBind in origBindsList:
+            mySQLBindVars = []
+            for bindVarName in bindVarNames:
+                mySQLBindVars.append(origBind[bindVarName])
+
+            mySQLBindVarsList.append(tuple(mySQLBindVars))
+
+        return (updatedSQL, mySQLBindVarsList)
+
+    def parseBinds(self, origSQL, origBind):
+        """
+        _parseBinds_
+
+        Replace the named bind variables in the SQL with %s and return the
+        updated SQL along with the list of bind variable names in the order
+        they appear in the query.
+        """
         bindVarPositionList = []
         updatedSQL = copy.copy(origSQL)
 
@@ -105,15 +141,7 @@ class MySQLInterface(DBInterface):
 
         bindVarPositionList.sort(bindVarCompare)
 
-        mySQLBindVarsList = []
-        for origBind in origBindsList:
-            mySQLBindVars = []
-            for bindVarPosition in bindVarPositionList:
-                mySQLBindVars.append(origBind[bindVarPosition[0]])
-
-            mySQLBindVarsList.append(tuple(mySQLBindVars))
-
-        return (updatedSQL, mySQLBindVarsList)
+        return (updatedSQL, [x[0] for x in bindVarPositionList])
 
     def executebinds(self, s = None, b = None, connection = None,
                      returnCursor = False):
@@ -133,7 +161,16 @@ class MySQLInterface(DBInterface):
 
         Execute a SQL statement that has multiple sets of bind variables.
         Transform the bind variables into the format that MySQL expects.        
+        Selects that can be run with an IN clause are rewritten before the
+        bind variables are transformed.
         """
+        if s.strip().lower().startswith('select'):
+            inList = self.inListSelect(s.strip(), b)
+            if inList != None:
+                return self.makelist(self.executebinds(inList[0], inList[1],
+                                                       connection = connection,
+                                                       returnCursor = returnCursor))
+
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
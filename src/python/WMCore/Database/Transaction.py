@@ -31,6 +31,8 @@ class Transaction(WMObject):
         self.dbi = dbinterface
         self.conn = None
         self.transaction = None
+        self.commitHooks = []
+        self.rollbackHooks = []
 
     def begin(self):
         if self.conn == None:
@@ -52,9 +54,41 @@ class Transaction(WMObject):
                                       transaction = True)
         return result
 
+    def addCommitHook(self, hook):
+        """
+        Call hook once the transaction has been committed.  Hooks are dropped
+        if the transaction is rolled back.
+        """
+        self.commitHooks.append(hook)
+        return
+
+    def addRollbackHook(self, hook):
+        """
+        Call hook once the transaction has been rolled back.  Hooks are
+        dropped if the transaction is committed.
+        """
+        self.rollbackHooks.append(hook)
+        return
+
+    def runHooks(self, hooks):
+        """
+        Call all hooks and return the first exception raised by any of them.
+        """
+        firstError = None
+        for hook in hooks:
+            try:
+                hook()
+            except Exception, ex:
+                logging.error("Error in transaction hook: %s" % str(ex))
+                if firstError == None:
+                    firstError = ex
+        return firstError
+
     def commit(self):
         """
-        Commit the transaction and return the connection to the pool
+        Commit the transaction and return the connection to the pool.  The
+        first error raised by a commit hook is raised once all hooks ran, the
+        transaction is committed at that point.
         """
         if not self.transaction == None:
             self.transaction.commit()
@@ -63,20 +97,34 @@ class Transaction(WMObject):
             self.conn.close()
         self.conn = None
         self.transaction = None
+
+        commitHooks = self.commitHooks
+        self.commitHooks = []
+        self.rollbackHooks = []
+        error = self.runHooks(commitHooks)
+        if error != None:
+            raise error
        
     def rollback(self):
         """
         To be called if there is an exception and you want to roll back the
-        transaction and return the connection to the pool
+        transaction and return the connection to the pool.  Errors raised
+        by rollback hooks are only logged.
         """
-        if self.transaction:
-            self.transaction.rollback()
+        rollbackHooks = self.rollbackHooks
+        self.commitHooks = []
+        self.rollbackHooks = []
+        try:
+            if self.transaction:
+                self.transaction.rollback()
 
-        if self.conn:
-            self.conn.close()
+            if self.conn:
+                self.conn.close()
 
-        self.conn = None
-        self.transaction = None
+            self.conn = None
+            self.transaction = None
+        finally:
+            self.runHooks(rollbackHooks)
         return
 
     def rollbackForError(self):
@@ -33,6 +33,54 @@ class FwkJobReportException(WMException):
     """
     pass
 
+# Persisted reports start with this header line and a line with the size of
+# the pickled summary of the report, followed by the pickled summary and the
+# pickled report data.  Files without the header are plain pickles of the
+# report data.
+REPORT_HEADER  = "WMFWJR"
+REPORT_VERSION = 1
+
+def readReportHeader(handle):
+    """
+    _readReportHeader_
+
+    Read the header of a persisted report and return the format version and
+    the size of the pickled summary.  The version is 0 for reports that are
+    plain pickles.  The handle is left at the start of the pickled summary.
+    """
+    if handle.read(len(REPORT_HEADER)) != REPORT_HEADER:
+        handle.seek(0)
+        return (0, 0)
+
+    version = int(handle.readline())
+    if version > REPORT_VERSION:
+        msg = "Report format version %i is newer than %i" % (version, REPORT_VERSION)
+        raise FwkJobReportException(msg)
+    summarySize = int(handle.readline())
+    return (version, summarySize)
+
+def loadReportSummary(filename):
+    """
+    _loadReportSummary_
+
+    Load the summary of a persisted report without unpickling the rest of
+    the report.  Reports that were persisted without a summary are loaded
+    in full and summarized.  See Report.getSummary() for the contents.
+    """
+    handle = open(filename, 'rb')
+    try:
+        (version, summarySize) = readReportHeader(handle)
+        if version > 0:
+            summary = cPickle.loads(handle.read(summarySize))
+            if summary != None:
+                return summary
+    finally:
+        handle.close()
+
+    report = Report()
+    report.unpersist(filename)
+    return report.getSummary()
+
 def checkFileForCompletion(file):
     """
     _checkFileForCompletion_
@@ -304,14 +352,59 @@ class Report:
 
         return returnCode
 
-    def persist(self, filename):
+    def getSummary(self):
         """
-        _persist_
+        _getSummary_
 
-        Pickle this object and save it to disk.
+        Return the parts of the report that most components look at: the
+        steps and their status, the exit code, the first start and last stop
+        time and the output files of each step.  The performance and input
+        sections are left out.
         """
-        handle = open(filename, 'w')
-        cPickle.dump(self.data, handle)
+        stepStatus = {}
+        stepFiles  = {}
+        for stepName in self.listSteps():
+            stepReport = self.retrieveStep(stepName)
+            stepStatus[stepName] = getattr(stepReport, 'status', 1)
+            if getattr(stepReport, 'outputModules', None):
+                stepFiles[stepName] = self.getAllFilesFromStep(step = stepName)
+            else:
+                stepFiles[stepName] = []
+
+        return {'version': REPORT_VERSION,
+                'task': self.getTaskName(),
+                'jobID': self.getJobID(),
+                'steps': list(self.listSteps()),
+                'stepStatus': stepStatus,
+                'exitCode': self.getExitCode(),
+                'taskSuccessful': self.taskSuccessful(),
+                'times': self.getFirstStartLastStop(),
+                'files': stepFiles}
+
+    def persist(self, filename, summary = False):
+        """
+        _persist_
+
+        Pickle this object and save it to disk.  If summary is True the
+        report is saved behind a summary that can be loaded on its own with
+        loadReportSummary().  Only the final report of a job needs one, the
+        step reports that are persisted while the job runs don't.
+        """
+        if summary:
+            try:
+                summary = self.getSummary()
+            except Exception, ex:
+                logging.error("Could not summarize report for %s: %s" % (filename, str(ex)))
+                summary = None
+        else:
+            summary = None
+
+        summary = cPickle.dumps(summary, cPickle.HIGHEST_PROTOCOL)
+
+        handle = open(filename, 'wb')
+        handle.write("%s%i\n%i\n" % (REPORT_HEADER, REPORT_VERSION, len(summary)))
+        handle.write(summary)
+        cPickle.dump(self.data, handle, cPickle.HIGHEST_PROTOCOL)
         handle.close()
         return
 
@@ -321,7 +414,11 @@ class Report:
 
         Load a pickled FWJR from disk.
         """
-        handle = open(filename, 'r')
+        handle = open(filename, 'rb')
+        (version, summarySize) = readReportHeader(handle)
+        if version > 0:
+            # Skip over the summary
+            handle.seek(summarySize, 1)
         self.data = cPickle.load(handle)
         handle.close()
         return
@@ -3,6 +3,11 @@
 _XMLParser_
 
 Read the raw XML output from the cmsRun executable. 
+
+The report is parsed as a stream: the expat events are turned into a Node
+structure for one section of the report (a File, an InputFile, the
+PerformanceReport...) at a time, and each section is handed to the handlers
+and dropped as soon as it is complete.
 """
 
 
@@ -15,7 +20,7 @@ import xml.parsers.expat
 
 from WMCore.FwkJobReport import Report
 from WMCore.DataStructs.Run import Run
-from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine
+from WMCore.Algorithms.ParseXMLFile import Node, xmlFileToNode, coroutine, expat_parse
 
 def reportBuilder(nodeStruct, report, target):
     """
@@ -43,22 +48,64 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send( (report, subnode) )
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send( (report, subnode) )
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send( (report, subnode) )
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send( (report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send( (report, subnode) )
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send( (report, subnode) )
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send( (report, subnode) )
-            else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+            dispatchSection(targets, report, subnode)
+
+def dispatchSection(targets, report, subnode):
+    """
+    _dispatchSection_
+
+    Send a section of the FrameworkJobReport to the appropriate handler.
+    """
+    if subnode.name == "File":
+        targets['File'].send( (report, subnode) )
+    elif subnode.name == "InputFile":
+        targets['InputFile'].send( (report, subnode) )
+    elif subnode.name == "AnalysisFile":
+        targets['AnalysisFile'].send( (report, subnode) )
+    elif subnode.name == "PerformanceReport":
+        targets['PerformanceReport'].send( (report, subnode))
+    elif subnode.name == "FrameworkError":
+        targets['FrameworkError'].send( (report, subnode) )
+    elif subnode.name == "SkippedFile":
+        targets['SkippedFile'].send( (report, subnode) )
+    elif subnode.name == "SkippedEvent":
+        targets['SkippedEvent'].send( (report, subnode) )
+    else:
+        setattr(report.report.parameters, subnode.name, subnode.text)
+    return
+
+@coroutine
+def reportStreamer(report, targets):
+    """
+    _reportStreamer_
+
+    Fed from expat_parse.  Builds the Node structure for one section of the
+    FrameworkJobReport at a time and dispatches each section to the
+    handlers as soon as its end tag is seen.  Only the section that is being
+    parsed is kept in memory.
+    """
+    nodeStack = []
+    charCache = []
+    while True:
+        event, value = (yield)
+        if event == "start":
+            charCache = []
+            newnode = Node(value[0], value[1])
+            if len(nodeStack) > 1:
+                nodeStack[-1].children.append(newnode)
+            nodeStack.append(newnode)
+
+        elif event == "text":
+            charCache.append(value)
+
+        else: # end
+            node = nodeStack.pop()
+            node.text = str(''.join(charCache)).strip()
+            charCache = []
+            if len(nodeStack) == 0 and node.name != "FrameworkJobReport":
+                print "Not Handling: ", node.name
+            elif len(nodeStack) == 1 and nodeStack[0].name == "FrameworkJobReport":
+                dispatchSection(targets, report, node)
 
 @coroutine
 def fileHandler(targets):
@@ -473,20 +520,12 @@ def perfStoreHandler():
 
 
 
-def xmlToJobReport(reportInstance, xmlFile):
+def buildDispatchers():
     """
-    _xmlToJobReport_
-
-    parse the XML file and insert the information into the
-    Report instance provided
+    _buildDispatchers_
 
+    Set up the coroutine pipeline for the sections of a report.
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
-
-    #  //
-    # // Set up coroutine pipeline
-    #//
     fileDispatchers = {
         "Runs" : runHandler(),
         "Branches" : branchHandler(),
@@ -510,15 +549,54 @@ def xmlToJobReport(reportInstance, xmlFile):
         "SkippedEvent" : skippedEventHandler(),
         }
 
+    return dispatchers
+
+def xmlToJobReport(reportInstance, xmlFile):
+    """
+    _xmlToJobReport_
+
+    parse the XML file and insert the information into the
+    Report instance provided
+
+    """
+    handle = open(xmlFile, 'r')
+    try:
+        # Make sure the whole file is well formed before anything goes
+        # into the report, so a corrupt file doesn't leave half a report
+        xml.parsers.expat.ParserCreate().ParseFile(handle)
+        handle.seek(0)
+
+        #  //
+        # // Stream the XML through the coroutine pipeline
+        #//
+        expat_parse(handle, reportStreamer(reportInstance, buildDispatchers()))
+    finally:
+        handle.close()
+
+    return
+
+def nodeXmlToJobReport(reportInstance, xmlFile):
+    """
+    _nodeXmlToJobReport_
+
+    parse the XML file into a Node structure first and then insert the
+    information into the Report instance provided.  This keeps the whole
+    document in memory, xmlToJobReport should be used instead.
+
+    """
+    # read XML, build node structure
+    node = xmlFileToNode(xmlFile)
+
     #  //
     # // Feed pipeline with node structure and report result instance
     #//
     reportBuilder(
         node, reportInstance,
-        reportDispatcher(dispatchers)
+        reportDispatcher(buildDispatchers())
         )
 
     return
+
 childrenMatching = lambda node, nname: [x for x in node.children if x.name == nname]
 
 
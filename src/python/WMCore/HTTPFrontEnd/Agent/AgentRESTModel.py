@@ -9,6 +9,7 @@ import logging
 
 from WMCore.WebTools.RESTModel import RESTModel
 from WMCore.DAOFactory import DAOFactory
+from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
 from WMCore.Services.Requests import JSONRequests
 from WMCore.HTTPFrontEnd.WMBS.External.CouchDBSource.CouchDBConnectionBase \
     import CouchDBConnectionBase
@@ -24,11 +25,14 @@ class AgentRESTModel(RESTModel):
 
         self.daofactory = DAOFactory(package = "WMCore.Agent.Database", 
                                      logger = self, dbinterface = self.dbi)
+        self.heartbeatAPI = HeartbeatAPI("AgentRESTModel", logger = self,
+                                         dbi = self.dbi)
 
         self._addDAO('GET', "heartbeatInfo", "GetHeartbeatInfo")
         self._addDAO('GET', "heartbeatInfoDetail", "GetAllHeartbeatInfo")
         self._addDAO('GET', "agentstatus", "CheckComponentStatus")
         self._addMethod('GET', "heartbeat", self.getHeartBeatWarning)
+        self._addMethod('GET', "cycleinfo", self.getCycleInfo)
          #External couch call
         self._addMethod('GET', "acdclink", self.getACDCInfo)
     
@@ -41,4 +45,18 @@ class AgentRESTModel(RESTModel):
         for result in results:
             result['ago'] = int(time.time()) - result['last_updated']
             result['alarm'] =  result['update_threshold'] - result['ago']
+        return results
+
+    def getCycleInfo(self):
+        """
+        _getCycleInfo_
+
+        Return the stats of the last cycle of every worker, with the time
+        that wasn't spent in the database or in HTTP calls.  Nothing is
+        returned until the agent database has the cycle stats columns.
+        """
+        results = self.heartbeatAPI.getWorkerCycles()
+        for cycle in results:
+            cycle['other_time'] = max(cycle['cycle_time'] - (cycle['db_time'] or 0) -
+                                      (cycle['http_time'] or 0), 0)
         return results
\ No newline at end of file
@@ -44,7 +44,8 @@ class JobFactory(WMObject):
         self.proxies       = []
         self.grabByProxy   = False
         self.daoFactory    = None
-        self.timing = {'jobInstance': 0, 'sortByLocation': 0, 'acquireFiles': 0, 'jobGroup': 0}
+        self.includeParents = False
+        self.parentCache   = {}
 
         if package == 'WMCore.WMBS':
             myThread = threading.currentThread() 
@@ -68,6 +69,10 @@ class JobFactory(WMObject):
         self.siteBlacklist = kwargs.get("siteBlacklist", [])
         self.siteWhitelist = kwargs.get("siteWhitelist", [])
 
+        # Parentage is only cached for the duration of one splitting call
+        self.includeParents = kwargs.get("include_parents", False)
+        self.parentCache = {}
+
         # Every time we restart, re-zero the jobs
         self.nJobs = 0
 
@@ -195,6 +200,9 @@ class JobFactory(WMObject):
             fileset = self.subscription.availableFiles(limit = self.limit, doingJobSplitting = True)
             logging.debug("About to load files by DAO")
 
+        if self.includeParents and self.package == 'WMCore.WMBS':
+            self.loadParents([x['lfn'] for x in fileset])
+
         for file in fileset:
             locSet = frozenset(file['locations'])
 
@@ -355,38 +363,87 @@ class JobFactory(WMObject):
         return formattedResults
 
 
-    def findParent(self, lfn): 
-        """ 
-        _findParent_ 
-        
-        Find the parents for a file based on its lfn 
-        """ 
-        
-        parentsInfo = self.getParentInfoAction.execute([lfn]) 
-        newParents  = set() 
-        for parentInfo in parentsInfo: 
-            
-            # This will catch straight to merge files that do not have redneck 
-            # parents.  We will mark the straight to merge file from the job 
-            # as a child of the merged parent. 
-            if int(parentInfo["merged"]) == 1: 
-                newParents.add(parentInfo["lfn"]) 
-                
-            elif parentInfo['gpmerged'] == None: 
-                continue 
-            
-            # Handle the files that result from merge jobs that aren't redneck 
-            # children.  We have to setup parentage and then check on whether or 
-            # not this file has any redneck children and update their parentage 
-            # information. 
-            elif int(parentInfo["gpmerged"]) == 1: 
-                newParents.add(parentInfo["gplfn"]) 
- 		 
-            # If that didn't work, we've reached the great-grandparents 
-            # And we have to work via recursion 
-            else: 
-                parentSet = self.findParent(lfn = parentInfo['gplfn']) 
-                for parent in parentSet: 
-                    newParents.add(parent) 
-                    
-        return newParents 
+    def loadParents(self, lfns):
+        """
+        _loadParents_
+
+        Load the parents for a list of files, walking up the parentage chain
+        one level at a time so that every level is a single bulk query
+        instead of one query per file.  The results are cached for the rest
+        of the splitting call and are used by findParent().
+        """
+        parentsInfo = {}
+        toLoad = set([x for x in lfns if not x in self.parentCache])
+
+        while len(toLoad) > 0:
+            for lfn in toLoad:
+                parentsInfo[lfn] = []
+
+            nextLevel = set()
+            for parentInfo in self.getParentInfoAction.execute(list(toLoad)):
+                parentsInfo[parentInfo["child_lfn"]].append(parentInfo)
+
+                if int(parentInfo["merged"]) == 1 or parentInfo["gpmerged"] == None \
+                       or int(parentInfo["gpmerged"]) == 1:
+                    continue
+
+                gpLFN = parentInfo["gplfn"]
+                if not gpLFN in parentsInfo and not gpLFN in self.parentCache:
+                    nextLevel.add(gpLFN)
+
+            toLoad = nextLevel
+
+        for lfn in lfns:
+            self.resolveParents(lfn, parentsInfo)
+
+        return
+
+    def resolveParents(self, lfn, parentsInfo):
+        """
+        _resolveParents_
+
+        Work out the merged parents of a file from the parentage information
+        loaded by loadParents() and store them in the parent cache.
+        """
+        if lfn in self.parentCache:
+            return self.parentCache[lfn]
+
+        newParents = set()
+        for parentInfo in parentsInfo.get(lfn, []):
+
+            # This will catch straight to merge files that do not have redneck
+            # parents.  We will mark the straight to merge file from the job
+            # as a child of the merged parent.
+            if int(parentInfo["merged"]) == 1:
+                newParents.add(parentInfo["lfn"])
+
+            elif parentInfo['gpmerged'] == None:
+                continue
+
+            # Handle the files that result from merge jobs that aren't redneck
+            # children.  We have to setup parentage and then check on whether or
+            # not this file has any redneck children and update their parentage
+            # information.
+            elif int(parentInfo["gpmerged"]) == 1:
+                newParents.add(parentInfo["gplfn"])
+
+            # If that didn't work, we've reached the great-grandparents
+            # And we have to work via recursion
+            else:
+                newParents.update(self.resolveParents(parentInfo['gplfn'],
+                                                      parentsInfo))
+
+        self.parentCache[lfn] = newParents
+        return newParents
+
+    def findParent(self, lfn):
+        """
+        _findParent_
+
+        Find the parents for a file based on its lfn.  Parents that were
+        prefetched by sortByLocation() are served from the cache.
+        """
+        if not lfn in self.parentCache:
+            self.loadParents([lfn])
+
+        return self.parentCache[lfn]
@@ -16,50 +16,13 @@ import threading
 import traceback
 
 from WMCore.DataStructs.Run import Run
+from WMCore.DataStructs.LumiMask import LumiMask
 
 from WMCore.JobSplitting.JobFactory import JobFactory
 from WMCore.WMBS.File               import File
 from WMCore.DataStructs.Fileset     import Fileset
 
 
-def isGoodLumi(goodRunList, run, lumi):
-    """
-    _isGoodLumi_
-
-    Checks to see if runs match a run-lumi combination in the goodRunList
-    This is a pain in the ass.
-    """
-    if goodRunList == None or goodRunList == {}:
-        return True
-
-    if not isGoodRun(goodRunList = goodRunList, run = run):
-        return False
-
-    for runRange in goodRunList.get(str(run), [[]]):
-        # For each run range, which should have 2 elements
-        if not len(runRange) == 2:
-            # Then we're very confused and should exit
-            logging.error("Invalid run range!  Failing this lumi!")
-        elif runRange[0] <= lumi and runRange[1] >= lumi:
-            # If a lumi is within a particular runRange, return true.
-            return True
-    return False
-
-def isGoodRun(goodRunList, run):
-    """
-    _isGoodRun_
-
-    Tell if this is a good run
-    """
-    if goodRunList == None or goodRunList == {}:
-        return True
-
-    if str(run) in goodRunList.keys():
-        # @e can find a run
-        return True
-
-    return False
-
 class LumiBased(JobFactory):
     """
     Split jobs by number of events
@@ -84,9 +47,9 @@ class LumiBased(JobFactory):
         collectionName  = kwargs.get('collectionName', None)
         splitOnRun      = kwargs.get('splitOnRun', True)
         getParents      = kwargs.get('include_parents', False)
-        runWhitelist    = kwargs.get('runWhitelist', [])
+        runWhitelist    = set(kwargs.get('runWhitelist', []))
 
-        goodRunList = {}
+        lumiMask = LumiMask()
         # If we have runLumi info, we need to load it from couch
         if collectionName:
             try:
@@ -100,7 +63,7 @@ class LumiBased(JobFactory):
 
                 logging.info('Creating jobs for ACDC fileset %s' % filesetName)
                 dcs = DataCollectionService(couchURL, couchDB)
-                goodRunList = dcs.getLumiWhitelist(collectionName, filesetName, owner, group)
+                lumiMask = dcs.getLumiMask(collectionName, filesetName, owner, group)
             except Exception, ex:
                 msg =  "Exception while trying to load goodRunList\n"
                 if ignoreACDC:
@@ -108,7 +71,7 @@ class LumiBased(JobFactory):
                     msg += str(ex)
                     msg += str(traceback.format_exc())
                     logging.error(msg)
-                    goodRunList = {}
+                    lumiMask = LumiMask()
                 else:
                     msg +=  "Refusing to create any jobs.\n"
                     msg += str(ex)
@@ -177,7 +140,7 @@ class LumiBased(JobFactory):
                     stopJob = True
 
                 for run in f['runs']:
-                    if not isGoodRun(goodRunList = goodRunList, run = run.run):
+                    if not lumiMask.isGoodRun(run.run):
                         # Then skip this one
                         continue
                     if len(runWhitelist) > 0 and not run.run in runWhitelist:
@@ -191,7 +154,7 @@ class LumiBased(JobFactory):
 
                     # Now loop over the lumis
                     for lumi in run:
-                        if not isGoodLumi(goodRunList, run = run.run, lumi = lumi):
+                        if not lumiMask.isGoodLumi(run.run, lumi):
                             # Kill the chain of good lumis
                             # Skip this lumi
                             if firstLumi != None and firstLumi != lumi:
@@ -72,6 +72,7 @@ class TwoFileBased(JobFactory):
         listOfFiles  = []
 
         #Get a dictionary of sites, files
+        self.includeParents = True
         locationDict = self.sortByLocation()
 
         for location in locationDict.keys():
@@ -111,43 +112,3 @@ class TwoFileBased(JobFactory):
             
 
         return
-
-
-
-
-    def findParent(self, lfn):
-        """
-        _findParent_
-
-        Find the parents for a file based on its lfn
-        """
-
-
-        parentsInfo = self.getParentInfoAction.execute([lfn])
-        newParents = set()
-        for parentInfo in parentsInfo:
-
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1:
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] == None:
-                continue
-
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1:
-                newParents.add(parentInfo["gplfn"])
-
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findParent(lfn = parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
-
-        return newParents
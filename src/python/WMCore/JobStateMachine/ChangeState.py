@@ -5,13 +5,17 @@ _ChangeState_
 Propagate a job from one state to another.
 """
 
+import os
+import sys
 import time
 import logging
+import threading
 import traceback
 
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.Database.CMSCouch import CouchConflictError
 from WMCore.DataStructs.WMObject import WMObject
+from WMCore.JobStateMachine.CouchJournal import getJournal
 from WMCore.JobStateMachine.Transitions import Transitions
 from WMCore.Services.UUID import makeUUID
 from WMCore.WMConnectionBase import WMConnectionBase
@@ -42,8 +46,24 @@ class ChangeState(WMObject, WMConnectionBase):
         self.setCouchDAO = self.daofactory("Jobs.SetCouchID")
         self.incrementRetryDAO = self.daofactory("Jobs.IncrementRetry")
         self.workflowTaskDAO = self.daofactory("Jobs.GetWorkflowTask")
+        self.getStateDAO = self.daofactory("Jobs.GetState")
 
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
+        self.bulkTransitions = getattr(self.config.JobStateMachine, 'couchBulkTransitions', True)
+        self.bulkTransitionChunkSize = getattr(self.config.JobStateMachine, 'couchBulkChunkSize', 1000)
+
+        # In write behind mode the couch documents are spooled to a local
+        # journal and committed to couch by a background thread.
+        self.journal = None
+        if getattr(self.config.JobStateMachine, 'couchWriteBehind', False):
+            journalDir = getattr(self.config.JobStateMachine, 'journalDir', None)
+            if journalDir == None:
+                journalDir = os.path.join(self.config.General.workDir, "CouchJournal")
+            journalDir = os.path.join(journalDir, self.dbname.replace("/", "_"))
+            self.journal = getJournal(journalDir, self.flushJournalEntries,
+                                      getattr(self.config.JobStateMachine, 'journalFlushInterval', 30),
+                                      getattr(self.config.JobStateMachine, 'journalMaxEntries', 500),
+                                      self.resolveJournalEntry)
         return
 
     def propagate(self, jobs, newstate, oldstate):
@@ -62,15 +82,67 @@ class ChangeState(WMObject, WMConnectionBase):
         # 1. Is the state transition allowed?
         self.check(newstate, oldstate)
         # 2. Document the state transition
+        journalEntry = None
         try:
-            self.recordInCouch(jobs, newstate, oldstate)
+            journalEntry = self.recordInCouch(jobs, newstate, oldstate)
         except Exception, ex:
             logging.error("Error updating job in couch: %s" % str(ex))
             logging.error(traceback.format_exc())
             
-        # 3. Make the state transition
-        self.persist(jobs, newstate, oldstate)
+        # 3. In write behind mode spool the transition before making it, a
+        # failure to write the journal fails the state change.
+        entryName = None
+        if journalEntry != None:
+            entryName = self.journal.enqueue(journalEntry, pending = True)
+
+        # 4. Make the state transition
+        try:
+            self.persist(jobs, newstate, oldstate)
+        except:
+            if entryName != None:
+                self.journal.discard(entryName)
+            raise
+
+        # 5. Publish the transition once it is committed
+        if entryName != None:
+            self.journalOnCommit(entryName)
+        return
+
+    def journalOnCommit(self, entryName):
+        """
+        _journalOnCommit_
+
+        Activate a pending couch journal entry once the state change has been
+        committed and discard it if the state change is rolled back, so that
+        rolled back state changes never reach couch.  Without an open
+        transaction the state change has already been committed by the DAOs.
+        """
+        if self.existingTransaction():
+            myThread = threading.currentThread()
+            myThread.transaction.addCommitHook(lambda: self.journal.activate(entryName))
+            myThread.transaction.addRollbackHook(lambda: self.journal.discard(entryName))
+        else:
+            self.journal.activate(entryName)
         return
+
+    def resolveJournalEntry(self, entry):
+        """
+        _resolveJournalEntry_
+
+        Decide whether the state change of a pending journal entry left
+        behind by a crash was committed.  It was rolled back if none of its
+        jobs left the old state, including jobs that don't exist because
+        their creation was rolled back.  Jobs that moved on are taken as
+        committed, so the transition is replayed.
+        """
+        if not entry.has_key("jobids"):
+            return True
+
+        jobStates = self.getStateDAO.execute(entry["jobids"])
+        for jobState in jobStates:
+            if jobState["state"] != entry["oldstate"]:
+                return True
+        return False
     
     def check(self, newstate, oldstate):
         """
@@ -92,8 +164,11 @@ class ChangeState(WMObject, WMConnectionBase):
         Record relevant job information in couch. If the job does not yet exist
         in couch it will be saved as a seperate document.  If the job has a FWJR
         attached that will be saved as a seperate document.
+
+        In write behind mode nothing is sent to couch, the documents and
+        transitions are returned as a couch journal entry instead.
         """
-        if not self.jobsdatabase or not self.fwjrdatabase:
+        if self.journal == None and (not self.jobsdatabase or not self.fwjrdatabase):
             return
         
         jobMap = {}
@@ -122,7 +197,10 @@ class ChangeState(WMObject, WMConnectionBase):
 
         timestamp = int(time.time())
         couchRecordsToUpdate = []
-        
+        transitionsToRecord = []
+        jobDocuments = []
+        fwjrDocuments = []
+
         for jobID in jobMap.keys():
             job = jobMap[jobID]
             couchDocID = job.get("couch_record", None)
@@ -184,21 +262,13 @@ class ChangeState(WMObject, WMConnectionBase):
                 jobDocument["jobType"] = job.get("jobType", "Unknown")
 
                 couchRecordsToUpdate.append({"jobid": job["id"],
-                                             "couchid": jobDocument["_id"]})                
-                self.jobsdatabase.queue(jobDocument)
+                                             "couchid": jobDocument["_id"]})
+                jobDocuments.append(jobDocument)
             else:
-                # We send a PUT request to the stateTransition update handler.
-                # Couch expects the parameters to be passed as arguments to in
-                # the URI while the Requests class will only encode arguments
-                # this way for GET requests.  Changing the Requests class to
-                # encode PUT arguments as couch expects broke a bunch of code so
-                # we'll just do our own encoding here.
-                updateUri = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/stateTransition/" + couchDocID
-                updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (oldstate,
-                                                                                    newstate,
-                                                                                    jobLocation,
-                                                                                    timestamp)
-                self.jobsdatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
+                transitionsToRecord.append((couchDocID, {"oldstate": oldstate,
+                                                         "newstate": newstate,
+                                                         "location": jobLocation,
+                                                         "timestamp": timestamp}))
 
             if job.get("fwjr", None):
                 # If there are too many input files, strip them out
@@ -216,18 +286,192 @@ class ChangeState(WMObject, WMConnectionBase):
                                 "jobid": job["id"],
                                 "retrycount": job["retry_count"],
                                 "fwjr": job["fwjr"].__to_json__(None),
-                                "type": "fwjr"}
-                self.fwjrdatabase.queue(fwjrDocument, timestamp = True)
+                                "type": "fwjr",
+                                "timestamp": int(time.time())}
+                fwjrDocuments.append(fwjrDocument)
 
         if len(couchRecordsToUpdate) > 0:
             self.setCouchDAO.execute(bulkList = couchRecordsToUpdate,
                                      conn = self.getDBConn(),
                                      transaction = self.existingTransaction())
-            
+
+        if self.journal != None:
+            return {"jobs": jobDocuments,
+                    "transitions": transitionsToRecord,
+                    "fwjrs": fwjrDocuments,
+                    "jobids": jobMap.keys(),
+                    "oldstate": oldstate,
+                    "newstate": newstate}
+
+        for jobDocument in jobDocuments:
+            self.jobsdatabase.queue(jobDocument)
+        for fwjrDocument in fwjrDocuments:
+            self.fwjrdatabase.queue(fwjrDocument)
+
+        if self.bulkTransitions:
+            self.recordTransitionsInBulk(transitionsToRecord)
+        else:
+            for (couchDocID, transition) in transitionsToRecord:
+                self.recordTransition(couchDocID, transition)
+
         self.jobsdatabase.commit()
-        self.fwjrdatabase.commit()        
+        self.fwjrdatabase.commit()
         return
 
+    def flushJournalEntries(self, entries):
+        """
+        _flushJournalEntries_
+
+        Commit the documents and transitions from a batch of couch journal
+        entries.  This runs in the journal thread so it uses its own couch
+        connections.  New job documents are committed before any transitions
+        are recorded so that transitions for jobs created earlier in the same
+        batch can be applied.  Documents that were already committed before a
+        crash are rejected by couch as conflicts and ignored, and transitions
+        that are already in the job document are skipped, so replaying an
+        entry is harmless.
+        """
+        couchServer = CouchServer(self.config.JobStateMachine.couchurl)
+        jobsDatabase = couchServer.connectDatabase("%s/jobs" % self.dbname)
+        fwjrDatabase = couchServer.connectDatabase("%s/fwjrs" % self.dbname)
+
+        transitions = []
+        for entry in entries:
+            for jobDocument in entry["jobs"]:
+                jobsDatabase.queue(jobDocument)
+            for fwjrDocument in entry["fwjrs"]:
+                fwjrDatabase.queue(fwjrDocument)
+            transitions.extend(entry["transitions"])
+
+        jobsDatabase.commit()
+        fwjrDatabase.commit()
+        self.recordTransitionsInBulk(transitions, jobsDatabase)
+        return
+
+    def recordTransition(self, couchDocID, transition, jobsDatabase = None):
+        """
+        _recordTransition_
+
+        Append a single state transition to a job document in couch through the
+        stateTransition update handler.
+        """
+        if jobsDatabase == None:
+            jobsDatabase = self.jobsdatabase
+
+        # We send a PUT request to the stateTransition update handler.
+        # Couch expects the parameters to be passed as arguments to in
+        # the URI while the Requests class will only encode arguments
+        # this way for GET requests.  Changing the Requests class to
+        # encode PUT arguments as couch expects broke a bunch of code so
+        # we'll just do our own encoding here.
+        updateUri = "/" + jobsDatabase.name + "/_design/JobDump/_update/stateTransition/" + couchDocID
+        updateUri += "?oldstate=%s&newstate=%s&location=%s&timestamp=%s" % (transition["oldstate"],
+                                                                            transition["newstate"],
+                                                                            transition["location"],
+                                                                            transition["timestamp"])
+        jobsDatabase.makeRequest(uri = updateUri, type = "PUT", decode = False)
+        return
+
+    def recordTransitionsInBulk(self, transitions, jobsDatabase = None):
+        """
+        _recordTransitionsInBulk_
+
+        Append state transitions to existing job documents in couch using the
+        bulk docs API.  The documents are retrieved and written back in chunks
+        of bulkTransitionChunkSize so that thousands of transitions only cost
+        a couple of HTTP requests.  Any document that can't be updated this
+        way (because it was modified under our feet or couldn't be loaded) is
+        updated with the per document stateTransition handler instead.
+
+        Transitions that are already recorded in the job document, i.e. that
+        have the same states, location and timestamp, are skipped.  If a
+        transition can't be recorded at all the first error is raised once
+        all the others have been tried, unless the transitions come from the
+        couch journal in which case the error is only logged.
+        """
+        if jobsDatabase == None:
+            jobsDatabase = self.jobsdatabase
+
+        retryTransitions = []
+        for offset in range(0, len(transitions), self.bulkTransitionChunkSize):
+            chunk = transitions[offset:offset + self.bulkTransitionChunkSize]
+
+            transitionMap = {}
+            for (couchDocID, transition) in chunk:
+                transitionMap.setdefault(couchDocID, []).append(transition)
+
+            result = jobsDatabase.allDocs(options = {"include_docs": True},
+                                          keys = transitionMap.keys())
+
+            updatedDocs = []
+            for row in result["rows"]:
+                jobDocument = row.get("doc", None)
+                if jobDocument == None:
+                    continue
+
+                maxKey = 0
+                recorded = set()
+                for key in jobDocument["states"].keys():
+                    maxKey = max(maxKey, int(key))
+                    recorded.add(self.transitionKey(jobDocument["states"][key]))
+
+                updated = False
+                for transition in transitionMap.pop(row["key"]):
+                    if self.transitionKey(transition) in recorded:
+                        continue
+                    recorded.add(self.transitionKey(transition))
+                    maxKey += 1
+                    jobDocument["states"][str(maxKey)] = transition
+                    updated = True
+
+                if updated:
+                    updatedDocs.append(jobDocument)
+
+            # Documents that were not returned by couch are retried below so
+            # that the error is reported the same way as the per doc path.
+            for couchDocID in transitionMap.keys():
+                for transition in transitionMap[couchDocID]:
+                    retryTransitions.append((couchDocID, transition))
+
+            if len(updatedDocs) == 0:
+                continue
+
+            bulkResults = jobsDatabase.post("/%s/_bulk_docs/" % jobsDatabase.name,
+                                            {"docs": updatedDocs})
+            failedDocIDs = set()
+            for bulkResult in bulkResults:
+                if bulkResult.get("error", None) != None:
+                    logging.info("Bulk state transition failed for %s: %s" % (bulkResult["id"],
+                                                                             bulkResult["error"]))
+                    failedDocIDs.add(bulkResult["id"])
+
+            for (couchDocID, transition) in chunk:
+                if couchDocID in failedDocIDs:
+                    retryTransitions.append((couchDocID, transition))
+
+        firstError = None
+        for (couchDocID, transition) in retryTransitions:
+            try:
+                self.recordTransition(couchDocID, transition, jobsDatabase)
+            except Exception, ex:
+                logging.error("Error recording transition for %s: %s" % (couchDocID, str(ex)))
+                if firstError == None:
+                    firstError = sys.exc_info()
+
+        if firstError != None and self.journal == None:
+            raise firstError[0], firstError[1], firstError[2]
+
+        return
+
+    def transitionKey(self, transition):
+        """
+        _transitionKey_
+
+        Identify a transition within a job document.
+        """
+        return (transition.get("oldstate", None), transition.get("newstate", None),
+                transition.get("location", None), transition.get("timestamp", None))
+
     def persist(self, jobs, newstate, oldstate):
         """
         _persist_
@@ -267,10 +511,18 @@ class ChangeState(WMObject, WMConnectionBase):
           - taskType
           - jobType
           - performance
+
+        If bulk transitions are enabled the FWJR information for all the jobs
+        is loaded with multi key view queries and the transitions are marked
+        as reported with bulk updates, otherwise one view query and one update
+        is done for every transition.
         """
         updateBase = "/" + self.jobsdatabase.name + "/_design/JobDump/_update/dashboardReporting/"
         viewResults = self.jobsdatabase.loadView("JobDump", "jobsToReport")
 
+        if self.bulkTransitions:
+            fwjrRows = self.loadFWJRsForDashboard(viewResults["rows"])
+
         jobsToReport = []
         for viewResult in viewResults["rows"]:
             jobReport = {"performance": {},
@@ -288,13 +540,17 @@ class ChangeState(WMObject, WMConnectionBase):
                 jobsToReport.append(jobReport)
             else:
                 # Otherwise we actually have to load something out of the DB
-                fwjrResults = self.fwjrdatabase.loadView("FWJRDump", "jobsToReport",
-                                                         options = {"startkey": [jobReport["id"], jobReport["retryCount"], 0],
-                                                                    "endkey": [jobReport["id"], jobReport["retryCount"], {}]})
+                if self.bulkTransitions:
+                    rows = fwjrRows.get((jobReport["id"], jobReport["retryCount"]), [])
+                else:
+                    fwjrResults = self.fwjrdatabase.loadView("FWJRDump", "jobsToReport",
+                                                             options = {"startkey": [jobReport["id"], jobReport["retryCount"], 0],
+                                                                        "endkey": [jobReport["id"], jobReport["retryCount"], {}]})
+                    rows = fwjrResults["rows"]
 
                 errorTime = None
                 exitCode = 0
-                for row in fwjrResults["rows"]:
+                for row in rows:
                     jobReport["performance"][row["value"][0]] = row["value"][2]
                     
                     errors = row["value"][3]
@@ -308,6 +564,9 @@ class ChangeState(WMObject, WMConnectionBase):
                 del jobReport["id"]
                 jobsToReport.append(jobReport)
 
+            if self.bulkTransitions:
+                continue
+
             updateUri = updateBase + str(viewResult["value"]["id"])
             updateUri += "?index=%s" % (viewResult["value"]["index"])
             try:
@@ -316,5 +575,75 @@ class ChangeState(WMObject, WMConnectionBase):
                 # The document has been updated under our feet, ignore the error and we'll
                 # update it on the next polling cycle.
                 pass
+
+        if self.bulkTransitions:
+            self.markReportedInBulk(viewResults["rows"])
             
         return jobsToReport
+
+    def loadFWJRsForDashboard(self, viewResults):
+        """
+        _loadFWJRsForDashboard_
+
+        Load the FWJR performance and error information for all the dashboard
+        transitions that need it.  The FWJRDump/jobsToReportByJobID view is
+        queried with multiple keys, bulkTransitionChunkSize keys at a time.
+        Returns a dictionary keyed by (jobid, retrycount) tuples.
+        """
+        fwjrKeys = set()
+        for viewResult in viewResults:
+            if viewResult["value"].get("newState", None) in ["executing", "jobfailed"]:
+                continue
+
+            fwjrKeys.add((viewResult["value"]["id"], viewResult["value"]["retryCount"]))
+
+        fwjrKeys = [list(x) for x in fwjrKeys]
+
+        fwjrRows = {}
+        for offset in range(0, len(fwjrKeys), self.bulkTransitionChunkSize):
+            fwjrResults = self.fwjrdatabase.loadView("FWJRDump", "jobsToReportByJobID",
+                                                     keys = fwjrKeys[offset:offset + self.bulkTransitionChunkSize])
+            for row in fwjrResults["rows"]:
+                fwjrRows.setdefault(tuple(row["key"]), []).append(row)
+
+        return fwjrRows
+
+    def markReportedInBulk(self, viewResults):
+        """
+        _markReportedInBulk_
+
+        Mark dashboard transitions as reported using the bulk docs API, doing
+        the same thing as the dashboardReporting update handler.  Documents
+        that have been updated under our feet are skipped, they will be
+        reported again on the next polling cycle.
+        """
+        reportedMap = {}
+        for viewResult in viewResults:
+            reportedMap.setdefault(str(viewResult["value"]["id"]), []).append(viewResult["value"]["index"])
+
+        couchDocIDs = reportedMap.keys()
+        for offset in range(0, len(couchDocIDs), self.bulkTransitionChunkSize):
+            result = self.jobsdatabase.allDocs(options = {"include_docs": True},
+                                               keys = couchDocIDs[offset:offset + self.bulkTransitionChunkSize])
+
+            updatedDocs = []
+            for row in result["rows"]:
+                jobDocument = row.get("doc", None)
+                if jobDocument == None:
+                    continue
+
+                for index in reportedMap[row["key"]]:
+                    jobDocument["states"][index]["reported"] = True
+                updatedDocs.append(jobDocument)
+
+            if len(updatedDocs) == 0:
+                continue
+
+            bulkResults = self.jobsdatabase.post("/%s/_bulk_docs/" % self.jobsdatabase.name,
+                                                 {"docs": updatedDocs})
+            for bulkResult in bulkResults:
+                if bulkResult.get("error", None) != None:
+                    logging.info("Could not mark transitions reported for %s: %s" % (bulkResult["id"],
+                                                                                    bulkResult["error"]))
+
+        return
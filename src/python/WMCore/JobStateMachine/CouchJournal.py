@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""
+_CouchJournal_
+
+Durable write-behind spool for the couch documents produced by the job state
+machine.  Each batch of documents is written to its own file in the journal
+directory before the relational state change is made, with a pending marker.
+The entry is activated once the state change is committed and discarded if it
+is rolled back.  A background thread merges the active journal entries and
+hands them to a flush callback in large batches, removing the files once the
+callback succeeds.  Entries left behind by a crash are replayed the next time
+a journal is started on the same directory.  Delivery is at least once: an
+entry that was flushed right before a crash, but not yet removed, is handed to
+the callback a second time.
+
+A crash between the relational commit and the activation leaves a pending
+entry behind whose writer is gone.  Such entries are handed to the
+resolvePending callback, which decides from the database whether the state
+change was committed.  Without a callback they are activated.
+
+Several processes may write into the same journal directory, an exclusive lock
+on the directory makes sure only one of them flushes it at any given time.
+"""
+
+import os
+import time
+import errno
+import fcntl
+import logging
+import threading
+import traceback
+import cPickle
+
+_journals = {}
+_journalsLock = threading.Lock()
+
+def getJournal(journalDir, flushCallback, flushInterval = 30, maxEntries = 500,
+               resolvePending = None):
+    """
+    _getJournal_
+
+    Return the journal for the given directory, creating and starting it if
+    this process doesn't have one yet.
+    """
+    journalDir = os.path.abspath(journalDir)
+    _journalsLock.acquire()
+    try:
+        journal = _journals.get(journalDir, None)
+        if journal == None or not journal.isAlive():
+            journal = CouchJournal(journalDir, flushCallback, flushInterval,
+                                   maxEntries, resolvePending)
+            journal.start()
+            _journals[journalDir] = journal
+    finally:
+        _journalsLock.release()
+
+    return journal
+
+class CouchJournal(threading.Thread):
+    """
+    _CouchJournal_
+
+    Spool couch documents to disk and flush them in the background.
+    """
+    def __init__(self, journalDir, flushCallback, flushInterval = 30,
+                 maxEntries = 500, resolvePending = None):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+
+        self.journalDir = journalDir
+        self.flushCallback = flushCallback
+        self.resolvePending = resolvePending
+        self.flushInterval = flushInterval
+        self.maxEntries = maxEntries
+
+        if not os.path.isdir(self.journalDir):
+            os.makedirs(self.journalDir)
+
+        self.sequence = 0
+        self.sequenceLock = threading.Lock()
+        self.flushLock = threading.Lock()
+        self.wakeUp = threading.Event()
+        self._stopFlag = False
+        return
+
+    def enqueue(self, entry, pending = False):
+        """
+        _enqueue_
+
+        Write an entry to the journal and return its name.  The entry is
+        written to a temporary file that is synced and then renamed so that
+        a partially written entry is never replayed.  Pending entries aren't
+        flushed until they are activated.  Errors, e.g. a full disk, are
+        raised.
+        """
+        self.sequenceLock.acquire()
+        try:
+            self.sequence += 1
+            entryName = "%017.6f-%d-%08d" % (time.time(), os.getpid(),
+                                              self.sequence)
+        finally:
+            self.sequenceLock.release()
+
+        tmpPath = os.path.join(self.journalDir, ".%s.tmp" % entryName)
+        entryFile = open(tmpPath, "wb")
+        try:
+            cPickle.dump(entry, entryFile, cPickle.HIGHEST_PROTOCOL)
+            entryFile.flush()
+            os.fsync(entryFile.fileno())
+        finally:
+            entryFile.close()
+
+        suffix = "journal"
+        if pending:
+            suffix = "pending"
+        os.rename(tmpPath, os.path.join(self.journalDir, "%s.%s" % (entryName, suffix)))
+        self.syncDirectory()
+        return entryName
+
+    def activate(self, entryName):
+        """
+        _activate_
+
+        Make a pending entry available for flushing.
+        """
+        os.rename(os.path.join(self.journalDir, "%s.pending" % entryName),
+                  os.path.join(self.journalDir, "%s.journal" % entryName))
+        self.syncDirectory()
+        return
+
+    def discard(self, entryName):
+        """
+        _discard_
+
+        Remove a pending entry.
+        """
+        os.remove(os.path.join(self.journalDir, "%s.pending" % entryName))
+        return
+
+    def syncDirectory(self):
+        """
+        _syncDirectory_
+
+        Sync the journal directory so that renames survive a crash.
+        """
+        dirFD = os.open(self.journalDir, os.O_RDONLY)
+        try:
+            os.fsync(dirFD)
+        finally:
+            os.close(dirFD)
+        return
+
+    def orphanedEntries(self):
+        """
+        _orphanedEntries_
+
+        Return the names of the pending entries whose writer process is gone.
+        """
+        orphans = []
+        for fileName in os.listdir(self.journalDir):
+            if not fileName.endswith(".pending"):
+                continue
+            entryName = fileName[:-len(".pending")]
+            pid = int(entryName.split("-")[1])
+            if pid == os.getpid():
+                continue
+            try:
+                os.kill(pid, 0)
+            except OSError, ex:
+                if ex.errno == errno.ESRCH:
+                    orphans.append(entryName)
+
+        orphans.sort()
+        return orphans
+
+    def resolveOrphans(self):
+        """
+        _resolveOrphans_
+
+        Activate or discard the pending entries left behind by processes that
+        died, depending on whether their state change was committed.
+        """
+        for entryName in self.orphanedEntries():
+            entryFile = open(os.path.join(self.journalDir, "%s.pending" % entryName), "rb")
+            try:
+                entry = cPickle.load(entryFile)
+            finally:
+                entryFile.close()
+
+            if self.resolvePending == None or self.resolvePending(entry):
+                logging.info("Activating orphaned couch journal entry %s" % entryName)
+                self.activate(entryName)
+            else:
+                logging.info("Discarding orphaned couch journal entry %s" % entryName)
+                self.discard(entryName)
+
+        return
+
+    def pendingEntries(self):
+        """
+        _pendingEntries_
+
+        Return the sorted list of active journal files that have not been
+        flushed.
+        """
+        entries = [x for x in os.listdir(self.journalDir) if x.endswith(".journal")]
+        entries.sort()
+        return entries
+
+    def flush(self):
+        """
+        _flush_
+
+        Flush all pending journal entries through the flush callback in
+        batches of at most maxEntries entries, after resolving the entries
+        orphaned by dead processes.  Returns the number of entries
+        that were flushed.  Nothing is flushed if another process holds the
+        journal lock.
+        """
+        self.flushLock.acquire()
+        try:
+            lockFile = open(os.path.join(self.journalDir, "journal.lock"), "a")
+            try:
+                try:
+                    fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except IOError:
+                    logging.debug("Couch journal %s locked by another process" % self.journalDir)
+                    return 0
+
+                self.resolveOrphans()
+
+                flushed = 0
+                while True:
+                    entryNames = self.pendingEntries()[:self.maxEntries]
+                    if len(entryNames) == 0:
+                        break
+
+                    entries = []
+                    for entryName in entryNames:
+                        entryFile = open(os.path.join(self.journalDir, entryName), "rb")
+                        try:
+                            entries.append(cPickle.load(entryFile))
+                        finally:
+                            entryFile.close()
+
+                    self.flushCallback(entries)
+
+                    for entryName in entryNames:
+                        os.remove(os.path.join(self.journalDir, entryName))
+                    flushed += len(entryNames)
+
+                return flushed
+            finally:
+                lockFile.close()
+        finally:
+            self.flushLock.release()
+
+    def wake(self):
+        """
+        _wake_
+
+        Flush the journal without waiting for the flush interval to pass.
+        """
+        self.wakeUp.set()
+        return
+
+    def stop(self):
+        """
+        _stop_
+
+        Stop the background thread after flushing whatever is pending.
+        """
+        self._stopFlag = True
+        self.wakeUp.set()
+        return
+
+    def run(self):
+        """
+        _run_
+
+        Replay anything left over in the journal and then flush it every
+        flushInterval seconds.
+        """
+        while True:
+            try:
+                self.flush()
+            except Exception, ex:
+                logging.error("Error flushing couch journal %s: %s" % (self.journalDir, str(ex)))
+                logging.error(traceback.format_exc())
+
+            if self._stopFlag:
+                break
+
+            self.wakeUp.wait(self.flushInterval)
+            self.wakeUp.clear()
+
+        return
@@ -3,6 +3,15 @@
 """
 _ProcessPool_
 
+Run work in a pool of slave processes connected through ZMQ sockets.
+
+The sockets are either TCP sockets on the given ports (or on random ports if
+no ports are given) or IPC sockets in a private temporary directory, which
+lets several components run pools on the same node without port clashes.
+
+Work is serialized either as JSON, one piece of work per message, or with
+pickle protocol 2, in which case several pieces of work are batched into each
+message and the slaves send back their results in one message per batch.
 """
 
 
@@ -15,6 +24,8 @@ import os
 import threading
 import traceback
 import cPickle
+import shutil
+import tempfile
 
 from logging.handlers import RotatingFileHandler
 
@@ -63,7 +74,8 @@ class ProcessPoolWorker:
 class ProcessPool:
     def __init__(self, slaveClassName, totalSlaves, componentDir,
                  config, namespace = 'WMComponent', inPort = '5555',
-                 outPort = '5558'):
+                 outPort = '5558', transport = 'tcp', serializer = 'json',
+                 batchSize = 1):
         """
         __init__
 
@@ -77,10 +89,21 @@ class ProcessPool:
         parameters.  It is not passed to the slave class.  The slaveInit
         parameter will be serialized and passed to the slave class's
         constructor.
+
+        The transport is either 'tcp' or 'ipc'.  With 'tcp' and no ports the
+        sockets are bound to random ports.  The serializer is either 'json'
+        or 'pickle', with 'pickle' up to batchSize pieces of work are sent in
+        each message.
         """
         self.enqueueIndex = 0
         self.dequeueIndex = 0
         self.runningWork  = 0
+        self.doneWork     = []
+
+        if not transport in ['tcp', 'ipc']:
+            raise ProcessPoolException("Unknown ProcessPool transport: %s" % transport)
+        if not serializer in ['json', 'pickle']:
+            raise ProcessPoolException("Unknown ProcessPool serializer: %s" % serializer)
 
         #Use the Services.Requests JSONizer, which handles __to_json__ calls
         self.jsonHandler = JSONRequests()
@@ -107,6 +130,10 @@ class ProcessPool:
         self.namespace = namespace
         self.inPort    = inPort
         self.outPort   = outPort
+        self.transport = transport
+        self.serializer = serializer
+        self.batchSize = max(1, batchSize)
+        self.socketDir = None
 
 
         # Pickle the config
@@ -121,11 +148,7 @@ class ProcessPool:
 
         # Set up ZMQ
         try:
-            context = zmq.Context()
-            self.sender = context.socket(zmq.PUSH)
-            self.sender.bind("tcp://*:%s" % inPort)
-            self.sink = context.socket(zmq.PULL)
-            self.sink.bind("tcp://*:%s" % outPort)
+            self.bindSockets()
         except zmq.ZMQError:
             # Try this again in a moment to see
             # if it's just being held by something pre-existing
@@ -133,13 +156,9 @@ class ProcessPool:
             time.sleep(1)
             logging.error("Blocked socket on startup: Attempting sleep to give it time to clear.")
             try:
-                context = zmq.Context()
-                self.sender = context.socket(zmq.PUSH)
-                self.sender.bind("tcp://*:%s" % inPort)
-                self.sink = context.socket(zmq.PULL)
-                self.sink.bind("tcp://*:%s" % outPort)
+                self.bindSockets()
             except Exception, ex:
-                msg =  "Error attempting to open TCP sockets\n"
+                msg =  "Error attempting to open %s sockets\n" % transport.upper()
                 msg += str(ex)
                 logging.error(msg)
                 import traceback
@@ -152,6 +171,63 @@ class ProcessPool:
 
         return
 
+    def bindSockets(self):
+        """
+        _bindSockets_
+
+        Bind the sockets used to send work to the slaves and to get their
+        results back, and record the addresses the slaves connect to.
+        """
+        context = zmq.Context()
+        self.sender = context.socket(zmq.PUSH)
+        self.sink = context.socket(zmq.PULL)
+
+        if self.transport == 'ipc':
+            if self.socketDir == None:
+                self.socketDir = tempfile.mkdtemp(prefix = "ProcessPool-")
+            self.inAddress  = "ipc://%s" % os.path.join(self.socketDir, "in")
+            self.outAddress = "ipc://%s" % os.path.join(self.socketDir, "out")
+            self.sender.bind(self.inAddress)
+            self.sink.bind(self.outAddress)
+            return
+
+        if self.inPort:
+            self.sender.bind("tcp://*:%s" % self.inPort)
+        else:
+            self.inPort = self.sender.bind_to_random_port("tcp://127.0.0.1")
+        if self.outPort:
+            self.sink.bind("tcp://*:%s" % self.outPort)
+        else:
+            self.outPort = self.sink.bind_to_random_port("tcp://127.0.0.1")
+
+        self.inAddress  = "tcp://localhost:%s" % self.inPort
+        self.outAddress = "tcp://localhost:%s" % self.outPort
+        return
+
+    def encodeWork(self, work):
+        """
+        _encodeWork_
+
+        Serialize a list of work into messages: one message per piece of work
+        for JSON, one message per batch for pickle.
+        """
+        if self.serializer == 'pickle':
+            return [cPickle.dumps(work[i:i + self.batchSize], 2)
+                    for i in range(0, len(work), self.batchSize)]
+
+        return [self.jsonHandler.encode(w) for w in work]
+
+    def decodeOutput(self, output):
+        """
+        _decodeOutput_
+
+        Deserialize a message from a slave into a list of results.
+        """
+        if self.serializer == 'pickle':
+            return cPickle.loads(output)
+
+        return [self.jsonHandler.decode(output)]
+
 
     def createSlaves(self):
         """
@@ -166,11 +242,10 @@ class ProcessPool:
         slaveClassName = self.slaveClassName
         config         = self.config
         namespace      = self.namespace
-        inPort         = self.inPort
-        outPort        = self.outPort
-        
-        slaveArgs = [self.versionString, __file__, self.slaveClassName, inPort,
-                     outPort, self.configPath, self.componentDir, self.namespace]
+
+        slaveArgs = [self.versionString, __file__, self.slaveClassName,
+                     self.inAddress, self.outAddress, self.configPath,
+                     self.componentDir, self.namespace, self.serializer]
 
         count = 0     
         while totalSlaves > 0:
@@ -214,8 +289,8 @@ class ProcessPool:
         """
         for i in range(self.nSlaves):
             try:
-                encodedWork = self.jsonHandler.encode('STOP')
-                self.sender.send(encodedWork)
+                for encodedWork in self.encodeWork(['STOP']):
+                    self.sender.send(encodedWork)
             except Exception, ex:
                 # Might be already failed.  Nothing you can
                 # really do about that.
@@ -246,6 +321,10 @@ class ProcessPool:
                     logging.error(str(ex2))
                     continue
         self.workers = []
+
+        if self.socketDir != None:
+            shutil.rmtree(self.socketDir, ignore_errors = True)
+            self.socketDir = None
         return
 
     def enqueue(self, work, list = False):
@@ -253,7 +332,8 @@ class ProcessPool:
         __enqeue__
 
         Assign work to the workers processes.  The work parameters must be a
-        list where each item in the list can be serialized into JSON.
+        list where each item in the list can be serialized into JSON, or
+        pickled if the pool uses the pickle serializer.
 
         If list is True, the entire list is sent as one piece of work
         """
@@ -263,16 +343,13 @@ class ProcessPool:
             logging.error(msg)
             raise ProcessPoolException(msg)
 
-        if not list:
-            for w in work:
-                encodedWork = self.jsonHandler.encode(w)
-                self.sender.send(encodedWork)
-                self.runningWork += 1
-        else:
-            encodedWork = self.jsonHandler.encode(work)
+        if list:
+            work = [work]
+
+        for encodedWork in self.encodeWork(work):
             self.sender.send(encodedWork)
-            self.runningWork += 1
-            
+        self.runningWork += len(work)
+
         return
 
 
@@ -294,8 +371,13 @@ class ProcessPool:
 
         while totalItems > 0:
             try:
-                output = self.sink.recv()
-                decode = self.jsonHandler.decode(output)
+                if len(self.doneWork) == 0:
+                    # Results for a whole batch arrive in one message, keep
+                    # the ones we weren't asked for until the next dequeue
+                    output = self.sink.recv()
+                    self.doneWork.extend(self.decodeOutput(output))
+                    continue
+                decode = self.doneWork.pop(0)
                 if type(decode) == type({}) and decode.get('type', None) == 'ERROR':
                     # Then we had some kind of error
                     msg = decode.get('msg', 'Unknown Error in ProcessPool')
@@ -375,16 +457,18 @@ if __name__ == "__main__":
     in through stdin as a JSON object.
 
     Input variables:
-    className, input port, output port, path to pickled config, component dir, namespace
+    className, input address, output address, path to pickled config,
+    component dir, namespace, serializer
     """
     
     # Get variables passed in
     slaveClassName = sys.argv[1]
-    inPort         = sys.argv[2]
-    outPort        = sys.argv[3]
+    inAddress      = sys.argv[2]
+    outAddress     = sys.argv[3]
     configPath     = sys.argv[4]
     componentDir   = sys.argv[5]
     namespace      = sys.argv[6]
+    serializer     = sys.argv[7]
     
     # Set up logging
     setupLogging(componentDir)
@@ -392,10 +476,10 @@ if __name__ == "__main__":
     # Build ZMQ link
     context = zmq.Context()
     receiver = context.socket(zmq.PULL)
-    receiver.connect("tcp://localhost:%s" % inPort)
+    receiver.connect(inAddress)
 
     sender = context.socket(zmq.PUSH)
-    sender.connect("tcp://localhost:%s" % outPort)
+    sender.connect(outAddress)
 
     # Build config
     if not os.path.exists(configPath):
@@ -420,50 +504,70 @@ if __name__ == "__main__":
 
     logging.info("Have slave class")
 
-    while(True):
+    def sendOutput(outputs):
+        """
+        _sendOutput_
+
+        Send results back to the pool: one message per result for JSON, one
+        message for the whole batch for pickle.
+        """
+        if serializer == 'pickle':
+            sender.send(cPickle.dumps(outputs, 2))
+        else:
+            for item in outputs:
+                sender.send(jsonHandler.encode(item))
+        return
+
+    stopped = False
+    while not stopped:
         encodedInput = receiver.recv()
         
         try:
-            input = jsonHandler.decode(encodedInput)
+            if serializer == 'pickle':
+                inputs = cPickle.loads(encodedInput)
+            else:
+                inputs = [jsonHandler.decode(encodedInput)]
         except Exception, ex:
             logging.error("Error decoding: %s" % str(ex))
             break
 
-        if input == "STOP":
-            break
+        outputs = []
+        for input in inputs:
+            if input == "STOP":
+                stopped = True
+                break
 
-        try:
-            logging.error(input)
-            output = slaveClass(input)
-        except Exception, ex:
-            crashMessage = "Slave process crashed with exception: " + str(ex)
-            crashMessage += "\nStacktrace:\n"
-
-            stackTrace = traceback.format_tb(sys.exc_info()[2], None)
-            for stackFrame in stackTrace:
-                crashMessage += stackFrame
-                
-            logging.error(crashMessage)
             try:
-                output        = {'type': 'ERROR', 'msg': crashMessage}
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
-                logging.error("Sent error message and now breaking")
+                logging.debug(input)
+                output = slaveClass(input)
+            except Exception, ex:
+                crashMessage = "Slave process crashed with exception: " + str(ex)
+                crashMessage += "\nStacktrace:\n"
+
+                stackTrace = traceback.format_tb(sys.exc_info()[2], None)
+                for stackFrame in stackTrace:
+                    crashMessage += stackFrame
+
+                logging.error(crashMessage)
+                outputs.append({'type': 'ERROR', 'msg': crashMessage})
+                logging.error("Sending error message and then breaking")
+                stopped = True
                 break
+
+            if output != None:
+                if type(output) == list:
+                    outputs.extend(output)
+                else:
+                    outputs.append(output)
+
+        if len(outputs) > 0:
+            try:
+                sendOutput(outputs)
             except Exception, ex:
-                logging.error("Failed to send error message")
+                logging.error("Failed to send output")
                 logging.error(str(ex))
                 del jsonHandler
                 sys.exit(1)
-            
-        if output != None:
-            if type(output) == list:
-                for item in output:
-                    encodedOutput = jsonHandler.encode(item)
-                    sender.send(encodedOutput)
-            else:
-                encodedOutput = jsonHandler.encode(output)
-                sender.send(encodedOutput)
 
 
     logging.info("Process with PID %s finished" %(os.getpid()))
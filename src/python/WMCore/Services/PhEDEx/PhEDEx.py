@@ -25,7 +25,7 @@ class PhEDEx(Service):
             dict = {}
         self.responseType = responseType.lower()
 
-        dict["timeout"] = 300
+        dict.setdefault("timeout", 300)
 
         if not dict.has_key('endpoint'):
             dict['endpoint'] = "https://cmsweb.cern.ch/phedex/datasvc/%s/prod/" % self.responseType
@@ -30,6 +30,7 @@ except:
 from WMCore.Algorithms import Permissions
 
 from WMCore.WMException import WMException
+from WMCore.WorkerThreads.CycleStats import startTimer, stopTimer
 from WMCore.Wrappers.JsonWrapper import JSONEncoder, JSONDecoder
 from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
 try:
@@ -205,12 +206,16 @@ class Requests(dict):
         """
         Wrapper around request helper functions.
         """
-        if  self.pycurl:
-            result = self.makeRequest_pycurl(uri, data, verb, incoming_headers,
-                         encoder, decoder, contentType)
-        else:
-            result = self.makeRequest_httplib(uri, data, verb, incoming_headers,
-                         encoder, decoder, contentType)
+        stats = startTimer("http")
+        try:
+            if  self.pycurl:
+                result = self.makeRequest_pycurl(uri, data, verb, incoming_headers,
+                             encoder, decoder, contentType)
+            else:
+                result = self.makeRequest_httplib(uri, data, verb, incoming_headers,
+                             encoder, decoder, contentType)
+        finally:
+            stopTimer(stats, "http")
         return result
 
     def makeRequest_pycurl(self, uri=None, params={}, verb='GET',
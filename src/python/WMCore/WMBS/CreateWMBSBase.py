@@ -59,7 +59,9 @@ class CreateWMBSBase(DBCreator):
                                "16wmbs_job_assoc",
                                "17wmbs_job_mask",
                                "18wmbs_checksum_type",
-                               "19wmbs_file_checksums"]
+                               "19wmbs_file_checksums",
+                               "20wmbs_job_submit_info",
+                               "21wmbs_job_submit_site"]
 
         self.create["01wmbs_fileset"] = \
           """CREATE TABLE wmbs_fileset (
@@ -300,6 +302,29 @@ class CreateWMBSBase(DBCreator):
               FOREIGN KEY (job)       REFERENCES wmbs_job(id)
                 ON DELETE CASCADE)"""
 
+        self.create["20wmbs_job_submit_info"] = \
+          """CREATE TABLE wmbs_job_submit_info (
+              job            INTEGER       NOT NULL,
+              sandbox        VARCHAR(700),
+              owner_dn       VARCHAR(255),
+              owner_group    VARCHAR(255),
+              owner_role     VARCHAR(255),
+              priority       INTEGER,
+              scram_arch     VARCHAR(255),
+              sw_version     VARCHAR(255),
+              PRIMARY KEY (job),
+              FOREIGN KEY (job)       REFERENCES wmbs_job(id)
+                ON DELETE CASCADE)"""
+
+        self.create["21wmbs_job_submit_site"] = \
+          """CREATE TABLE wmbs_job_submit_site (
+              job            INTEGER       NOT NULL,
+              site_list      VARCHAR(20)   NOT NULL,
+              name           VARCHAR(255)  NOT NULL,
+              PRIMARY KEY (job, site_list, name),
+              FOREIGN KEY (job)       REFERENCES wmbs_job(id)
+                ON DELETE CASCADE)"""
+
         self.create["18wmbs_checksum_type"] = \
           """CREATE TABLE wmbs_checksum_type (
               id            INTEGER      PRIMARY KEY AUTO_INCREMENT,
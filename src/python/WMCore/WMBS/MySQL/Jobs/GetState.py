@@ -15,10 +15,16 @@ class GetState(DBFormatter):
     """
     _GetState_
 
-    Given a job ID, get the state of a current job.
+    Given a job ID, get the state of a current job.  Given a list of job IDs
+    return the ID and the state of every job that exists.
     """
     sql = "SELECT name FROM wmbs_job_state WHERE id = (SELECT state FROM wmbs_job wj WHERE wj.ID = :jobid)"
 
+    bulkSQL = """SELECT wmbs_job.id AS jobid, wmbs_job_state.name AS state
+                   FROM wmbs_job
+                   INNER JOIN wmbs_job_state ON wmbs_job_state.id = wmbs_job.state
+                 WHERE wmbs_job.id = :jobid"""
+
     def format(self, results):
         """
         _formatDict_
@@ -39,6 +45,14 @@ class GetState(DBFormatter):
         Execute the SQL for the given job ID and then format and return
         the result.
         """        
+        if type(id) == list:
+            if len(id) == 0:
+                return []
+            binds = [{"jobid": x} for x in id]
+            result = self.dbi.processData(self.bulkSQL, binds, conn = conn,
+                                          transaction = transaction)
+            return self.formatDict(result)
+
         result = self.dbi.processData(self.sql, {"jobid": id}, conn = conn,
                                       transaction = transaction)
         
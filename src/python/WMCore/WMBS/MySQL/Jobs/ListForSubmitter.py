@@ -2,7 +2,10 @@
 """
 _ListForSubmitter_
 
-MySQL function to list jobs for submission
+MySQL function to list jobs for submission.  The submit information stored
+by the JobCreator is returned with each job, the columns will be NULL for jobs
+that were created without it.  The site lists are listed by
+Jobs.ListSubmitSites.
 """
 
 
@@ -13,7 +16,14 @@ from WMCore.Database.DBFormatter import DBFormatter
 class ListForSubmitter(DBFormatter):
     sql = """SELECT wmbs_job.id AS id, wmbs_job.cache_dir AS cache_dir,
                     wmbs_sub_types.name AS type, wmbs_job.retry_count AS retry_count,
-                    wmbs_subscription.workflow as workflow
+                    wmbs_subscription.workflow as workflow,
+                    wmbs_job_submit_info.sandbox AS sandbox,
+                    wmbs_job_submit_info.owner_dn AS owner_dn,
+                    wmbs_job_submit_info.owner_group AS owner_group,
+                    wmbs_job_submit_info.owner_role AS owner_role,
+                    wmbs_job_submit_info.priority AS priority,
+                    wmbs_job_submit_info.scram_arch AS scram_arch,
+                    wmbs_job_submit_info.sw_version AS sw_version
                     FROM wmbs_job
                INNER JOIN wmbs_jobgroup ON
                  wmbs_job.jobgroup = wmbs_jobgroup.id
@@ -23,9 +33,41 @@ class ListForSubmitter(DBFormatter):
                  wmbs_subscription.subtype = wmbs_sub_types.id
                INNER JOIN wmbs_job_state ON
                  wmbs_job.state = wmbs_job_state.id
+               LEFT OUTER JOIN wmbs_job_submit_info ON
+                 wmbs_job.id = wmbs_job_submit_info.job
              WHERE wmbs_job_state.name = 'created'"""
 
-    def execute(self, conn = None, transaction = False):
-        result = self.dbi.processData(self.sql, conn = conn,
+    noInfoSQL = """SELECT wmbs_job.id AS id, wmbs_job.cache_dir AS cache_dir,
+                          wmbs_sub_types.name AS type, wmbs_job.retry_count AS retry_count,
+                          wmbs_subscription.workflow as workflow
+                          FROM wmbs_job
+                     INNER JOIN wmbs_jobgroup ON
+                       wmbs_job.jobgroup = wmbs_jobgroup.id
+                     INNER JOIN wmbs_subscription ON
+                       wmbs_jobgroup.subscription = wmbs_subscription.id
+                     INNER JOIN wmbs_sub_types ON
+                       wmbs_subscription.subtype = wmbs_sub_types.id
+                     INNER JOIN wmbs_job_state ON
+                       wmbs_job.state = wmbs_job_state.id
+                   WHERE wmbs_job_state.name = 'created'"""
+
+    def execute(self, conn = None, transaction = False, stream = False,
+                submitInfo = True):
+        """
+        _execute_
+
+        If stream is True a generator that yields the jobs as they are read
+        from the database is returned instead of a list.  Set submitInfo to
+        False for databases that don't have the submit info tables yet.
+        """
+        sql = self.sql
+        if not submitInfo:
+            sql = self.noInfoSQL
+
+        if stream:
+            return self.formatDictStream(self.dbi.processDataStream(sql,
+                                                                    conn = conn))
+
+        result = self.dbi.processData(sql, conn = conn,
                                       transaction = transaction)
         return self.formatDict(result)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+_ListSubmitSites_
+
+MySQL implementation of Jobs.ListSubmitSites
+"""
+
+__all__ = []
+
+
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class ListSubmitSites(DBFormatter):
+    """
+    _ListSubmitSites_
+
+    Retrieve the site white and black lists and the input locations stored by
+    Jobs.SetSubmitInfo for a list of jobs.
+    """
+    sql = """SELECT job AS id, site_list, name FROM wmbs_job_submit_site
+               WHERE job = :jobid"""
+
+    def execute(self, jobs, conn = None, transaction = False):
+        """
+        _execute_
+
+        Return a dictionary keyed by job ID that holds the siteWhitelist,
+        siteBlacklist and locations lists of every job.  Jobs without any
+        stored sites map to empty lists.
+        """
+        result = {}
+        for jobID in jobs:
+            result[jobID] = {"siteWhitelist": [], "siteBlacklist": [],
+                             "locations": []}
+
+        if len(jobs) == 0:
+            return result
+
+        binds = []
+        for jobID in jobs:
+            binds.append({"jobid": jobID})
+
+        siteLists = {"whitelist": "siteWhitelist",
+                     "blacklist": "siteBlacklist",
+                     "location": "locations"}
+
+        results = self.dbi.processData(self.sql, binds, conn = conn,
+                                       transaction = transaction)
+        for row in self.formatDict(results):
+            result[row["id"]][siteLists[row["site_list"]]].append(row["name"])
+
+        return result
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+_SetSubmitInfo_
+
+MySQL implementation of Jobs.SetSubmitInfo
+"""
+
+__all__ = []
+
+
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+class SetSubmitInfo(DBFormatter):
+    """
+    _SetSubmitInfo_
+
+    Store the information the JobSubmitter needs to schedule a job so that it
+    doesn't have to unpickle the job to get it.  The site white and black
+    lists and the input locations are stored one site per row.
+    """
+    sql = """INSERT INTO wmbs_job_submit_info (job, sandbox, owner_dn, owner_group,
+                                               owner_role, priority, scram_arch,
+                                               sw_version)
+               VALUES (:jobid, :sandbox, :owner_dn, :owner_group, :owner_role,
+                       :priority, :scram_arch, :sw_version)"""
+
+    siteSQL = """INSERT INTO wmbs_job_submit_site (job, site_list, name)
+                   VALUES (:jobid, :site_list, :name)"""
+
+    def execute(self, jobs, conn = None, transaction = False):
+        """
+        _execute_
+
+        Store the submit information for a list of jobs.  Each job must have
+        been run through the JobCreator so that its sandbox, owner and
+        software information is filled in.
+        """
+        binds = []
+        siteBinds = []
+        for job in jobs:
+            locations = set()
+            if len(job["input_files"]) > 0:
+                locations = job["input_files"][0]["locations"]
+
+            binds.append({"jobid": job["id"], "sandbox": job["sandbox"],
+                          "owner_dn": job.get("ownerDN", None),
+                          "owner_group": job.get("ownerGroup", ''),
+                          "owner_role": job.get("ownerRole", ''),
+                          "priority": job.get("priority", None),
+                          "scram_arch": job.get("scramArch", None),
+                          "sw_version": job.get("swVersion", None)})
+
+            for (siteList, names) in [("whitelist", job["siteWhitelist"]),
+                                      ("blacklist", job["siteBlacklist"]),
+                                      ("location", locations)]:
+                for name in set(names):
+                    siteBinds.append({"jobid": job["id"], "site_list": siteList,
+                                      "name": name})
+
+        if len(binds) == 0:
+            return
+
+        self.dbi.processData(self.sql, binds, conn = conn,
+                             transaction = transaction)
+        if len(siteBinds) > 0:
+            self.dbi.processData(self.siteSQL, siteBinds, conn = conn,
+                                 transaction = transaction)
+        return
@@ -9,9 +9,9 @@ from WMCore.WMBS.MySQL.Subscriptions.GetAvailableFiles import GetAvailableFiles
 
 class GetAvailableFilesByLimit(GetAvailableFilesMySQL):
     def execute(self, subscription, limit, conn = None, transaction = False):
-        self.sql += " LIMIT :maxLimit"
+        sql = self.sql + " LIMIT :maxLimit"
         
-        results = self.dbi.processData(self.sql, {"subscription": subscription,
+        results = self.dbi.processData(sql, {"subscription": subscription,
                                                   "maxLimit": limit},
                                        conn = conn, transaction = transaction)
         return self.formatDict(results)
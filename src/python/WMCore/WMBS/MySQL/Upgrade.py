@@ -0,0 +1,30 @@
+"""
+_Upgrade_
+
+Implementation of Upgrade for MySQL.
+
+Bring the WMBS schema of an existing database up to date, the tables are
+created from the same definitions as in Create.
+"""
+
+from WMCore.Database.DBUpgrade import DBUpgrade
+from WMCore.WMBS.MySQL.Create import Create
+
+submitInfoProbe = "SELECT job, site_list, name FROM wmbs_job_submit_site WHERE 1 = 0"
+
+class Upgrade(DBUpgrade):
+    """
+    Class to upgrade the WMBS schema in a MySQL database
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the base class's constructor and add all upgrades.
+        """
+        DBUpgrade.__init__(self, logger, dbi, params)
+
+        self.addTables("wmbs_job_submit_info", submitInfoProbe,
+                       Create(self.logger, self.dbi, params),
+                       ["20wmbs_job_submit_info", "21wmbs_job_submit_site"])
+        return
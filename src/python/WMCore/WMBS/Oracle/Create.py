@@ -582,6 +582,43 @@ class Create(CreateWMBSBase):
         self.constraints["01_idx_wmbs_job_mask"] = \
           """CREATE INDEX idx_wmbs_job_mask_job ON wmbs_job_mask(job) %s""" % tablespaceIndex
 
+        self.create["20wmbs_job_submit_info"] = \
+          """CREATE TABLE wmbs_job_submit_info (
+               job            INTEGER        NOT NULL,
+               sandbox        VARCHAR(700),
+               owner_dn       VARCHAR(255),
+               owner_group    VARCHAR(255),
+               owner_role     VARCHAR(255),
+               priority       INTEGER,
+               scram_arch     VARCHAR(255),
+               sw_version     VARCHAR(255)
+               ) %s""" % tablespaceTable
+
+        self.indexes["01_pk_wmbs_job_submit_info"] = \
+          """ALTER TABLE wmbs_job_submit_info ADD
+               (CONSTRAINT wmbs_job_submit_info_pk PRIMARY KEY (job) %s)""" % tablespaceIndex
+
+        self.constraints["01_fk_wmbs_job_submit_info"] = \
+          """ALTER TABLE wmbs_job_submit_info ADD
+               (CONSTRAINT fk_submit_info_job FOREIGN KEY (job)
+                  REFERENCES wmbs_job(id) ON DELETE CASCADE)"""
+
+        self.create["21wmbs_job_submit_site"] = \
+          """CREATE TABLE wmbs_job_submit_site (
+               job            INTEGER        NOT NULL,
+               site_list      VARCHAR(20)    NOT NULL,
+               name           VARCHAR(255)   NOT NULL
+               ) %s""" % tablespaceTable
+
+        self.indexes["01_pk_wmbs_job_submit_site"] = \
+          """ALTER TABLE wmbs_job_submit_site ADD
+               (CONSTRAINT wmbs_job_submit_site_pk PRIMARY KEY (job, site_list, name) %s)""" % tablespaceIndex
+
+        self.constraints["01_fk_wmbs_job_submit_site"] = \
+          """ALTER TABLE wmbs_job_submit_site ADD
+               (CONSTRAINT fk_submit_site_job FOREIGN KEY (job)
+                  REFERENCES wmbs_job(id) ON DELETE CASCADE)"""
+
         self.create["18wmbs_checksum_type"] = \
           """CREATE TABLE wmbs_checksum_type (
               id            INTEGER,
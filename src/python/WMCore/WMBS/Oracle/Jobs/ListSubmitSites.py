@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+"""
+_ListSubmitSites_
+
+Oracle implementation of Jobs.ListSubmitSites
+"""
+
+__all__ = []
+
+
+
+from WMCore.WMBS.MySQL.Jobs.ListSubmitSites import ListSubmitSites as MySQLListSubmitSites
+
+class ListSubmitSites(MySQLListSubmitSites):
+    """
+    Identical to MySQL version for now
+
+    """
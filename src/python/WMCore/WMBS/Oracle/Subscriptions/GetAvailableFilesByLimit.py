@@ -9,8 +9,8 @@ from WMCore.WMBS.Oracle.Subscriptions.GetAvailableFiles import GetAvailableFiles
 
 class GetAvailableFilesByLimit(GetAvailableFilesOracle):
     def execute(self, subscription, limit, conn = None, transaction = False):
-        self.sql = "SELECT * FROM (" + self.sql + ") WHERE rownum <= :maxLimit"        
-        results = self.dbi.processData(self.sql, {"subscription": subscription,
+        sql = "SELECT * FROM (" + self.sql + ") WHERE rownum <= :maxLimit"
+        results = self.dbi.processData(sql, {"subscription": subscription,
                                                   "maxLimit": limit},
                                        conn = conn, transaction = transaction)
         return self.formatDict(results)
@@ -0,0 +1,30 @@
+"""
+_Upgrade_
+
+Implementation of Upgrade for Oracle.
+"""
+
+from WMCore.Database.DBUpgrade import DBUpgrade
+from WMCore.WMBS.Oracle.Create import Create
+from WMCore.WMBS.MySQL.Upgrade import submitInfoProbe
+
+class Upgrade(DBUpgrade):
+    """
+    Class to upgrade the WMBS schema in an Oracle database
+    """
+    def __init__(self, logger = None, dbi = None, params = None):
+        """
+        _init_
+
+        Call the base class's constructor and add all upgrades.
+        """
+        DBUpgrade.__init__(self, logger, dbi, params)
+
+        self.addTables("wmbs_job_submit_info", submitInfoProbe,
+                       Create(self.logger, self.dbi, params),
+                       ["20wmbs_job_submit_info", "21wmbs_job_submit_site"],
+                       indexes = ["01_pk_wmbs_job_submit_info",
+                                  "01_pk_wmbs_job_submit_site"],
+                       constraints = ["01_fk_wmbs_job_submit_info",
+                                      "01_fk_wmbs_job_submit_site"])
+        return
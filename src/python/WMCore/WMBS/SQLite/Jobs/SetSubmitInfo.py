@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+"""
+_SetSubmitInfo_
+
+SQLite implementation of Jobs.SetSubmitInfo
+"""
+
+__all__ = []
+
+
+
+from WMCore.WMBS.MySQL.Jobs.SetSubmitInfo import SetSubmitInfo as MySQLSetSubmitInfo
+
+class SetSubmitInfo(MySQLSetSubmitInfo):
+    """
+    Identical to MySQL version for now
+
+    """
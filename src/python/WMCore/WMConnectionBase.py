@@ -44,7 +44,8 @@ class WMConnectionBase:
 
         self.daofactory = DAOFactory(package = daoPackage,
                                      logger = self.logger,
-                                     dbinterface = self.dbi)
+                                     dbinterface = self.dbi,
+                                     cacheInstances = True)
 
         if "transaction" not in dir(myThread):
             myThread.transaction = Transaction(self.dbi)
@@ -173,6 +173,32 @@ class WMInit:
                 logging.debug("Tables " + factoryName + " could not be created.")
         myThread.transaction.commit()
 
+    def upgradeSchema(self, modules = [], params = None):
+        """
+        Brings the schema of an existing database up to date for the
+        modules input.  Upgrades that were already applied are skipped.
+
+        This method needs to have been preceded by the
+        setDatabaseConnection.
+        """
+        myThread = threading.currentThread()
+
+        parameters = None
+        flag = False
+        if params != None:
+            parameters = [None, None, params]
+            flag = True
+
+        for factoryName in modules:
+            # notice the default structure: <dialect>/Upgrade
+            factory = WMFactory(factoryName, factoryName + "." + myThread.dialect)
+
+            upgrade = factory.loadObject("Upgrade", args = parameters, listFlag = flag)
+            applied = upgrade.execute()
+            logging.debug("Upgrades applied for %s: %s" % (factoryName, applied))
+
+        return
+
     def clearDatabase(self, modules = []):
         """
         Database deletion. Global, ignore modules.
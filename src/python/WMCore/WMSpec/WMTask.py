@@ -806,7 +806,7 @@ class WMTaskHelper(TreeHelper):
                                      errorDetails = "Could not find report file for step %s!" % taskStep)
 
         finalReport.data.completed = True
-        finalReport.persist(logLocation)
+        finalReport.persist(logLocation, summary = True)
 
 
         return
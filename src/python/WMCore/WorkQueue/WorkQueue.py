@@ -12,8 +12,10 @@ https://twiki.cern.ch/twiki/bin/view/CMS/WMCoreJobPool
 import types
 from collections import defaultdict
 import os
+import sys
 import threading
 import time
+import Queue
 
 from WMCore.Alerts import API as alertAPI
 
@@ -28,8 +30,9 @@ from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueWMSpecError
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements
 from WMCore.WorkQueue.WorkQueueExceptions import TERMINAL_EXCEPTIONS
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueError
-from WMCore.WorkQueue.WorkQueueUtils import get_dbs
+from WMCore.WorkQueue.WorkQueueUtils import get_dbs, release_dbs
 from WMCore.WorkQueue.WorkQueueUtils import cmsSiteNames
+from WMCore.WorkerThreads.CycleStats import currentStats, runWithStats
 
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper, getWorkloadFromTask
 from WMCore.ACDC.DataCollectionService import DataCollectionService
@@ -122,6 +125,7 @@ class WorkQueue(WorkQueueBase):
 
         self.params.setdefault('JobDumpConfig', None)
         self.params.setdefault('BossAirConfig', None)
+        self.params.setdefault('BlockFetchThreads', 5) # concurrent DBS/ACDC fetches in getWork
 
         self.params['QueueURL'] = self.backend.queueUrl # url this queue is visible on
                                     # backend took previous QueueURL and sanitized it
@@ -305,30 +309,107 @@ class WorkQueue(WorkQueueBase):
         # cache wmspecs for lifetime of function call, likely we will have multiple elements for same spec.
         #TODO: Check to see if we can skip spec loading - need to persist some more details to element
         wmspecCache = {}
+        work = []
         for match in matches:
-            blockName, dbsBlock = None, None
             if self.params['PopulateFilesets']:
                 if not wmspecCache.has_key(match['RequestName']):
                     wmspec = self.backend.getWMSpec(match['RequestName'])
                     wmspecCache[match['RequestName']] = wmspec
                 else:
                     wmspec = wmspecCache[match['RequestName']]
+                work.append((match, wmspec))
 
-                if match['Inputs']:
-                    blockName, dbsBlock = self._getDBSBlock(match, wmspec)
+        # The blocks are fetched concurrently, each element is injected
+        # into WMBS in this thread as soon as its block is in
+        for (match, wmspec, blockName, dbsBlock) in self._getDBSBlocks(work):
+            match['Subscription'] = self._wmbsPreparation(match,
+                                                          wmspec,
+                                                          blockName,
+                                                          dbsBlock)
 
-                match['Subscription'] = self._wmbsPreparation(match,
-                                                              wmspec,
-                                                              blockName,
-                                                              dbsBlock)
-
-            results.append(match)
+        results.extend(matches)
 
         del wmspecCache # remove cache explicitly
         self.logger.info('Injected %s units into WMBS' % len(results))
         return results
 
-    def _getDBSBlock(self, match, wmspec):
+    def _getDBSBlocks(self, work):
+        """
+        Get the DBS info for a list of (element, wmspec) pairs, fetching up
+        to BlockFetchThreads blocks concurrently.  Yields
+        (element, wmspec, blockName, block) in the order of the list as soon
+        as the block is in, elements without inputs come first with no block.
+        """
+        toFetch = []
+        for (match, wmspec) in work:
+            if match['Inputs']:
+                toFetch.append((match, wmspec))
+            else:
+                yield match, wmspec, None, None
+
+        nThreads = min(self.params['BlockFetchThreads'], len(toFetch))
+        if nThreads <= 1:
+            for (match, wmspec) in toFetch:
+                blockName, dbsBlock = self._getDBSBlock(match, wmspec)
+                yield match, wmspec, blockName, dbsBlock
+            return
+
+        pending = Queue.Queue()
+        for index, (match, wmspec) in enumerate(toFetch):
+            pending.put((index, match, wmspec))
+        done = Queue.Queue()
+
+        for i in range(nThreads):
+            fetcher = threading.Thread(target = runWithStats,
+                                       args = (currentStats(), self._blockFetcher,
+                                               pending, done))
+            fetcher.setDaemon(True)
+            fetcher.start()
+
+        # Blocks that came in ahead of their turn
+        results = {}
+        try:
+            for (index, (match, wmspec)) in enumerate(toFetch):
+                while not results.has_key(index):
+                    doneIndex, result, excInfo = done.get()
+                    if excInfo:
+                        raise excInfo[0], excInfo[1], excInfo[2]
+                    results[doneIndex] = result
+                blockName, dbsBlock = results.pop(index)
+                yield match, wmspec, blockName, dbsBlock
+        finally:
+            # On error don't start any more fetches
+            try:
+                while True:
+                    pending.get_nowait()
+            except Queue.Empty:
+                pass
+
+    def _blockFetcher(self, pending, done):
+        """
+        Fetch blocks for the elements in the pending queue until it is
+        empty, putting the results or the exception in the done queue.
+        """
+        while True:
+            try:
+                index, match, wmspec = pending.get_nowait()
+            except Queue.Empty:
+                return
+
+            dbs = None
+            if not match['ACDC']:
+                dbs = get_dbs(match['Dbs'], exclusive = True)
+            try:
+                try:
+                    result = self._getDBSBlock(match, wmspec, dbs)
+                    done.put((index, result, None))
+                except Exception:
+                    done.put((index, None, sys.exc_info()))
+            finally:
+                if dbs:
+                    release_dbs(match['Dbs'], dbs)
+
+    def _getDBSBlock(self, match, wmspec, dbs = None):
         """Get DBS info for this block"""
         blockName = match['Inputs'].keys()[0] #TODO: Allow more than one
 
@@ -347,7 +428,8 @@ class WorkQueue(WorkQueueBase):
             block["Files"] = fileLists
             return blockName, block
         else:
-            dbs = get_dbs(match['Dbs'])
+            if dbs == None:
+                dbs = get_dbs(match['Dbs'])
             if wmspec.getTask(match['TaskName']).parentProcessingFlag():
                 dbsBlockDict = dbs.getFileBlockWithParents(blockName)
             else:
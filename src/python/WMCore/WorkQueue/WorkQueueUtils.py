@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 """Various helper functions for workqueue"""
 
-__all__ = ['get_remote_queue', 'get_dbs', 'sitesFromStorageEelements',
+__all__ = ['get_remote_queue', 'get_dbs', 'release_dbs', 'sitesFromStorageEelements',
            'queueConfigFromConfigObject', 'queueFromConfig']
 
 import os
 import logging
+import threading
 
 # Should probably import this but don't want to create the dependency
 WMBS_REST_NAMESPACE = 'WMCore.HTTPFrontEnd.WMBS.WMBSRESTModel'
@@ -28,14 +29,40 @@ def get_remote_queue(queue, logger):
         return __queues[queue]
 
 __dbses = {}
-def get_dbs(url):
-    """Return DBS object for url"""
+__dbsPool = {}
+__dbsLock = threading.Lock()
+def get_dbs(url, exclusive = False):
+    """Return DBS object for url
+
+    DBS objects aren't thread safe, with exclusive the object returned isn't
+    used by any other thread until it is given back with release_dbs()
+    """
+    __dbsLock.acquire()
     try:
-        return __dbses[url]
-    except KeyError:
-        from WMCore.Services.DBS.DBSReader import DBSReader
-        __dbses[url] = DBSReader(url)
-        return __dbses[url]
+        if exclusive and __dbsPool.get(url):
+            return __dbsPool[url].pop()
+        if not exclusive and __dbses.has_key(url):
+            return __dbses[url]
+    finally:
+        __dbsLock.release()
+
+    from WMCore.Services.DBS.DBSReader import DBSReader
+    dbs = DBSReader(url)
+    if not exclusive:
+        __dbsLock.acquire()
+        try:
+            dbs = __dbses.setdefault(url, dbs)
+        finally:
+            __dbsLock.release()
+    return dbs
+
+def release_dbs(url, dbs):
+    """Give back a DBS object taken with get_dbs(url, exclusive = True)"""
+    __dbsLock.acquire()
+    try:
+        __dbsPool.setdefault(url, []).append(dbs)
+    finally:
+        __dbsLock.release()
 
 __sitedb = None
 def sitesFromStorageEelements(ses):
@@ -6,6 +6,23 @@ _BaseWorkerThread_
 Base class for all regular worker threads managed by WorkerThreadManager.
 Deriving classes should override algorithm, and optionally setup and terminate
 to perform thread-specific setup and clean-up operations
+
+In adaptive mode (adaptivePolling in the component config section) the time
+between cycles depends on what the last cycle found, as reported by the
+algorithm through reportWork: empty cycles double the sleep up to
+maxPollInterval, cycles that stopped at their batch limit are followed by the
+next cycle right away.  Adaptive workers can be woken up early by other
+components through the WakeupChannel, and write their heartbeat at most every
+heartbeatInterval seconds.
+
+Every cycle is instrumented through CycleStats: its wall time, the time spent
+in the database and in HTTP calls and the number of items reported through
+reportWork are logged and stored with the worker heartbeat.  Helper
+threads are only instrumented if they are started through
+CycleStats.runWithStats.  With
+profileCycles set to N in the component config section every cycle is run
+under cProfile and the profiles of the N slowest cycles are kept in the
+profiles directory of the componentDir.
 """
 
 
@@ -15,11 +32,17 @@ import logging
 import time
 import traceback
 import sys
+import os
+import heapq
+import socket
+import cProfile
 
 from WMCore.Database.Transaction import Transaction
 from WMCore.WMFactory import WMFactory
 
 from WMCore.Alerts import API as alertAPI
+from WMCore.WorkerThreads.WakeupChannel import WakeupChannel
+from WMCore.WorkerThreads.CycleStats import CycleStats
 
 class BaseWorkerThread:
     """
@@ -50,6 +73,22 @@ class BaseWorkerThread:
         self.sender = None
         self.sendAlert = None
 
+        # Adaptive scheduling, set up by the WorkerThreadManager
+        self.adaptive = False
+        self.maxIdleTime = None
+        self.heartbeatInterval = 0
+        self.componentDir = None
+        self.wakeupChannel = None
+        self.currentIdleTime = None
+        self.lastHeartbeat = 0
+        self.cycleWork = None
+        self.cycleFull = False
+
+        # Cycle instrumentation, set up by the WorkerThreadManager
+        self.profileCycles = 0
+        self.profiles = []
+        self.lastCycle = None
+
         # Get the current DBFactory
         myThread = threading.currentThread()
         self.dbFactory = myThread.dbFactory
@@ -86,6 +125,181 @@ class BaseWorkerThread:
         """
         logging.error("Calling algorithm on BaseWorkerThread: Override me!")
 
+    def reportWork(self, nItems, full = False):
+        """
+        _reportWork_
+
+        Tell the scheduler how many items the current cycle worked on.  Set
+        full if the cycle stopped at its batch limit and more work is
+        waiting.  The number of items is recorded in the cycle stats, full
+        is only used in adaptive mode.
+        """
+        self.cycleWork = (self.cycleWork or 0) + nItems
+        self.cycleFull = self.cycleFull or full
+        return
+
+    def nextIdleTime(self):
+        """
+        _nextIdleTime_
+
+        Work out how long to sleep after a cycle.  Cycles that didn't report
+        any work count as having found work.
+        """
+        if not self.adaptive:
+            return self.idleTime
+
+        if self.currentIdleTime == None or self.cycleWork != 0:
+            self.currentIdleTime = self.idleTime
+        full = self.cycleFull
+        empty = self.cycleWork == 0
+        self.cycleWork = None
+        self.cycleFull = False
+
+        if full:
+            return 0
+        idleTime = self.currentIdleTime
+        if empty:
+            # Back off for the next empty cycle
+            self.currentIdleTime = min(self.currentIdleTime * 2, self.maxIdleTime)
+        return idleTime
+
+    def sleep(self, idleTime):
+        """
+        _sleep_
+
+        Put the thread to sleep.  In adaptive mode wake up early when
+        notified through the wakeup channel or when the thread is told to
+        terminate.
+        """
+        if not self.adaptive:
+            time.sleep(idleTime)
+            return
+
+        endTime = time.time() + idleTime
+        while not self.notifyTerminate.isSet():
+            remaining = endTime - time.time()
+            if remaining <= 0:
+                break
+            # Don't take longer to notice termination than in regular mode
+            remaining = min(remaining, max(self.idleTime, 1))
+            if self.wakeupChannel == None:
+                time.sleep(remaining)
+            elif self.wakeupChannel.wait(remaining):
+                logging.debug("Worker thread %s woken up" % str(self))
+                self.currentIdleTime = self.idleTime
+                break
+
+        return
+
+    def cycleHeartbeat(self, workerName):
+        """
+        _cycleHeartbeat_
+
+        Record that a cycle is starting.  Adaptive workers do this at most
+        every heartbeatInterval seconds.
+        """
+        if not hasattr(self.component.config, "Agent"):
+            return
+        if not getattr(self.component.config.Agent, "useHeartbeat", True):
+            return
+        if self.adaptive and time.time() - self.lastHeartbeat < self.heartbeatInterval:
+            return
+
+        cycle = None
+        if self.lastCycle != None:
+            cycle = self.lastCycle.summary()
+        self.heartbeatAPI.updateWorkerHeartbeat(workerName, "Running",
+                                                cycle = cycle)
+        self.lastHeartbeat = time.time()
+        return
+
+    def runCycle(self, parameters):
+        """
+        _runCycle_
+
+        Run the algorithm once, recording the cycle stats and profiling the
+        cycle if requested.
+        """
+        myThread = threading.currentThread()
+        self.cycleWork = None
+        self.cycleFull = False
+
+        profiler = None
+        if self.profileCycles > 0 and self.componentDir != None:
+            profiler = cProfile.Profile()
+
+        stats = CycleStats()
+        myThread.cycleStats = stats
+        stats.start()
+        try:
+            if profiler != None:
+                profiler.runcall(self.algorithm, parameters)
+            else:
+                self.algorithm(parameters)
+        finally:
+            stats.stop()
+            myThread.cycleStats = None
+            stats.items = self.cycleWork
+            self.lastCycle = stats
+            logging.debug("Cycle of %s: %s" % (str(self), str(stats)))
+
+        if profiler != None:
+            self.saveProfile(profiler, stats.wallTime)
+        return
+
+    def saveProfile(self, profiler, wallTime):
+        """
+        _saveProfile_
+
+        Keep the profile of a cycle if it is one of the profileCycles slowest
+        cycles so far, and remove the profile it replaces.
+        """
+        if len(self.profiles) >= self.profileCycles and wallTime <= self.profiles[0][0]:
+            return
+
+        profileDir = os.path.join(self.componentDir, "profiles")
+        profilePath = os.path.join(profileDir, "%s.%i.prof" % (self.__class__.__name__,
+                                                               int(time.time() * 1000)))
+        try:
+            if not os.path.isdir(profileDir):
+                os.makedirs(profileDir)
+            profiler.dump_stats(profilePath)
+        except (IOError, OSError), ex:
+            logging.error("Could not save cycle profile %s: %s" % (profilePath, str(ex)))
+            return
+
+        heapq.heappush(self.profiles, (wallTime, profilePath))
+        if len(self.profiles) > self.profileCycles:
+            (fastest, fastestPath) = heapq.heappop(self.profiles)
+            try:
+                os.remove(fastestPath)
+            except OSError:
+                pass
+
+        logging.info("Saved profile of %.3f second cycle of %s in %s" % (wallTime, str(self),
+                                                                         profilePath))
+        return
+
+    def initWakeupChannel(self):
+        """
+        _initWakeupChannel_
+
+        Listen for wake up notifications from other components.  Adaptive
+        workers without a componentDir, or that can't bind the socket, just
+        sleep.
+        """
+        if not self.adaptive or self.componentDir == None:
+            return
+
+        try:
+            self.wakeupChannel = WakeupChannel(self.componentDir,
+                                               self.__class__.__name__)
+        except (socket.error, OSError), ex:
+            logging.error("Could not create wakeup channel for %s: %s" % (str(self), str(ex)))
+            self.wakeupChannel = None
+
+        return
+
     def initInThread(self, parameters):
         """
         Called when the thread is actually running in its own thread. Performs
@@ -129,6 +343,7 @@ class BaseWorkerThread:
 
             # Call thread startup method
             self.initInThread(parameters)
+            self.initWakeupChannel()
 
             msg = "Worker thread %s started" % str(self)
             logging.info(msg)
@@ -153,11 +368,8 @@ class BaseWorkerThread:
                         try:
                             # heartbeat needed to be called after self.initInThread 
                             # to get the right name
-                            if hasattr(self.component.config, "Agent"):                            
-                                if getattr(self.component.config.Agent, "useHeartbeat", True):
-                                    self.heartbeatAPI.updateWorkerHeartbeat(
-                                        myThread.getName(), "Running")
-                            self.algorithm(parameters)
+                            self.cycleHeartbeat(myThread.getName())
+                            self.runCycle(parameters)
 
                             # Catch if someone forgets to commit/rollback
                             if myThread.transaction.transaction is not None:
@@ -188,7 +400,7 @@ class BaseWorkerThread:
                                         myThread.getName(), msg)
                             raise ex
                         # Put the thread to sleep
-                        time.sleep(self.idleTime)
+                        self.sleep(self.nextIdleTime())
 
             # Call specific thread termination method
             self.terminate(parameters)
@@ -201,6 +413,9 @@ class BaseWorkerThread:
                 msg += stackFrame
             logging.error(msg)
 
+        if self.wakeupChannel != None:
+            self.wakeupChannel.close()
+
         # Indicate to manager that thread is done
         self.terminateCallback(threading.currentThread().name)
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+_CycleStats_
+
+Per-cycle instrumentation for worker threads.
+
+The BaseWorkerThread attaches a CycleStats instance to its thread as
+cycleStats for the duration of every cycle.  Code that talks to the database
+or to HTTP services times itself with startTimer/stopTimer, which do nothing
+in threads that aren't instrumented, e.g.:
+
+stats = startTimer("db")
+try:
+    # Talk to the database
+finally:
+    stopTimer(stats, "db")
+
+Nested timers of the same category, e.g. processData calling itself, only
+count once.
+
+Threads started during a cycle aren't instrumented unless they run their
+target through runWithStats with the stats of the cycle, e.g.:
+
+threading.Thread(target = runWithStats,
+                 args = (currentStats(), self.fetch, queue))
+
+The time spent in helper threads is added up, so with concurrent helpers
+the database and HTTP times of a cycle can exceed its wall time.  Work done
+in other processes, e.g. multiprocessing pools, isn't recorded, and cycle
+profiles only cover the worker thread itself.
+"""
+
+import time
+import threading
+
+class CycleStats(object):
+    """
+    _CycleStats_
+
+    Wall time, time spent per category with the number of calls, and the
+    number of items processed in a single cycle.
+    """
+    def __init__(self):
+        self.startTime = None
+        self.wallTime = 0.0
+        self.items = None
+        self.times = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        return
+
+    def start(self):
+        """
+        _start_
+
+        Start the cycle.
+        """
+        self.startTime = time.time()
+        return
+
+    def stop(self):
+        """
+        _stop_
+
+        Stop the cycle and return its wall time.
+        """
+        self.wallTime = time.time() - self.startTime
+        return self.wallTime
+
+    def getTimers(self):
+        """
+        _getTimers_
+
+        Return the running timers of the current thread, a dictionary of
+        category to nesting depth and start time.
+        """
+        timers = getattr(self.local, "timers", None)
+        if timers == None:
+            timers = self.local.timers = {}
+        return timers
+
+    def startTimer(self, category):
+        """
+        _startTimer_
+
+        Start timing a call.
+        """
+        timers = self.getTimers()
+        (depth, startTime) = timers.get(category, (0, None))
+        if depth == 0:
+            startTime = time.time()
+        timers[category] = (depth + 1, startTime)
+        return
+
+    def stopTimer(self, category):
+        """
+        _stopTimer_
+
+        Stop timing a call, the time is accounted for once the outermost call
+        of the category in the thread returns.
+        """
+        timers = self.getTimers()
+        (depth, startTime) = timers.get(category, (0, None))
+        if depth == 0:
+            return
+        if depth > 1:
+            timers[category] = (depth - 1, startTime)
+            return
+
+        del timers[category]
+        elapsed = time.time() - startTime
+        self.lock.acquire()
+        try:
+            self.times[category] = self.times.get(category, 0.0) + elapsed
+            self.calls[category] = self.calls.get(category, 0) + 1
+        finally:
+            self.lock.release()
+        return
+
+    def getTime(self, category):
+        """
+        _getTime_
+
+        Return the time spent in a category.
+        """
+        return self.times.get(category, 0.0)
+
+    def getCalls(self, category):
+        """
+        _getCalls_
+
+        Return the number of calls made in a category.
+        """
+        return self.calls.get(category, 0)
+
+    def summary(self):
+        """
+        _summary_
+
+        Return a dictionary with the cycle stats as stored in the heartbeat
+        tables.
+        """
+        return {"cycle_time": self.wallTime,
+                "db_time": self.getTime("db"),
+                "http_time": self.getTime("http"),
+                "cycle_items": self.items}
+
+    def __str__(self):
+        result = "%.3f seconds" % self.wallTime
+        for category in sorted(self.times.keys()):
+            result += ", %s %.3f seconds in %i calls" % (category, self.times[category],
+                                                        self.calls[category])
+        if self.items != None:
+            result += ", %i items" % self.items
+        return result
+
+def currentStats():
+    """
+    _currentStats_
+
+    Return the stats of the current thread, None if it isn't instrumented.
+    """
+    return getattr(threading.currentThread(), "cycleStats", None)
+
+def runWithStats(stats, target, *args):
+    """
+    _runWithStats_
+
+    Run target in the current thread with stats attached, so that the calls
+    it times are added to the stats of the cycle that started the thread.
+    """
+    myThread = threading.currentThread()
+    myThread.cycleStats = stats
+    try:
+        return target(*args)
+    finally:
+        myThread.cycleStats = None
+
+def startTimer(category):
+    """
+    _startTimer_
+
+    Start timing a call if the current thread is instrumented.  Return the
+    stats to pass to stopTimer.
+    """
+    stats = currentStats()
+    if stats != None:
+        stats.startTimer(category)
+    return stats
+
+def stopTimer(stats, category):
+    """
+    _stopTimer_
+
+    Stop timing a call started with startTimer.
+    """
+    if stats != None:
+        stats.stopTimer(category)
+    return
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+_WakeupChannel_
+
+Lightweight local notification channel that lets one component wake up the
+worker threads of another component, e.g. the JobCreator waking up the
+JobSubmitter once it created jobs.
+
+Every listening worker binds a unix datagram socket called
+wakeup.<WorkerName>.sock in the componentDir of its component.  Waking up a
+component sends a datagram to every such socket; nothing is sent if the
+component isn't running and a worker that is busy picks up the notification
+the next time it goes to sleep.
+"""
+
+import os
+import glob
+import select
+import socket
+import logging
+
+def channelPath(componentDir, workerName):
+    """
+    _channelPath_
+
+    Return the path of the socket a worker listens on.
+    """
+    return os.path.join(componentDir, "wakeup.%s.sock" % workerName)
+
+def wakeComponent(config, componentName):
+    """
+    _wakeComponent_
+
+    Wake up all the listening workers of a component.  Return the number of
+    workers that were notified.
+    """
+    compSect = getattr(config, componentName, None)
+    componentDir = getattr(compSect, "componentDir", None)
+    if componentDir == None:
+        return 0
+
+    notified = 0
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sender.setblocking(0)
+    try:
+        for path in glob.glob(channelPath(componentDir, "*")):
+            try:
+                sender.sendto("wakeup", path)
+                notified += 1
+            except socket.error, ex:
+                # Nobody listening or the socket buffer is full, either way
+                # the worker doesn't need another notification.
+                logging.debug("Could not wake up %s: %s" % (path, str(ex)))
+    finally:
+        sender.close()
+
+    return notified
+
+class WakeupChannel(object):
+    """
+    _WakeupChannel_
+
+    The receiving end of the channel for a single worker.
+    """
+    def __init__(self, componentDir, workerName):
+        self.path = channelPath(componentDir, workerName)
+
+        if os.path.exists(self.path):
+            # Left behind by a previous instance
+            os.unlink(self.path)
+
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(self.path)
+        self.socket.setblocking(0)
+        return
+
+    def wait(self, timeout):
+        """
+        _wait_
+
+        Wait up to timeout seconds for a notification.  Return True if the
+        worker was woken up.  All pending notifications are consumed.
+        """
+        (readable, writable, errors) = select.select([self.socket], [], [], timeout)
+        if not readable:
+            return False
+
+        try:
+            while True:
+                self.socket.recv(64)
+        except socket.error:
+            pass
+
+        return True
+
+    def close(self):
+        """
+        _close_
+
+        Stop listening and remove the socket.
+        """
+        self.socket.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        return
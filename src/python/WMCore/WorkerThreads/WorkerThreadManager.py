@@ -70,6 +70,18 @@ class WorkerThreadManager:
         worker.terminateCallback = self.slaveTerminateCallback
         worker.notifyPause = self.pauseSlaves
         worker.notifyResume = self.resumeSlaves
+
+        # Adaptive scheduling is configured in the component section
+        compSect = None
+        compName = getattr(getattr(self.component.config, "Agent", None),
+                           "componentName", None)
+        if compName != None:
+            compSect = getattr(self.component.config, compName, None)
+        worker.adaptive = getattr(compSect, "adaptivePolling", False)
+        worker.maxIdleTime = getattr(compSect, "maxPollInterval", idleTime * 8)
+        worker.heartbeatInterval = getattr(compSect, "heartbeatInterval", idleTime)
+        worker.componentDir = getattr(compSect, "componentDir", None)
+        worker.profileCycles = getattr(compSect, "profileCycles", 0)
         if hasattr(self.component.config, "Agent"):
             if getattr(self.component.config.Agent, "useHeartbeat", True):
                 worker.heartbeatAPI = HeartbeatAPI(self.component.config.Agent.componentName)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+_DBSUploadPoller_t_
+
+Unit tests for the upload pipeline of the DBS3 DBSUploadPoller, the upload
+processes and DBSBuffer are replaced by fakes.
+"""
+
+import Queue
+import logging
+import threading
+import unittest
+
+from WMCore.Agent.Configuration import Configuration
+
+from WMComponent.DBS3Buffer.DBSUploadPoller import DBSUploadPoller
+from WMComponent.DBS3Buffer.DBSBufferBlock  import DBSBlock
+
+class FakeTransaction(object):
+    """
+    _FakeTransaction_
+
+    Transaction that does nothing.
+    """
+    def begin(self):
+        return
+
+    def commit(self):
+        return
+
+    def rollback(self):
+        return
+
+class FakeDBSUtil(object):
+    """
+    _FakeDBSUtil_
+
+    Record the blocks written to DBSBuffer.
+    """
+    def __init__(self):
+        self.updates = []
+        return
+
+    def createBlocks(self, blocks):
+        return
+
+    def updateBlocks(self, blocks):
+        self.updates.append([x.getName() for x in blocks])
+        return
+
+    def setBlockFiles(self, binds):
+        return
+
+class FakeUploader(object):
+    """
+    _FakeUploader_
+
+    Stand in for both queues to the upload processes.  Blocks put into the
+    input queue are uploaded in order when a result is requested.  Blocks in
+    failures fail that many times, lost blocks never return a result.
+    """
+    def __init__(self, failures = {}, lost = []):
+        self.failures = dict(failures)
+        self.lost     = lost
+        self.pending  = []
+        self.uploads  = []
+        self.timeouts = []
+        self.maxInFlight = 0
+        return
+
+    def put(self, work):
+        self.pending.append(work['name'])
+        self.maxInFlight = max(self.maxInFlight, len(self.pending))
+        return
+
+    def get(self, timeout = None):
+        self.timeouts.append(timeout)
+        for name in self.pending:
+            if not name in self.lost:
+                break
+        else:
+            raise Queue.Empty
+
+        self.pending.remove(name)
+        self.uploads.append(name)
+        if self.failures.get(name, 0) > 0:
+            self.failures[name] -= 1
+            return {'name': name, 'success': False, 'error': 'DBS is down'}
+        return {'name': name, 'success': True}
+
+    def close(self):
+        return
+
+class DBSUploadPollerTest(unittest.TestCase):
+    """
+    _DBSUploadPollerTest_
+
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        """
+        myThread = threading.currentThread()
+        self.threadAttributes = {}
+        for name in ["logger", "dbi", "dbFactory", "transaction"]:
+            self.threadAttributes[name] = getattr(myThread, name, None)
+        myThread.logger      = logging.getLogger()
+        myThread.dbi         = None
+        myThread.dbFactory   = None
+        myThread.transaction = FakeTransaction()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        """
+        myThread = threading.currentThread()
+        for name, value in self.threadAttributes.items():
+            setattr(myThread, name, value)
+        return
+
+    def getConfig(self):
+        """
+        _getConfig_
+
+        Config for a poller without upload processes.
+        """
+        config = Configuration()
+        config.component_("DBSUpload")
+        config.DBSUpload.DBSBlockMaxFiles  = 10
+        config.DBSUpload.DBSBlockMaxTime   = 3600
+        config.DBSUpload.DBSBlockMaxSize   = 999999999999
+        config.DBSUpload.dbsUrl            = 'https://localhost:1443/dbs/prod/global/DBSWriter'
+        config.DBSUpload.nProcesses        = 0
+        config.DBSUpload.maxInFlightBlocks = 2
+        config.DBSUpload.uploadRetries     = 2
+        config.DBSUpload.statusBatchSize   = 2
+        config.DBSUpload.uploadTimeout     = 30
+        config.DBSUpload.dbsWaitTime       = 0.1
+        return config
+
+    def getPoller(self, uploader, nBlocks = 5):
+        """
+        _getPoller_
+
+        Create a poller talking to a fake uploader with nBlocks blocks
+        waiting to be queued.
+        """
+        poller = DBSUploadPoller(config = self.getConfig())
+        poller.input   = uploader
+        poller.result  = uploader
+        poller.dbsUtil = FakeDBSUtil()
+
+        for i in range(nBlocks):
+            block = DBSBlock(name = "/Primary/Processed/TIER#%i" % i,
+                             location = "se1.cern.ch", das = 1)
+            block.status = 'Pending'
+            block.inBuff = True
+            poller.addNewBlock(block = block)
+            poller.blocksToQueue.append(block)
+
+        return poller
+
+    def blockNames(self, nBlocks = 5):
+        """
+        _blockNames_
+
+        Names of the blocks created by getPoller().
+        """
+        return ["/Primary/Processed/TIER#%i" % i for i in range(nBlocks)]
+
+    def testA_InFlight(self):
+        """
+        _InFlight_
+
+        Verify that no more than maxInFlightBlocks blocks are with the
+        upload processes and that the uploaded blocks are marked in DBSBuffer
+        in batches.
+        """
+        uploader = FakeUploader()
+        poller   = self.getPoller(uploader)
+
+        poller.queueBlocks()
+        self.assertEqual(uploader.pending, self.blockNames()[:2])
+        self.assertEqual(len(poller.blocksToQueue), 3)
+
+        poller.retrieveBlocks(drain = True)
+        self.assertEqual(uploader.maxInFlight, 2)
+        self.assertEqual(uploader.uploads, self.blockNames())
+        self.assertEqual(poller.queuedBlocks, [])
+        self.assertEqual(poller.blocksToQueue, [])
+
+        names = self.blockNames()
+        self.assertEqual(poller.dbsUtil.updates, [names[0:2], names[2:4], names[4:5]])
+        self.assertEqual(poller.blockCache, {})
+        self.assertEqual(len(poller.assembler), 0)
+
+        # The closed blocks are reported as the work of the cycle
+        self.assertEqual(poller.cycleWork, 5)
+        return
+
+    def testB_Retries(self):
+        """
+        _Retries_
+
+        Verify that failed blocks are retried in the same cycle and that a
+        block that keeps failing stays pending once it is out of retries.
+        """
+        names    = self.blockNames()
+        uploader = FakeUploader(failures = {names[1]: 1, names[3]: 100})
+        poller   = self.getPoller(uploader)
+
+        poller.queueBlocks()
+        poller.retrieveBlocks(drain = True)
+
+        self.assertEqual(uploader.uploads.count(names[1]), 2)
+        self.assertEqual(uploader.uploads.count(names[3]), 3)
+        self.assertEqual(poller.queuedBlocks, [])
+        self.assertEqual(poller.blocksToQueue, [])
+        self.assertFalse(names[1] in poller.blockRetries)
+        self.assertEqual(poller.blockRetries[names[3]], 3)
+
+        closed = []
+        for update in poller.dbsUtil.updates:
+            closed.extend(update)
+        self.assertEqual(sorted(closed), sorted(names[:3] + names[4:]))
+        self.assertEqual(poller.blockCache.keys(), [names[3]])
+        self.assertEqual(poller.blockCache[names[3]].status, 'Pending')
+
+        # Out of retries for this cycle, the block isn't queued again
+        poller.inputBlocks()
+        self.assertEqual(poller.blocksToQueue, [])
+        self.assertEqual(uploader.pending, [])
+        return
+
+    def testC_DrainTimeout(self):
+        """
+        _DrainTimeout_
+
+        Verify that the poller only waits for the results between two loads
+        and that the final drain gives up after uploadTimeout seconds without
+        a result.
+        """
+        names    = self.blockNames()
+        uploader = FakeUploader(lost = [names[0]])
+        poller   = self.getPoller(uploader)
+
+        poller.queueBlocks()
+        poller.retrieveBlocks()
+        self.assertEqual(uploader.timeouts[-1], 0.1)
+        self.assertEqual(uploader.uploads, names[1:])
+
+        poller.retrieveBlocks(drain = True)
+        self.assertEqual(uploader.timeouts[-1], 30)
+        self.assertEqual(poller.queuedBlocks, [names[0]])
+        self.assertEqual(poller.blockCache.keys(), [names[0]])
+        return
+
+if __name__ == '__main__':
+    unittest.main()
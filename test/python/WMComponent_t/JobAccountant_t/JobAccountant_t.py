@@ -656,6 +656,92 @@ class JobAccountantTest(unittest.TestCase):
 
         return
 
+    def testSplitJobsLoaderPool(self):
+        """
+        _testSplitJobsLoaderPool_
+
+        Verify that split processing jobs are accounted correctly when the
+        job reports are loaded by a process pool, one job per slice so that
+        the reports for the second slice are loaded while the first slice is
+        being committed.
+        """
+        self.setupDBForSplitJobSuccess()
+        config = self.createConfig()
+        config.JobAccountant.workerThreads = 2
+        config.JobAccountant.accountantWorkSize = 1
+
+        self.testJobB["state"] = "complete"
+        self.testJobC["state"] = "complete"
+        self.stateChangeAction.execute(jobs = [self.testJobB, self.testJobC])
+
+        accountant = JobAccountantPoller(config)
+        accountant.setup()
+        accountant.algorithm()
+        accountant.terminate()
+
+        fwjrBasePath = os.path.join(WMCore.WMBase.getTestBase(),
+                                    "WMComponent_t/JobAccountant_t/fwjrs/")
+        for (testJob, fwjrName) in [(self.testJobA, "SplitSuccessA.pkl"),
+                                    (self.testJobB, "SplitSuccessB.pkl"),
+                                    (self.testJobC, "SplitSuccessC.pkl")]:
+            jobReport = Report()
+            jobReport.unpersist(fwjrBasePath + fwjrName)
+            self.verifyFileMetaData(testJob["id"], jobReport.getAllFilesFromStep("cmsRun1"),
+                                    site = "srm-cms.cern.ch")
+            self.verifyJobSuccess(testJob["id"])
+
+        self.recoOutputFileset.loadData()
+        self.alcaOutputFileset.loadData()
+
+        assert len(self.testSubscription.filesOfStatus("Completed")) == 1, \
+               "Error: The input file should be complete."
+        assert len(self.recoOutputFileset.getFiles(type = "list")) == 3, \
+               "Error: Wrong number of files in reco output fileset."
+        assert len(self.alcaOutputFileset.getFiles(type = "list")) == 3, \
+               "Error: Wrong number of files in alca output fileset."
+
+        return
+
+    def testCycleSize(self):
+        """
+        _testCycleSize_
+
+        Verify that no more than accountantCycleSize jobs are accounted for
+        in a cycle and that a cycle that left jobs behind is followed by the
+        next one right away in adaptive mode, while empty cycles back off.
+        """
+        self.setupDBForSplitJobSuccess()
+        config = self.createConfig()
+        config.JobAccountant.accountantWorkSize = 1
+        config.JobAccountant.accountantCycleSize = 2
+
+        self.testJobB["state"] = "complete"
+        self.testJobC["state"] = "complete"
+        self.stateChangeAction.execute(jobs = [self.testJobB, self.testJobC])
+
+        accountant = JobAccountantPoller(config)
+        accountant.setup()
+        accountant.adaptive = True
+        accountant.idleTime = 10
+        accountant.maxIdleTime = 60
+
+        idleTimes = []
+        completeJobs = []
+        for i in range(4):
+            accountant.algorithm()
+            idleTimes.append(accountant.nextIdleTime())
+            completeJobs.append(len(accountant.getJobsAction.execute(state = "complete")))
+
+        self.assertEqual(completeJobs, [1, 0, 0, 0])
+        self.assertEqual(idleTimes, [0, 10, 10, 20])
+
+        for testJob in [self.testJobA, self.testJobB, self.testJobC]:
+            self.verifyJobSuccess(testJob["id"])
+
+        assert len(self.testSubscription.filesOfStatus("Completed")) == 1, \
+               "Error: The input file should be complete."
+        return
+
     def setupDBForMergedSkimSuccess(self):
         """
         _setupDBForMergedSkimSuccess_
@@ -324,6 +324,13 @@ class JobCreatorTest(unittest.TestCase):
         self.assertTrue('job_1' in listOfDirs)
         self.assertTrue('job_2' in listOfDirs)
         self.assertTrue('job_3' in listOfDirs)
+
+        # Every job should have its pickle, no matter which process wrote it
+        for tmpDirectory in os.listdir(testDirectory):
+            for tmpJobDir in os.listdir(os.path.join(testDirectory, tmpDirectory)):
+                self.assertTrue(os.path.isfile(os.path.join(testDirectory, tmpDirectory,
+                                                            tmpJobDir, 'job.pkl')))
+
         jobDir = os.listdir(groupDirectory)[0]
         jobFile = os.path.join(groupDirectory, jobDir, 'job.pkl')
         self.assertTrue(os.path.isfile(jobFile))
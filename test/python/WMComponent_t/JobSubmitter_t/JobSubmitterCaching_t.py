@@ -8,6 +8,7 @@ Verify that the caching of jobs and white/black lists works correctly.
 import unittest
 import os
 import pickle
+import threading
 
 from WMQuality.TestInitCouchApp import TestInitCouchApp as TestInit
 
@@ -17,6 +18,7 @@ from WMCore.WMBS.Workflow     import Workflow
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.JobGroup     import JobGroup
 from WMCore.WMBS.Job          import Job
+from WMCore.DAOFactory        import DAOFactory
 
 from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
 from WMCore.JobStateMachine.ChangeState import ChangeState
@@ -88,12 +90,20 @@ class JobSubmitterCachingTest(unittest.TestCase):
         config.JobSubmitter.submitDir = self.testDir
         return config        
 
-    def injectJobs(self):
+    def injectJobs(self, storeSubmitInfo = False):
         """
         _injectJobs_
 
-        Inject two workflows into WMBS and save the job objects to disk.
+        Inject two workflows into WMBS and save the job objects to disk.  If
+        storeSubmitInfo is True the submit information is stored in WMBS the
+        same way the JobCreator does it.
         """
+        myThread = threading.currentThread()
+        daoFactory = DAOFactory(package = "WMCore.WMBS",
+                                logger = myThread.logger,
+                                dbinterface = myThread.dbi)
+        setSubmitInfo = daoFactory(classname = "Jobs.SetSubmitInfo")
+
         testWorkflowA = Workflow(spec = "specA.pkl", owner = "Steve",
                                  name = "wf001", task = "TestTaskA")
         testWorkflowA.create()
@@ -138,6 +148,8 @@ class JobSubmitterCachingTest(unittest.TestCase):
             pickle.dump(newJobA, jobHandle)
             jobHandle.close()
 
+            if storeSubmitInfo:
+                setSubmitInfo.execute(jobs = [newJobA])
             stateChanger.propagate([newJobA], "created", "new")
 
             newJobB = Job(name = "testJobB-%s" % i, files = [newFile])
@@ -157,6 +169,8 @@ class JobSubmitterCachingTest(unittest.TestCase):
             pickle.dump(newJobB, jobHandle)
             jobHandle.close()
 
+            if storeSubmitInfo:
+                setSubmitInfo.execute(jobs = [newJobB])
             stateChanger.propagate([newJobB], "created", "new")
             
         return
@@ -171,29 +185,134 @@ class JobSubmitterCachingTest(unittest.TestCase):
         mySubmitterPoller = JobSubmitterPoller(config)
         mySubmitterPoller.refreshCache()
 
-        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 0,
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 0,
                          "Error: The job cache should be empty.")
 
         self.injectJobs()
         mySubmitterPoller.refreshCache()
         
         # Verify the cache is full
-        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 20,
-                         "Error: The job cache should contain 20 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))       
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 20,
+                         "Error: The job cache should contain 20 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobs))       
 
         killWorkflow("wf001", jobCouchConfig = config)
         mySubmitterPoller.refreshCache()
         
         # Verify that the workflow is gone from the cache
-        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 10,
-                         "Error: The job cache should contain 10 jobs. Contains: %i" % len(mySubmitterPoller.cachedJobIDs))        
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 10,
+                         "Error: The job cache should contain 10 jobs. Contains: %i" % len(mySubmitterPoller.cachedJobs))        
 
         killWorkflow("wf002", jobCouchConfig = config)
         mySubmitterPoller.refreshCache()
         
         # Verify that the workflow is gone from the cache
-        self.assertEqual(len(mySubmitterPoller.cachedJobIDs), 0,
-                         "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.cachedJobIDs))
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 0,
+                         "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.cachedJobs))
+        return
+
+    def testCachingFromSubmitInfo(self):
+        """
+        _testCachingFromSubmitInfo_
+
+        Verify that the cache is built from the submit information stored in
+        WMBS without loading the job pickles and that the jobs are packaged
+        from their pickles once they're assigned to a site.
+        """
+        config            = self.createConfig()
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.siteChunkSize = 3
+
+        self.injectJobs(storeSubmitInfo = True)
+
+        # Hide the pickles, the cache must not need them.
+        for i in range(10):
+            for jobName in ["jobA-%s" % i, "jobB-%s" % i]:
+                jobPickle = os.path.join(self.testDir, jobName, "job.pkl")
+                os.rename(jobPickle, "%s.hidden" % jobPickle)
+
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 20,
+                         "Error: The job cache should contain 20 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobs))
+
+        for jobID in mySubmitterPoller.cachedJobs.jobIDs():
+            jobInfo = mySubmitterPoller.cachedJobs.getJob(jobID)
+            self.assertEqual(jobInfo[2], None,
+                             "Error: Job shouldn't be packaged yet.")
+            self.assertEqual(jobInfo[3], "%s/somesandbox" % self.testDir,
+                             "Error: Wrong sandbox.")
+            self.assertEqual(len(jobInfo[9]), 1,
+                             "Error: Whitelist wasn't applied.")
+
+        for i in range(10):
+            for jobName in ["jobA-%s" % i, "jobB-%s" % i]:
+                jobPickle = os.path.join(self.testDir, jobName, "job.pkl")
+                os.rename("%s.hidden" % jobPickle, jobPickle)
+
+        jobsToSubmit = mySubmitterPoller.assignJobLocations()
+        submitCount = 0
+        for package in jobsToSubmit.keys():
+            self.assertTrue(os.path.isfile(os.path.join(package, "JobPackage.pkl")),
+                            "Error: Job package wasn't written.")
+            submitCount += len(jobsToSubmit[package])
+        self.assertEqual(submitCount, 20,
+                         "Error: All jobs should be submitted.")
+        return
+
+    def testSubmitInfoUpgrade(self):
+        """
+        _testSubmitInfoUpgrade_
+
+        Verify that the jobs are unpickled on databases that don't have the
+        submit info tables and that the WMBS upgrade creates them.
+        """
+        myThread = threading.currentThread()
+        myThread.dbi.processData("DROP TABLE wmbs_job_submit_site")
+        myThread.dbi.processData("DROP TABLE wmbs_job_submit_info")
+
+        daoFactory = DAOFactory(package = "WMCore.WMBS",
+                                logger = myThread.logger,
+                                dbinterface = myThread.dbi)
+        upgradeAction = daoFactory(classname = "Upgrade")
+        self.assertEqual(upgradeAction.pending(), ["wmbs_job_submit_info"])
+
+        config            = self.createConfig()
+        mySubmitterPoller = JobSubmitterPoller(config)
+        self.assertFalse(mySubmitterPoller.useSubmitInfo)
+
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.cachedJobs), 20,
+                         "Error: The job cache should contain 20 jobs.  Contains: %i" % len(mySubmitterPoller.cachedJobs))
+
+        self.assertEqual(upgradeAction.execute(), ["wmbs_job_submit_info"])
+        self.assertEqual(upgradeAction.pending(), [])
+        self.assertEqual(upgradeAction.execute(), [])
+        self.assertTrue(JobSubmitterPoller(config).useSubmitInfo)
+        return
+
+    def testPackageCollections(self):
+        """
+        _testPackageCollections_
+
+        Verify that package collections are only scanned once per sandbox and
+        that new collections are started once the current one is full.
+        """
+        config            = self.createConfig()
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.collSize = 2
+
+        sandboxDir = os.path.join(self.testDir, "collectionSandbox")
+        os.makedirs(os.path.join(sandboxDir, "PackageCollection_0", "batch_1-0"))
+        os.makedirs(os.path.join(sandboxDir, "PackageCollection_1", "batch_2-0"))
+
+        self.assertEqual(mySubmitterPoller.getPackageCollection(sandboxDir), 1)
+
+        # Nothing else should look at the directory anymore
+        os.makedirs(os.path.join(sandboxDir, "PackageCollection_9"))
+
+        self.assertEqual(mySubmitterPoller.getPackageCollection(sandboxDir), 2)
+        self.assertEqual(mySubmitterPoller.getPackageCollection(sandboxDir), 2)
+        self.assertEqual(mySubmitterPoller.getPackageCollection(sandboxDir), 3)
         return
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+_SubmitQueue_t_
+
+Unit tests for the JobSubmitter's per site job queues.
+"""
+
+import unittest
+
+from WMComponent.JobSubmitter.SubmitQueue import SubmitQueue
+
+class SubmitQueueTest(unittest.TestCase):
+    """
+    _SubmitQueueTest_
+
+    """
+    def testPriority(self):
+        """
+        _testPriority_
+
+        Verify that jobs come out by priority, then workflow, then job ID and
+        that a job pulled for one site is gone from the others.
+        """
+        queue = SubmitQueue()
+        queue.addJob(1, "Processing", 2, 1, ["T1_US_FNAL", "T1_UK_RAL"], "job1")
+        queue.addJob(2, "Processing", 1, 1, ["T1_US_FNAL"], "job2")
+        queue.addJob(3, "Processing", 3, 5, ["T1_UK_RAL", "T1_US_FNAL"], "job3")
+        queue.addJob(4, "Merge", 3, 5, ["T1_US_FNAL"], "job4")
+        queue.addJob(5, "Processing", 1, None, ["T1_UK_RAL"], "job5")
+        self.assertEqual(len(queue), 5)
+
+        self.assertEqual(queue.popJob("T1_US_FNAL", "Processing"), "job3")
+        self.assertEqual(queue.popJob("T1_US_FNAL", "Processing"), "job2")
+        self.assertEqual(queue.popJob("T1_UK_RAL", "Processing"), "job1")
+        self.assertEqual(queue.popJob("T1_US_FNAL", "Processing"), None)
+        self.assertFalse(queue.hasJobs("T1_US_FNAL", "Processing"))
+        self.assertTrue(queue.hasJobs("T1_US_FNAL", "Merge"))
+
+        self.assertEqual(queue.popJob("T1_UK_RAL", "Processing"), "job5")
+        self.assertEqual(queue.popJob("T1_UK_RAL", "Processing"), None)
+        self.assertFalse(queue.hasJobs("T1_UK_RAL"))
+        self.assertEqual(queue.jobIDs(), set([4]))
+        return
+
+    def testRemoveAndReAdd(self):
+        """
+        _testRemoveAndReAdd_
+
+        Verify that removed jobs are never handed out, even if they are added
+        back with different sites, and that stale entries get compacted.
+        """
+        queue = SubmitQueue()
+        for jobID in range(100):
+            queue.addJob(jobID, "Processing", 1, 1, ["T1_US_FNAL", "T1_UK_RAL"],
+                         "job%s" % jobID)
+
+        for jobID in range(60):
+            self.assertEqual(queue.removeJob(jobID), "job%s" % jobID)
+        self.assertEqual(queue.removeJob(0), None)
+        self.assertTrue(len(queue.queues["T1_US_FNAL"]["Processing"]) < 100)
+
+        queue.addJob(10, "Processing", 1, 1, ["T1_UK_RAL"], "job10")
+        self.assertTrue(10 in queue)
+
+        fnalJobs = []
+        while True:
+            jobInfo = queue.popJob("T1_US_FNAL", "Processing")
+            if jobInfo == None:
+                break
+            fnalJobs.append(jobInfo)
+        self.assertEqual(fnalJobs, ["job%s" % x for x in range(60, 100)])
+        self.assertEqual(queue.popJob("T1_UK_RAL", "Processing"), "job10")
+        self.assertEqual(queue.popJob("T1_UK_RAL", "Processing"), None)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.sites(), [])
+        return
+
+if __name__ == "__main__":
+    unittest.main()
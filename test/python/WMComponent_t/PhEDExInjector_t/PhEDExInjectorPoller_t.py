@@ -26,6 +26,8 @@ from WMCore.DAOFactory import DAOFactory
 from WMCore.DataStructs.Run import Run
 from WMQuality.TestInit import TestInit
 
+from WMComponent_t.PhEDExInjector_t.PhEDExStandIn import PhEDExStandIn
+
 from nose.plugins.attrib import attr
 
 class PhEDExInjectorPollerTest(unittest.TestCase):
@@ -78,7 +80,7 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
         """
         self.testInit.clearDatabase()
         
-    def stuffDatabase(self, custodialSite = "srm-cms.cern.ch"):
+    def stuffDatabase(self, custodialSite = "srm-cms.cern.ch", custodialSiteB = None):
         """
         _stuffDatabase_
 
@@ -87,8 +89,12 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
         inserted into the datbase.
 
         We'll inject files with the location set as an SE name as well as a
-        PhEDEx node name as well.
+        PhEDEx node name as well.  The second dataset can have a different
+        custodial site.
         """
+        if custodialSiteB == None:
+            custodialSiteB = custodialSite
+
         checksums = {"adler32": "1234", "cksum": "5678"}
         testFileA = DBSBufferFile(lfn = makeUUID(), size = 1024, events = 10,
                                   checksums = checksums,
@@ -134,7 +140,7 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
                                appFam = "RECO", psetHash = "GIBBERISH",
                                configContent = "MOREGIBBERISH")
         testFileD.setDatasetPath(self.testDatasetB)
-        testFileD.setCustodialSite(custodialSite = custodialSite)
+        testFileD.setCustodialSite(custodialSite = custodialSiteB)
         testFileD.addRun(Run(2, *[45]))
         testFileD.create()
 
@@ -145,7 +151,7 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
                                appFam = "RECO", psetHash = "GIBBERISH",
                                configContent = "MOREGIBBERISH")
         testFileE.setDatasetPath(self.testDatasetB)
-        testFileE.setCustodialSite(custodialSite = custodialSite)
+        testFileE.setCustodialSite(custodialSite = custodialSiteB)
         testFileE.addRun(Run(2, *[45]))
         testFileE.create()        
 
@@ -344,5 +350,109 @@ class PhEDExInjectorPollerTest(unittest.TestCase):
         return
         
 
+    def startStandIn(self):
+        """
+        _startStandIn_
+
+        Start a local stand-in for the PhEDEx data service that knows about a
+        CERN and a FNAL node and point the tests to it.
+        """
+        nodes = [{"name": "T1_CH_CERN_Buffer", "se": "srm-cms.cern.ch",
+                  "kind": "Buffer", "technology": "Castor", "id": 1},
+                 {"name": "T1_US_FNAL_Buffer", "se": "se.fnal.gov",
+                  "kind": "Buffer", "technology": "dCache", "id": 2}]
+        standIn = PhEDExStandIn(nodes)
+        standIn.start()
+        self.phedexURL = standIn.url
+        return standIn
+
+    def getUninjectedLocations(self):
+        """
+        _getUninjectedLocations_
+
+        Return the locations that still have uninjected files.
+        """
+        myThread = threading.currentThread()
+        daofactory = DAOFactory(package = "WMComponent.PhEDExInjector.Database",
+                                logger = myThread.logger,
+                                dbinterface = myThread.dbi)
+        getUninjected = daofactory(classname = "GetUninjectedFiles")
+        return getUninjected.execute().keys()
+
+    def testConcurrentInjection(self):
+        """
+        _testConcurrentInjection_
+
+        Inject files at two nodes into the PhEDEx stand-in and verify that the
+        injections are split into pieces of at most maxInjectionFiles files,
+        that the slow FNAL injection runs while the CERN ones are in flight
+        and that all files are marked as injected.
+        """
+        standIn = self.startStandIn()
+        try:
+            self.stuffDatabase(custodialSiteB = "se.fnal.gov")
+
+            config = self.createConfig()
+            config.PhEDExInjector.injectionThreads = 3
+            config.PhEDExInjector.maxInjectionFiles = 2
+            standIn.delayNode("T1_CH_CERN_Buffer", 0.5)
+            standIn.delayNode("T1_US_FNAL_Buffer", 1)
+
+            poller = PhEDExInjectorPoller(config)
+            poller.setup(parameters = None)
+            poller.algorithm(parameters = None)
+        finally:
+            standIn.stop()
+
+        cernInjections = [x for x in standIn.injections if x["node"] == "T1_CH_CERN_Buffer"]
+        self.assertEqual(len(cernInjections), 2)
+        self.assertEqual(sorted([x["files"] for x in cernInjections]), [1, 2])
+        self.assertEqual(standIn.injectedFiles("T1_CH_CERN_Buffer"), 3)
+        self.assertEqual(standIn.injectedFiles("T1_US_FNAL_Buffer"), 2)
+
+        fnalInjections = [x for x in standIn.injections if x["node"] == "T1_US_FNAL_Buffer"]
+        self.assertEqual(len(fnalInjections), 1)
+        for cernInjection in cernInjections:
+            self.assertTrue(cernInjection["time"] < fnalInjections[0]["end"])
+            self.assertTrue(fnalInjections[0]["time"] < cernInjection["end"])
+
+        self.assertEqual(self.getUninjectedLocations(), [])
+        return
+
+    def testInjectionFailures(self):
+        """
+        _testInjectionFailures_
+
+        Verify that failed injections are retried, and that a node that keeps
+        failing doesn't stop the files for other nodes from being marked as
+        injected.
+        """
+        standIn = self.startStandIn()
+        try:
+            self.stuffDatabase(custodialSiteB = "se.fnal.gov")
+
+            config = self.createConfig()
+            config.PhEDExInjector.injectionRetries = 1
+            standIn.failNode("T1_CH_CERN_Buffer", 1)
+            standIn.failNode("T1_US_FNAL_Buffer")
+
+            poller = PhEDExInjectorPoller(config)
+            poller.setup(parameters = None)
+            poller.algorithm(parameters = None)
+
+            self.assertEqual(standIn.injectedFiles("T1_CH_CERN_Buffer"), 3)
+            self.assertEqual(len([x for x in standIn.injections
+                                  if x["node"] == "T1_US_FNAL_Buffer"]), 2)
+            self.assertEqual(self.getUninjectedLocations(), ["se.fnal.gov"])
+
+            standIn.failNode("T1_US_FNAL_Buffer", 0)
+            poller.algorithm(parameters = None)
+        finally:
+            standIn.stop()
+
+        self.assertEqual(standIn.injectedFiles("T1_US_FNAL_Buffer"), 2)
+        self.assertEqual(self.getUninjectedLocations(), [])
+        return
+
 if __name__ == '__main__':
     unittest.main()
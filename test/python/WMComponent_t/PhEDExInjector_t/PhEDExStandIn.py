@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+_PhEDExStandIn_
+
+A local HTTP stand-in for the PhEDEx data service, for testing the
+PhEDExInjector without a real PhEDEx instance.  It serves the 'nodes' and
+'inject' calls, records every injection and can be told to fail or delay the
+injections for a node.  Every call is answered in its own thread so
+concurrent injections overlap like they do against the real service.
+"""
+
+import cgi
+import time
+import threading
+import SocketServer
+import BaseHTTPServer
+
+from WMCore.Wrappers import JsonWrapper
+
+class PhEDExStandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    _PhEDExStandInHandler_
+
+    Answer a single data service call.
+    """
+    def log_message(self, format, *args):
+        """
+        _log_message_
+
+        Keep the test output quiet.
+        """
+        return
+
+    def do_GET(self):
+        self.handleCall({})
+        return
+
+    def do_POST(self):
+        length = int(self.headers.getheader("content-length") or 0)
+        args = cgi.parse_qs(self.rfile.read(length))
+        self.handleCall(args)
+        return
+
+    def handleCall(self, args):
+        """
+        _handleCall_
+
+        Dispatch on the last element of the path.
+        """
+        standIn = self.server.standIn
+        callname = self.path.split("?")[0].rstrip("/").split("/")[-1]
+
+        if callname == "nodes":
+            self.sendResult(200, {"phedex": {"node": standIn.nodes}})
+        elif callname == "inject":
+            node = args.get("node", [None])[0]
+            data = args.get("data", [""])[0]
+            (status, delay, injection) = standIn.recordInjection(node, data)
+            if delay:
+                time.sleep(delay)
+            injection["end"] = time.time()
+            if status != 200:
+                self.sendResult(status, {"error": "Injection to %s failed" % node})
+            else:
+                self.sendResult(200, {"phedex": {"injected": {"stats": {"new_files": data.count("<file ")}}}})
+        else:
+            self.sendResult(404, {"error": "Unknown call %s" % callname})
+
+        return
+
+    def sendResult(self, status, result):
+        """
+        _sendResult_
+
+        Send a JSON encoded result.
+        """
+        body = JsonWrapper.dumps(result)
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    _ThreadingHTTPServer_
+
+    HTTP server that handles every request in a daemon thread.
+    """
+    daemon_threads = True
+
+class PhEDExStandIn(object):
+    """
+    _PhEDExStandIn_
+
+    Run the stand-in in a background thread.  The data service URL to use is
+    available in the url attribute once start() returned.
+    """
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.injections = []
+        self.failures = {}
+        self.delays = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+        self.url = None
+        return
+
+    def start(self):
+        """
+        _start_
+
+        Bind to a free port on localhost and start serving.
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PhEDExStandInHandler)
+        self.server.standIn = self
+        self.url = "http://127.0.0.1:%i/phedex/datasvc/json/test" % self.server.server_port
+        self.thread = threading.Thread(target = self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        return
+
+    def stop(self):
+        """
+        _stop_
+
+        Stop serving.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        return
+
+    def failNode(self, node, count = -1):
+        """
+        _failNode_
+
+        Fail the next count injections for a node, or all of them if count
+        is negative.
+        """
+        self.failures[node] = count
+        return
+
+    def delayNode(self, node, delay):
+        """
+        _delayNode_
+
+        Delay every injection for a node by delay seconds.
+        """
+        self.delays[node] = delay
+        return
+
+    def recordInjection(self, node, data):
+        """
+        _recordInjection_
+
+        Record an injection and return the HTTP status to answer with, the
+        time to wait before answering and the injection record.  The handler
+        sets the end time of the record once it answers.
+        """
+        self.lock.acquire()
+        try:
+            status = 200
+            failures = self.failures.get(node, 0)
+            if failures != 0:
+                status = 503
+                self.failures[node] = failures - 1
+            injection = {"node": node, "status": status,
+                         "files": data.count("<file "),
+                         "time": time.time(), "end": None}
+            self.injections.append(injection)
+            return status, self.delays.get(node, 0), injection
+        finally:
+            self.lock.release()
+
+    def injectedFiles(self, node):
+        """
+        _injectedFiles_
+
+        Return the number of files that were injected into a node.
+        """
+        return sum([x["files"] for x in self.injections
+                    if x["node"] == node and x["status"] == 200])
@@ -7,10 +7,13 @@ Unit tests for the WMBS File class.
 
 
 
+import re
 import unittest
 import time
+import threading
 from WMQuality.TestInit import TestInit
 from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
+from WMCore.DAOFactory import DAOFactory
 # pylint: disable-msg = W0611
 
 class HeartbeatTest(unittest.TestCase):
@@ -89,6 +92,68 @@ class HeartbeatTest(unittest.TestCase):
         testComponent.updateWorkerError("test2Worker", "Error1")
         result = testComponent.getHeartbeatInfo()
         self.assertEqual(result[1]['error_message'], "Error1")
+
+        testComponent.updateWorkerHeartbeat("test2Worker", "Running",
+                                            cycle = {"cycle_time": 2.5,
+                                                     "db_time": 1.5,
+                                                     "http_time": 0.5,
+                                                     "cycle_items": 100})
+        result = testComponent.getWorkerCycles()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['name'], "test2Component")
+        self.assertEqual(result[0]['worker_name'], "test2Worker")
+        self.assertAlmostEqual(result[0]['cycle_time'], 2.5)
+        self.assertAlmostEqual(result[0]['db_time'], 1.5)
+        self.assertAlmostEqual(result[0]['http_time'], 0.5)
+        self.assertEqual(result[0]['cycle_items'], 100)
+
+    def testCycleColumnsUpgrade(self):
+        """
+        _testCycleColumnsUpgrade_
+
+        Verify that heartbeats with cycle stats still work on an agent
+        database created before the cycle stats columns existed, and that
+        the Agent upgrade adds the columns.
+        """
+        myThread = threading.currentThread()
+        daoFactory = DAOFactory(package = "WMCore.Agent.Database",
+                                logger = myThread.logger,
+                                dbinterface = myThread.dbi)
+
+        # Recreate wm_workers the way it was before the cycle stats
+        myThread.dbi.processData("DROP TABLE wm_workers")
+        creator = daoFactory(classname = "Create")
+        creator.create = {"02wm_workers": re.sub(r"\s+(cycle_time|db_time|http_time|cycle_items)\s+\w+,",
+                                                 "", creator.create["02wm_workers"])}
+        creator.constraints = {}
+        creator.indexes = {}
+        creator.inserts = {}
+        creator.requiredTables = ["02wm_workers"]
+        self.assertTrue(creator.execute())
+
+        upgradeAction = daoFactory(classname = "Upgrade")
+        self.assertEqual(upgradeAction.pending(), ["wm_workers_cycle"])
+
+        cycle = {"cycle_time": 2.5, "db_time": 1.5, "http_time": 0.5,
+                 "cycle_items": 100}
+        testComponent = HeartbeatAPI("testComponent")
+        testComponent.registerComponent()
+        testComponent.updateWorkerHeartbeat("testWorker")
+        testComponent.updateWorkerHeartbeat("testWorker", "Running", cycle = cycle)
+        self.assertFalse(testComponent.hasCycleColumns())
+        self.assertEqual(testComponent.getWorkerCycles(), [])
+        self.assertEqual(testComponent.getHeartbeatInfo()[0]['state'], "Running")
+
+        self.assertEqual(upgradeAction.execute(), ["wm_workers_cycle"])
+        self.assertEqual(upgradeAction.pending(), [])
+        self.assertEqual(upgradeAction.execute(), [])
+
+        testComponent = HeartbeatAPI("testComponent")
+        testComponent.updateWorkerHeartbeat("testWorker", "Running", cycle = cycle)
+        result = testComponent.getWorkerCycles()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['cycle_items'], 100)
+        return
         
         
         
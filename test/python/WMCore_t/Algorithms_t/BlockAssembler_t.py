@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+_BlockAssembler_t_
+
+Test class for the block assembler.  Run this file directly with the
+'performance' argument to replay a synthetic stream of 1M files through the
+assembler.
+"""
+
+import sys
+import time
+import random
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Algorithms.BlockAssembler import BlockAssembler
+
+class BlockAssemblerTest(unittest.TestCase):
+    """
+    _BlockAssemblerTest_
+
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        """
+        self.nBlocks = 0
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        """
+        return
+
+    def newBlock(self, das, location):
+        """
+        _newBlock_
+
+        Create blocks as plain dictionaries.
+        """
+        self.nBlocks += 1
+        name = "/%s/%s#%i" % (das, location, self.nBlocks)
+        return name, {'name': name, 'files': []}
+
+    def testA_FilesAndSize(self):
+        """
+        _FilesAndSize_
+
+        Verify that blocks are closed on the number of files and on size, and
+        that each dataset-algo and location gets its own blocks.
+        """
+        assembler = BlockAssembler(newBlock = self.newBlock, maxFiles = 3,
+                                   maxSize = 100, maxTime = 3600)
+
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual(block["name"], "/1/se1#1")
+        self.assertEqual(closed, [])
+
+        block, closed = assembler.addFile(das = 1, location = "se2", size = 10)
+        self.assertEqual(block["name"], "/1/se2#2")
+        block, closed = assembler.addFile(das = 2, location = "se1", size = 10)
+        self.assertEqual(block["name"], "/2/se1#3")
+
+        assembler.addFile(das = 1, location = "se1", size = 10)
+        assembler.addFile(das = 1, location = "se1", size = 10)
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual(block["name"], "/1/se1#4")
+        self.assertEqual([x["name"] for x in closed], ["/1/se1#1"])
+        self.assertEqual(assembler.getRecord("/1/se1#1").nFiles, 3)
+
+        # The next file would take the block over the size limit
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 95)
+        self.assertEqual(block["name"], "/1/se1#5")
+        self.assertEqual([x["name"] for x in closed], ["/1/se1#4"])
+
+        # A file that is bigger than a block gets a block of its own
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 500)
+        self.assertEqual(block["name"], "/1/se1#6")
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 1)
+        self.assertEqual(block["name"], "/1/se1#7")
+        self.assertEqual([x["name"] for x in closed], ["/1/se1#6"])
+        self.assertEqual(len(assembler), 7)
+        return
+
+    def testB_ExistingBlocks(self):
+        """
+        _ExistingBlocks_
+
+        Verify that registered open blocks are filled in order, closed blocks
+        are ignored and removed blocks are forgotten.
+        """
+        assembler = BlockAssembler(newBlock = self.newBlock, maxFiles = 2,
+                                   maxSize = 100, maxTime = 3600)
+        assembler.addBlock(name = "old1", das = 1, location = "se1",
+                           block = {"name": "old1"}, nFiles = 1, size = 10)
+        assembler.addBlock(name = "old2", das = 1, location = "se1",
+                           block = {"name": "old2"}, nFiles = 0)
+        assembler.addBlock(name = "closed", das = 1, location = "se2",
+                           block = {"name": "closed"}, isOpen = False)
+
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual(block["name"], "old1")
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual(block["name"], "old2")
+        self.assertEqual([x["name"] for x in closed], ["old1"])
+        block, closed = assembler.addFile(das = 1, location = "se2", size = 10)
+        self.assertEqual(block["name"], "/1/se2#1")
+
+        self.assertEqual(assembler.closeBlock("old1"), None)
+        self.assertEqual(assembler.closeBlock("old2")["name"], "old2")
+        assembler.removeBlock("old2")
+        self.assertFalse("old2" in assembler)
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual(block["name"], "/1/se1#2")
+        self.assertEqual(closed, [])
+        return
+
+    def testC_Timeout(self):
+        """
+        _Timeout_
+
+        Verify that only expired open blocks are returned by expire, and that
+        closeOnTime closes old blocks when a new file arrives.
+        """
+        assembler = BlockAssembler(newBlock = self.newBlock, maxFiles = 10,
+                                   maxSize = 100, maxTime = 100)
+        now = time.time()
+        assembler.addBlock(name = "old", das = 1, location = "se1",
+                           block = {"name": "old"}, startTime = now - 200)
+        assembler.addBlock(name = "closed", das = 1, location = "se2",
+                           block = {"name": "closed"}, startTime = now - 200,
+                           isOpen = False)
+        assembler.addBlock(name = "removed", das = 1, location = "se3",
+                           block = {"name": "removed"}, startTime = now - 200)
+        assembler.removeBlock("removed")
+        assembler.addFile(das = 2, location = "se1", size = 10)
+
+        self.assertEqual([x["name"] for x in assembler.expire()], ["old"])
+        self.assertEqual(assembler.expire(), [])
+        self.assertEqual(len(assembler.expire(now = now + 200)), 1)
+
+        assembler = BlockAssembler(newBlock = self.newBlock, maxFiles = 10,
+                                   maxSize = 100, maxTime = 100,
+                                   closeOnTime = True)
+        assembler.addBlock(name = "old", das = 1, location = "se1",
+                           block = {"name": "old"}, nFiles = 1,
+                           startTime = now - 200)
+        block, closed = assembler.addFile(das = 1, location = "se1", size = 10)
+        self.assertEqual([x["name"] for x in closed], ["old"])
+        return
+
+    @attr('performance')
+    def testD_Performance(self):
+        """
+        _Performance_
+
+        Replay a synthetic stream of 1M files from 100 dataset-algos at 20
+        locations through the assembler.
+        """
+        nFiles = 1000000
+        maxFiles = 500
+        assembler = BlockAssembler(newBlock = self.newBlock, maxFiles = maxFiles,
+                                   maxSize = 5000000000000, maxTime = 3600)
+        locations = ["T2_SITE_%i" % i for i in range(20)]
+
+        random.seed(42)
+        stream = [(random.randint(1, 100), random.choice(locations),
+                   random.randint(1000000, 4000000000)) for i in xrange(nFiles)]
+
+        startTime = time.time()
+        nClosed = 0
+        for (das, location, size) in stream:
+            block, closed = assembler.addFile(das = das, location = location,
+                                              size = size)
+            block["files"].append(size)
+            nClosed += len(closed)
+        nClosed += len(assembler.expire(now = time.time() + 7200))
+        elapsed = time.time() - startTime
+        print("Assembled %i files into %i blocks in %f seconds" % (nFiles, self.nBlocks, elapsed))
+
+        self.assertEqual(nClosed, self.nBlocks)
+        self.assertTrue(nFiles / maxFiles <= self.nBlocks)
+        return
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "performance":
+        suite = unittest.TestSuite()
+        suite.addTest(BlockAssemblerTest("testD_Performance"))
+        unittest.TextTestRunner(verbosity = 2).run(suite)
+    else:
+        unittest.main()
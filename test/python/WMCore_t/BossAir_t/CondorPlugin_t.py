@@ -9,18 +9,74 @@ import time
 import os.path
 import threading
 import unittest
+import subprocess
 
 from nose.plugins.attrib import attr
 from subprocess import Popen, PIPE, STDOUT
 
 from WMCore.BossAir.BossAirAPI   import BossAirAPI, BossAirException
 from WMCore.BossAir.StatusPoller import StatusPoller
+from WMCore.BossAir.Plugins.CondorPlugin import CondorPlugin
 from WMCore.JobStateMachine.ChangeState          import ChangeState
 from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
 from WMComponent.JobTracker.JobTrackerPoller     import JobTrackerPoller
 
 from WMCore_t.BossAir_t.BossAir_t import BossAirTest, getNArcJobs, getCondorRunningJobs
 
+class FakeProcess:
+    """
+    _FakeProcess_
+
+    Stands in for a CondorPlugin submit worker
+    """
+    def join(self):
+        return
+
+    def terminate(self):
+        return
+
+
+class FakeSubmitQueue:
+    """
+    _FakeSubmitQueue_
+
+    Stands in for both CondorPlugin worker queues.  Every submit command put
+    into it is recorded and answered with a successful result.
+    """
+    def __init__(self):
+        self.commands = []
+        self.results  = []
+
+    def put(self, work):
+        if work == 'STOP':
+            return
+        self.commands.append(work)
+        self.results.append({'stdout': '', 'stderr': '', 'exitCode': 0,
+                             'idList': work['idList']})
+
+    def get(self, block = True, timeout = None):
+        return self.results.pop(0)
+
+    def close(self):
+        return
+
+
+class FakePopen:
+    """
+    _FakePopen_
+
+    Records the command lines instead of running them
+    """
+    commands = []
+
+    def __init__(self, command, stdout = None, stderr = None, shell = False):
+        FakePopen.commands.append((command, shell))
+        self.returncode = 0
+
+    def communicate(self):
+        return ('', '')
+
+
 class CondorPluginTest(BossAirTest):
     """
     _CondorPluginTest_
@@ -408,6 +464,153 @@ class CondorPluginTest(BossAirTest):
         return
 
 
+    def createSubmitJobs(self, jobs):
+        """
+        _createSubmitJobs_
+
+        Build the job dictionaries the submitter hands to the plugin from a
+        list of (sandbox, location, retry_count) tuples.
+        """
+        jobList = []
+        jobID   = 1
+        for (sandbox, location, retryCount) in jobs:
+            job = {'id': jobID, 'jobid': jobID}
+            job['cache_dir']   = os.path.join(self.testDir, 'job%i' % jobID)
+            job['packageDir']  = self.testDir
+            job['sandbox']     = sandbox
+            job['location']    = location
+            job['retry_count'] = retryCount
+            job['priority']    = 5
+            jobList.append(job)
+            jobID += 1
+
+        return jobList
+
+    def testH_MakeSubmit(self):
+        """
+        _MakeSubmit_
+
+        Check that per-proc attributes are only written to the JDL when they
+        differ from the previous proc, including when they go back to an
+        earlier value.
+        """
+        config = self.getConfig()
+        plugin = CondorPlugin(config = config)
+        plugin.scriptFile = config.JobSubmitter.submitScript
+
+        sandbox = os.path.join(self.testDir, 'sandbox.box')
+        jobList = self.createSubmitJobs([(sandbox, 'T2_US_UCSD', 0),
+                                         (sandbox, 'T2_US_UCSD', 0),
+                                         (sandbox, 'T2_US_Florida', 1),
+                                         (sandbox, 'T2_US_UCSD', 0)])
+
+        jdl = plugin.makeSubmit(jobList = jobList)
+        header = plugin.initSubmit(jobList)
+        self.assertEqual(jdl[:len(header)], header)
+
+        inputFiles = "transfer_input_files = %s, %s/JobPackage.pkl, %s\n" \
+                     % (sandbox, self.testDir, plugin.unpacker)
+        expected = ["initialdir = %s\n" % jobList[0]['cache_dir'],
+                    inputFiles,
+                    "arguments = sandbox.box 1\n",
+                    '+DESIRED_Sites = "T2_US_UCSD"\n',
+                    "transfer_output_files = Report.0.pkl\n",
+                    "priority = 5\n",
+                    "+WMAgent_JobID = 1\n",
+                    "Queue 1\n",
+                    "initialdir = %s\n" % jobList[1]['cache_dir'],
+                    "arguments = sandbox.box 2\n",
+                    "+WMAgent_JobID = 2\n",
+                    "Queue 1\n",
+                    "initialdir = %s\n" % jobList[2]['cache_dir'],
+                    "arguments = sandbox.box 3\n",
+                    '+DESIRED_Sites = "T2_US_Florida"\n',
+                    "transfer_output_files = Report.1.pkl\n",
+                    "+WMAgent_JobID = 3\n",
+                    "Queue 1\n",
+                    "initialdir = %s\n" % jobList[3]['cache_dir'],
+                    "arguments = sandbox.box 4\n",
+                    '+DESIRED_Sites = "T2_US_UCSD"\n',
+                    "transfer_output_files = Report.0.pkl\n",
+                    "+WMAgent_JobID = 4\n",
+                    "Queue 1\n"]
+        self.assertEqual(jdl[len(header):], expected)
+        return
+
+    def testI_BulkSubmitGrouping(self):
+        """
+        _BulkSubmitGrouping_
+
+        Check that bulk submission groups the jobs by sandbox and location
+        and splits each group in clusters of condorBulkSubmitSize jobs.
+        """
+        config = self.getConfig()
+        config.BossAir.condorBulkSubmit     = True
+        config.BossAir.condorBulkSubmitSize = 2
+        plugin = CondorPlugin(config = config)
+
+        queue = FakeSubmitQueue()
+        plugin.pool   = [FakeProcess()]
+        plugin.input  = queue
+        plugin.result = queue
+
+        submitted = []
+        makeSubmit = plugin.makeSubmit
+        def recordSubmit(jobList):
+            submitted.append([job['id'] for job in jobList])
+            return makeSubmit(jobList = jobList)
+        plugin.makeSubmit = recordSubmit
+
+        sandboxA = os.path.join(self.testDir, 'sandboxA.box')
+        sandboxB = os.path.join(self.testDir, 'sandboxB.box')
+        jobList = self.createSubmitJobs([(sandboxA, 'T2_US_UCSD', 0),
+                                         (sandboxA, 'T2_US_Florida', 0),
+                                         (sandboxA, 'T2_US_UCSD', 0),
+                                         (sandboxB, 'T2_US_UCSD', 0),
+                                         (sandboxA, 'T2_US_UCSD', 0),
+                                         (sandboxA, 'T2_US_Florida', 0),
+                                         (sandboxA, 'T2_US_UCSD', 0)])
+
+        successful, failed = plugin.submit(jobs = jobList, info = None)
+
+        self.assertEqual(sorted(submitted), [[1, 3], [2, 6], [4], [5, 7]])
+        self.assertEqual(sorted([x['idList'] for x in queue.commands]),
+                         sorted(submitted))
+        for work in queue.commands:
+            self.assertTrue(work['command'].startswith('condor_submit '))
+        self.assertEqual(sorted([x['id'] for x in successful]), range(1, 8))
+        self.assertEqual(failed, [])
+        self.assertEqual(plugin.pool, [])
+        return
+
+    def testJ_KillBatches(self):
+        """
+        _KillBatches_
+
+        Check that kill removes the jobs in batches of condorRmBatchSize,
+        one condor_rm with a constraint per batch.
+        """
+        config = self.getConfig()
+        config.BossAir.condorRmBatchSize = 3
+        plugin = CondorPlugin(config = config)
+
+        jobList = [{'jobid': jobID} for jobID in range(1, 8)]
+
+        FakePopen.commands = []
+        realPopen = subprocess.Popen
+        subprocess.Popen = FakePopen
+        try:
+            plugin.kill(jobs = jobList)
+        finally:
+            subprocess.Popen = realPopen
+
+        expected = []
+        for idList in [[1, 2, 3], [4, 5, 6], [7]]:
+            constraint = " || ".join(["WMAgent_JobID =?= %i" % x for x in idList])
+            expected.append((['condor_rm', '-constraint', constraint], False))
+        self.assertEqual(FakePopen.commands, expected)
+        return
+
 
 if __name__ == '__main__':
     unittest.main()
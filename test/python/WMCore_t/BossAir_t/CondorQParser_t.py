@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+_CondorQParser_t_
+
+Unit tests for the condor_q output parser.
+"""
+
+import time
+import unittest
+import StringIO
+
+from nose.plugins.attrib import attr
+
+from WMCore.BossAir.Plugins.CondorQParser import parseClassAds
+
+class CondorQParserTest(unittest.TestCase):
+    """
+    _CondorQParserTest_
+
+    """
+    def testParseClassAds(self):
+        """
+        _testParseClassAds_
+
+        Verify that jobs are parsed correctly, including jobs that span two
+        chunks of output, and that invalid jobs are skipped.
+        """
+        output = "(JobStatus:1)  (stateTime:1000)  (WMAgentID:1):::" \
+                 "(JobStatus:2)  (stateTime:2000)  (WMAgentID:22):::" \
+                 "(JobStatus:5)  (stateTime:3000)  :::" \
+                 "(JobStatus:4)  (stateTime:4000)  (WMAgentID:333):::"
+
+        for chunkSize in [1, 7, 65536]:
+            jobInfo = parseClassAds(StringIO.StringIO(output), chunkSize = chunkSize)
+            self.assertEqual(sorted(jobInfo.keys()), [1, 22, 333])
+            self.assertEqual(jobInfo[1], {"JobStatus": "1", "stateTime": "1000",
+                                          "WMAgentID": "1"})
+            self.assertEqual(jobInfo[22]["JobStatus"], "2")
+            self.assertEqual(jobInfo[333]["stateTime"], "4000")
+
+        self.assertEqual(parseClassAds(StringIO.StringIO("")), {})
+        return
+
+    @attr('performance')
+    def testParseClassAdsPerformance(self):
+        """
+        _testParseClassAdsPerformance_
+
+        Time parsing the condor_q output for 200k jobs.
+        """
+        nJobs = 200000
+        output = "".join(["(JobStatus:2)  (stateTime:%i)  (WMAgentID:%i):::" % (1000 + i, i)
+                          for i in range(nJobs)])
+
+        startTime = time.time()
+        jobInfo = parseClassAds(StringIO.StringIO(output))
+        print("Parsed %i classAds in %f seconds" % (nJobs, time.time() - startTime))
+
+        self.assertEqual(len(jobInfo), nJobs)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
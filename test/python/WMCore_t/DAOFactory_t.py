@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+_DAOFactory_t_
+
+Unit tests for the DAOFactory class.
+"""
+
+import unittest
+import threading
+
+from WMCore.DAOFactory import DAOFactory
+from WMQuality.TestInit import TestInit
+
+class DAOFactoryTest(unittest.TestCase):
+    def setUp(self):
+        """
+        _setUp_
+
+        Setup the database connection.
+        """
+        self.testInit = TestInit(__file__)
+        self.testInit.setLogging()
+        self.testInit.setDatabaseConnection()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Nothing to do.
+        """
+        return
+
+    def testInstanceCache(self):
+        """
+        _testInstanceCache_
+
+        Verify that DAO instances are only reused by factories that cache
+        instances and never between threads.
+        """
+        myThread = threading.currentThread()
+
+        daoFactory = DAOFactory(package = "WMCore.WMBS",
+                                logger = myThread.logger,
+                                dbinterface = myThread.dbi)
+        daoA = daoFactory(classname = "Jobs.GetState")
+        daoB = daoFactory(classname = "Jobs.GetState")
+        self.assertTrue(daoA.__class__ is daoB.__class__)
+        self.assertFalse(daoA is daoB)
+
+        cachingFactoryA = DAOFactory(package = "WMCore.WMBS",
+                                     logger = myThread.logger,
+                                     dbinterface = myThread.dbi,
+                                     cacheInstances = True)
+        cachingFactoryB = DAOFactory(package = "WMCore.WMBS",
+                                     logger = myThread.logger,
+                                     dbinterface = myThread.dbi,
+                                     cacheInstances = True)
+        daoA = cachingFactoryA(classname = "Jobs.GetState")
+        daoB = cachingFactoryB(classname = "Jobs.GetState")
+        self.assertTrue(daoA is daoB)
+        self.assertFalse(daoA is cachingFactoryA(classname = "Jobs.ChangeState"))
+
+        otherThreadDAOs = []
+        def loadDAO():
+            otherThreadDAOs.append(cachingFactoryA(classname = "Jobs.GetState"))
+        otherThread = threading.Thread(target = loadDAO)
+        otherThread.start()
+        otherThread.join()
+
+        self.assertFalse(otherThreadDAOs[0] is daoA)
+        self.assertTrue(otherThreadDAOs[0].__class__ is daoA.__class__)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+_LumiMask_t_
+
+Unit tests for the WMCore.DataStructs.LumiMask class.
+"""
+
+import unittest
+
+from WMCore.DataStructs.LumiMask import LumiMask
+
+class LumiMaskTest(unittest.TestCase):
+    """
+    _LumiMaskTest_
+
+    """
+    def testGoodRunList(self):
+        """
+        _testGoodRunList_
+
+        Verify that runs and lumis are checked correctly against a good run
+        list and that overlapping ranges are merged.
+        """
+        mask = LumiMask({"1": [[6, 10], [1, 4], [3, 5]],
+                         "3": [[5, 10]],
+                         "4": [[1, 2, 3]]})
+
+        self.assertTrue(mask.isGoodRun(1))
+        self.assertTrue(mask.isGoodRun("3"))
+        self.assertFalse(mask.isGoodRun(2))
+        self.assertEqual(mask.runs(), [1, 3, 4])
+
+        self.assertEqual(mask.lumiRanges(1), [[1, 10]])
+        self.assertEqual(mask.lumiRanges(3), [[5, 10]])
+        self.assertEqual(mask.lumiRanges(4), [])
+
+        for lumi in range(1, 11):
+            self.assertTrue(mask.isGoodLumi(1, lumi))
+        self.assertFalse(mask.isGoodLumi(1, 0))
+        self.assertFalse(mask.isGoodLumi(1, 11))
+        self.assertFalse(mask.isGoodLumi(3, 4))
+        self.assertTrue(mask.isGoodLumi(3, 5))
+        self.assertFalse(mask.isGoodLumi(2, 5))
+        self.assertFalse(mask.isGoodLumi(4, 1))
+        return
+
+    def testEmptyMask(self):
+        """
+        _testEmptyMask_
+
+        An empty mask should accept everything.
+        """
+        mask = LumiMask()
+        self.assertTrue(mask.isGoodRun(1))
+        self.assertTrue(mask.isGoodLumi(1, 1))
+        self.assertEqual(mask.goodRunList(), {})
+        return
+
+    def testFromRunLumis(self):
+        """
+        _testFromRunLumis_
+
+        Verify that individual lumis are compressed into ranges.
+        """
+        mask = LumiMask.fromRunLumis({1: [5, 1, 2, 3, 3, 7, 8, 10],
+                                      2: [4]})
+        self.assertEqual(mask.goodRunList(),
+                         {"1": [[1, 3], [5, 5], [7, 8], [10, 10]],
+                          "2": [[4, 4]]})
+        self.assertTrue(mask.isGoodLumi(1, 7))
+        self.assertFalse(mask.isGoodLumi(1, 9))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
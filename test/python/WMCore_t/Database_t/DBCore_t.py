@@ -285,6 +285,96 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testInListSelect(self):
+        """
+        _testInListSelect_
+
+        Verify that selects with a single bind variable are rewritten into a
+        select with an IN clause and that other selects are left alone.
+        """
+        myThread = threading.currentThread()
+        binds = [{"one": 1}, {"one": 2}]
+
+        (inSQL, inBinds) = myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 = :one", binds)
+        self.assertEqual(inSQL, "SELECT column2 FROM test_tablea WHERE column1 IN (:one_0, :one_1)")
+        self.assertEqual(inBinds, {"one_0": 1, "one_1": 2})
+
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT COUNT(*) FROM test_tablea WHERE column1 = :one", binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 <= :one", binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 = :one OR column2 = :one", binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 = :one", [{"one": 1}, {"one": 1}]), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 = :one AND column2 = :two",
+            [{"one": 1, "two": 2}, {"one": 2, "two": 2}]), None)
+
+        # Subqueries, OR, CASE and join conditions
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 = (SELECT MAX(column1) FROM test_tableb WHERE column2 = :one)",
+            binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column1 IN (SELECT column1 FROM test_tableb WHERE column2 = :one)",
+            binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT column2 FROM test_tablea WHERE column3 = 'a' OR column1 = :one", binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT CASE WHEN column1 = :one THEN 1 ELSE 0 END FROM test_tablea", binds), None)
+        self.assertEqual(myThread.dbi.inListSelect(
+            "SELECT a.column2 FROM test_tablea a LEFT OUTER JOIN test_tableb b ON b.column1 = a.column1 AND b.column2 = :one",
+            binds), None)
+
+        (inSQL, inBinds) = myThread.dbi.inListSelect(
+            "SELECT a.column2 FROM test_tablea a INNER JOIN test_tableb b ON b.column1 = a.column1 WHERE a.column3 = '(' AND a.column1 = :one",
+            binds)
+        self.assertEqual(inSQL, "SELECT a.column2 FROM test_tablea a INNER JOIN test_tableb b ON b.column1 = a.column1 WHERE a.column3 = '(' AND a.column1 IN (:one_0, :one_1)")
+        return
+
+    def testProcessDataInListSelect(self):
+        """
+        _testProcessDataInListSelect_
+
+        Verify that selects with a single bind variable return the same rows
+        when they are run with an IN clause, including when the binds span
+        several queries.
+        """
+        insertBinds = []
+        selectBinds = []
+        for i in range(1201):
+            insertBinds.append({"one": i, "two": i * 2, "three": str(i * 3)})
+            selectBinds.append({"one": i})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea WHERE column1 = :one"
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = insertBinds)
+
+        resultSets = myThread.dbi.processData(selectSQL, selectBinds)
+        self.assertEqual(len(resultSets), 3,
+                         "Error: Wrong number of ResultSets returned.")
+
+        results = []
+        for resultSet in resultSets:
+            results.extend(resultSet.fetchall())
+
+        self.assertEqual(len(results), 1201,
+                         "Error: Wrong number of rows returned.")
+        results = [tuple(x) for x in results]
+        results.sort()
+        for i in range(1201):
+            self.assertEqual(results[i], (i, i * 2, str(i * 3)),
+                             "Error: Wrong row returned.")
+
+        # Duplicate binds still return one row per bind.
+        resultSets = myThread.dbi.processData(selectSQL, [{"one": 5}, {"one": 5}])
+        self.assertEqual(len(resultSets[0].fetchall()), 2,
+                         "Error: Wrong number of rows returned.")
+        return
+
     def testInsertHugeNumber(self):
         """
         _testInsertHugeNumber_
@@ -14,9 +14,13 @@ import logging
 import unittest
 import os
 import threading
+import time
+
+from nose.plugins.attrib import attr
 
 from WMCore.Database.DBFactory import DBFactory
 from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.Database.ResultSet import ResultSet
 from WMCore.Database.Transaction import Transaction
 from WMQuality.TestInit import TestInit
 
@@ -97,7 +101,131 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         output = dbformatter.formatOneDict(result)
         self.assertEqual( output,  {'bind2': 'value2a', 'bind1': 'value1a'} )
 
-            
+    def testFormatDictStream(self):
+        """
+        _testFormatDictStream_
+
+        Verify that streaming the results of a select returns the same rows as
+        formatDict, whatever the fetch size.
+        """
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        goldenOutput = [{'bind2': 'value2a', 'bind1': 'value1a'},
+                        {'bind2': 'value2b', 'bind1': 'value1b'},
+                        {'bind2': 'value2d', 'bind1': 'value1c'}]
+
+        for size in [1, 2, 1000]:
+            batches = myThread.dbi.processDataStream(myThread.select, size = size)
+            output = list(dbformatter.formatDictStream(batches))
+            self.assertEqual(output, goldenOutput)
+
+        batches = myThread.dbi.processDataStream("select * from test where bind1 = :bind1",
+                                                 [{'bind1': 'value1c'}, {'bind1': 'value1a'}])
+        output = list(dbformatter.formatDictStream(batches))
+        self.assertEqual(output, [{'bind2': 'value2d', 'bind1': 'value1c'},
+                                  {'bind2': 'value2a', 'bind1': 'value1a'}])
+        return
+
+
+    def testFormatNamedTuple(self):
+        """
+        _testFormatNamedTuple_
+
+        Verify that rows can be formatted as named tuples.
+        """
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        result = myThread.dbi.processData(myThread.select)
+        output = dbformatter.formatNamedTuple(result)
+        self.assertEqual(len(output), 3)
+        self.assertEqual(output[0].bind1, 'value1a')
+        self.assertEqual(output[0].bind2, 'value2a')
+        self.assertEqual(output[2], ('value1c', 'value2d'))
+        return
+
+class DBFormatterBenchmark(unittest.TestCase):
+    """
+    _DBFormatterBenchmark_
+
+    Compare the time it takes to format a large result with the original
+    per cell formatDict loop, formatDict and formatNamedTuple.  This doesn't
+    need a database, the ResultSet is filled in by hand.
+    """
+    def makeResultSet(self, nRows = 100000):
+        """
+        _makeResultSet_
+
+        Create a ResultSet with nRows rows of ten columns, half of them
+        unicode strings.
+        """
+        result = ResultSet()
+        result.keys = ["ID", "CACHE_DIR", "TYPE", "RETRY_COUNT", "WORKFLOW",
+                       "STATE", "OUTCOME", "LOCATION", "FWJR_PATH", "PRIORITY"]
+        for i in range(nRows):
+            result.data.append((i, u"/data/JobCache/%d" % i, u"Processing", 0,
+                                u"SomeWorkflow", u"created", 1, None,
+                                u"/data/JobCache/%d/Report.0.pkl" % i, 10))
+        return result
+
+    def formatDictPerCell(self, result):
+        """
+        _formatDictPerCell_
+
+        The formatDict implementation that looks up and lower cases the column
+        name for every cell.
+        """
+        dictOut = []
+        for r in result:
+            descriptions = r.keys
+            for i in r.fetchall():
+                entry = {}
+                for index in xrange(0,len(descriptions)):
+                    if type(i[index]) == unicode:
+                        entry[str(descriptions[index].lower())] = str(i[index])
+                    else:
+                        entry[str(descriptions[index].lower())] = i[index]
+
+                dictOut.append(entry)
+
+            r.close()
+
+        return dictOut
+
+    @attr('performance')
+    def testFormattingBenchmark(self):
+        """
+        _testFormattingBenchmark_
+
+        Time the different ways of formatting a result and verify that they
+        return the same thing.
+        """
+        dbformatter = DBFormatter(logging.getLogger(), None)
+        result = [self.makeResultSet()]
+
+        startTime = time.time()
+        perCellOutput = self.formatDictPerCell(result)
+        perCellTime = time.time() - startTime
+
+        startTime = time.time()
+        dictOutput = dbformatter.formatDict(result)
+        dictTime = time.time() - startTime
+
+        startTime = time.time()
+        tupleOutput = dbformatter.formatNamedTuple(result)
+        tupleTime = time.time() - startTime
+
+        print "\nformatDict per cell: %.3fs, formatDict: %.3fs, formatNamedTuple: %.3fs" % \
+              (perCellTime, dictTime, tupleTime)
+
+        self.assertEqual(perCellOutput, dictOutput)
+        self.assertEqual(len(tupleOutput), len(dictOutput))
+        for (row, entry) in zip(tupleOutput, dictOutput):
+            self.assertEqual(row._asdict(), entry)
+            self.assertEqual(type(row.cache_dir), str)
+        return
+
 if __name__ == "__main__":
     unittest.main()     
              
@@ -122,5 +122,31 @@ class DBCoreTest(unittest.TestCase):
 
         return    
 
+    def testBindSubstitutionCache(self):
+        """
+        _testBindSubstitutionCache_
+
+        Verify that the parsed SQL is reused for the same query and bind
+        variables but not for different bind variables.
+        """
+        sql = "SELECT id FROM wmbs_file_details WHERE lfn = :lfn OR size = :size"
+
+        myInterface = MySQLInterface(logger = logging, engine = None)
+        (updatedSQL, bindList) = myInterface.substitute(sql, [{"lfn": "/a", "size": 1}])
+        self.assertEqual(updatedSQL, "SELECT id FROM wmbs_file_details WHERE lfn = %s OR size = %s")
+        self.assertEqual(bindList, [("/a", 1)])
+        self.assertEqual(len(myInterface.substituteCache), 1)
+
+        (updatedSQL, bindList) = myInterface.substitute(sql, [{"size": 2, "lfn": "/b"},
+                                                              {"size": 3, "lfn": "/c"}])
+        self.assertEqual(updatedSQL, "SELECT id FROM wmbs_file_details WHERE lfn = %s OR size = %s")
+        self.assertEqual(bindList, [("/b", 2), ("/c", 3)])
+        self.assertEqual(len(myInterface.substituteCache), 1)
+
+        (updatedSQL, bindList) = myInterface.substitute(sql, {"lfn": "/d", "size": 4, "id": 5})
+        self.assertEqual(bindList, [("/d", 4)])
+        self.assertEqual(len(myInterface.substituteCache), 2)
+        return
+
 if __name__ == "__main__":
     unittest.main()     
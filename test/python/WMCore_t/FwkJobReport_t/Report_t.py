@@ -9,13 +9,16 @@ import unittest
 import os
 import xml.dom.minidom
 import time
+import cPickle
+
+from nose.plugins.attrib import attr
 
 import WMCore.WMBase
 import WMCore.Algorithms.BasicAlgos as BasicAlgos
 from WMCore.Database.CMSCouch import CouchServer
 from WMQuality.TestInitCouchApp import TestInitCouchApp
 
-from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.Report import Report, loadReportSummary
 from WMCore.WMSpec.Steps.WMExecutionFailure import WMExecutionFailure
 
 class ReportTest(unittest.TestCase):
@@ -670,7 +673,7 @@ cms::Exception caught in EventProcessor and rethrown
 
         myReport.save(path1)
         info = BasicAlgos.getFileInfo(filename = path1)
-        self.assertEqual(info['Size'], 6821)
+        self.assertEqual(info['Size'], 4091)
 
         inputFiles = myReport.getAllInputFiles()
         self.assertEqual(len(inputFiles), 1)
@@ -679,7 +682,7 @@ cms::Exception caught in EventProcessor and rethrown
 
         myReport.save(path2)
         info = BasicAlgos.getFileInfo(filename = path2)
-        self.assertEqual(info['Size'], 5933)
+        self.assertEqual(info['Size'], 3462)
 
         return
 
@@ -706,6 +709,102 @@ cms::Exception caught in EventProcessor and rethrown
         self.assertEqual(report.data.cmsRun1.testVar, 'test01')
         
         return
+
+    def testPersistSummary(self):
+        """
+        _testPersistSummary_
+
+        Verify that a persisted report can be loaded back in full or as a
+        summary, and that reports in the old plain pickle format can still
+        be loaded.
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(self.xmlPath)
+        myReport.addStep("logArch1")
+        myReport.setTaskName("/TestWorkload/ReReco")
+        myReport.setJobID(5)
+
+        reportPath = os.path.join(self.testDir, "Report.0.pkl")
+        myReport.persist(reportPath, summary = True)
+
+        newReport = Report()
+        newReport.unpersist(reportPath)
+        self.assertEqual(newReport.listSteps(), ["cmsRun1", "logArch1"])
+        self.assertEqual(len(newReport.getAllFiles()), len(myReport.getAllFiles()))
+        self.assertEqual(newReport.getExitCode(), myReport.getExitCode())
+
+        summary = loadReportSummary(reportPath)
+        self.assertEqual(summary["steps"], ["cmsRun1", "logArch1"])
+        self.assertEqual(summary["task"], "/TestWorkload/ReReco")
+        self.assertEqual(summary["jobID"], 5)
+        self.assertEqual(summary["exitCode"], myReport.getExitCode())
+        self.assertEqual(summary["taskSuccessful"], myReport.taskSuccessful())
+        self.assertEqual([x["lfn"] for x in summary["files"]["cmsRun1"]],
+                         [x["lfn"] for x in myReport.getAllFilesFromStep("cmsRun1")])
+        self.assertEqual(summary["files"]["logArch1"], [])
+        self.assertEqual(summary["times"], myReport.getFirstStartLastStop())
+
+        # Reports persisted without a summary are summarized on load
+        stepPath = os.path.join(self.testDir, "Report.pkl")
+        myReport.persist(stepPath)
+        self.assertEqual(loadReportSummary(stepPath), summary)
+
+        oldPath = os.path.join(self.testDir, "OldReport.0.pkl")
+        handle = open(oldPath, "w")
+        cPickle.dump(myReport.data, handle)
+        handle.close()
+
+        oldReport = Report()
+        oldReport.unpersist(oldPath)
+        self.assertEqual(oldReport.listSteps(), ["cmsRun1", "logArch1"])
+        self.assertEqual(loadReportSummary(oldPath)["steps"], ["cmsRun1", "logArch1"])
+        return
+
+    @attr('performance')
+    def testPersistPerformance(self):
+        """
+        _testPersistPerformance_
+
+        Compare the time it takes to load a multi-step report saved in the
+        old plain pickle format, in the current format and as a summary.
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(self.xmlPath)
+        perfReport = Report("cmsRun2")
+        perfReport.parse(os.path.join(WMCore.WMBase.getTestBase(),
+                                      "WMCore_t/FwkJobReport_t/PerformanceReport.xml"))
+        myReport.setStep("cmsRun2", perfReport.retrieveStep("cmsRun2"))
+        myReport.addStep("stageOut1")
+        myReport.addStep("logArch1")
+
+        oldPath = os.path.join(self.testDir, "OldReport.0.pkl")
+        handle = open(oldPath, "w")
+        cPickle.dump(myReport.data, handle)
+        handle.close()
+        newPath = os.path.join(self.testDir, "Report.0.pkl")
+        myReport.persist(newPath, summary = True)
+
+        nLoads = 1000
+        startTime = time.time()
+        for i in range(nLoads):
+            Report().unpersist(oldPath)
+        oldTime = time.time() - startTime
+
+        startTime = time.time()
+        for i in range(nLoads):
+            Report().unpersist(newPath)
+        newTime = time.time() - startTime
+
+        startTime = time.time()
+        for i in range(nLoads):
+            loadReportSummary(newPath)
+        summaryTime = time.time() - startTime
+
+        print("Loaded %i reports: old format %f seconds, new format %f seconds, summary %f seconds" \
+              % (nLoads, oldTime, newTime, summaryTime))
+        print("Report size: old format %i bytes, new format %i bytes" \
+              % (os.path.getsize(oldPath), os.path.getsize(newPath)))
+        return
     
 if __name__ == "__main__":
     unittest.main()
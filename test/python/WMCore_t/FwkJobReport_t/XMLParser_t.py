@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Regression tests for the streaming FWJR XML parser.  Every report is parsed
+with both the streaming parser and the parser that builds the whole Node
+structure first, and the resulting reports have to be identical.
+"""
+
+import os
+import glob
+import shutil
+import tempfile
+import unittest
+
+import WMCore.WMBase
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.XMLParser import xmlToJobReport, nodeXmlToJobReport
+
+class XMLParserTest(unittest.TestCase):
+    """
+    _XMLParserTest_
+
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        """
+        self.testDir = tempfile.mkdtemp()
+        self.reportDir = os.path.join(WMCore.WMBase.getTestBase(),
+                                      "WMCore_t/FwkJobReport_t")
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        """
+        shutil.rmtree(self.testDir)
+        return
+
+    def compareParsers(self, xmlPath):
+        """
+        _compareParsers_
+
+        Parse a report with both parsers and verify that they produce the
+        same report, or fail in the same way.
+        """
+        streamReport = Report("cmsRun1")
+        nodeReport = Report("cmsRun1")
+
+        streamError = None
+        try:
+            xmlToJobReport(streamReport, xmlPath)
+        except Exception, ex:
+            streamError = str(ex)
+
+        nodeError = None
+        try:
+            nodeXmlToJobReport(nodeReport, xmlPath)
+        except Exception, ex:
+            nodeError = str(ex)
+
+        self.assertEqual(streamError, nodeError)
+        self.assertEqual(str(streamReport.data), str(nodeReport.data),
+                         "Error: reports differ for %s" % xmlPath)
+        return streamReport
+
+    def testCMSSWReports(self):
+        """
+        _testCMSSWReports_
+
+        Compare the parsers on all the CMSSW reports used by the tests,
+        including the truncated one.
+        """
+        xmlPaths = glob.glob(os.path.join(self.reportDir, "*.xml"))
+        self.assertTrue(len(xmlPaths) > 0)
+        for xmlPath in xmlPaths:
+            self.compareParsers(xmlPath)
+
+        report = self.compareParsers(os.path.join(self.reportDir, "CMSSWProcessingReport.xml"))
+        self.assertEqual(len(report.getAllFiles()), 2)
+        self.assertEqual(len(report.getAllInputFiles()), 1)
+        return
+
+    def testLargeReport(self):
+        """
+        _testLargeReport_
+
+        Compare the parsers on a report with many input files and long lumi
+        lists.
+        """
+        xmlPath = os.path.join(self.testDir, "LargeReport.xml")
+        handle = open(xmlPath, "w")
+        handle.write("<FrameworkJobReport>\n")
+        for i in range(200):
+            handle.write("<InputFile>\n")
+            handle.write("<State  Value=\"closed\"/>\n")
+            handle.write("<LFN>/store/data/Run2011A/MinimumBias/RAW/v1/%i.root</LFN>\n" % i)
+            handle.write("<PFN>/some/pfn/%i.root</PFN>\n" % i)
+            handle.write("<Catalog></Catalog>\n")
+            handle.write("<ModuleLabel>source</ModuleLabel>\n")
+            handle.write("<GUID>%i</GUID>\n" % i)
+            handle.write("<Branches>\n</Branches>\n")
+            handle.write("<InputType>primaryFiles</InputType>\n")
+            handle.write("<InputSourceClass>PoolSource</InputSourceClass>\n")
+            handle.write("<EventsRead>100</EventsRead>\n")
+            handle.write("<Runs>\n<Run ID=\"%i\">\n" % (160000 + i))
+            for lumi in range(500):
+                handle.write("<LumiSection ID=\"%i\"/>\n" % lumi)
+            handle.write("</Run>\n</Runs>\n")
+            handle.write("</InputFile>\n")
+        handle.write("<File>\n")
+        handle.write("<LFN>/store/data/Run2011A/MinimumBias/RECO/v1/0.root</LFN>\n")
+        handle.write("<PFN>output.root</PFN>\n")
+        handle.write("<Catalog></Catalog>\n")
+        handle.write("<ModuleLabel>outputRECO</ModuleLabel>\n")
+        handle.write("<OutputModuleClass>PoolOutputModule</OutputModuleClass>\n")
+        handle.write("<GUID>ABCD</GUID>\n")
+        handle.write("<TotalEvents>20000</TotalEvents>\n")
+        handle.write("<BranchHash>1234</BranchHash>\n")
+        handle.write("<Branches>\n<Branch>someBranch</Branch>\n</Branches>\n")
+        handle.write("<Inputs>\n<Input>\n<LFN>/store/data/Run2011A/MinimumBias/RAW/v1/0.root</LFN>\n")
+        handle.write("<PFN>/some/pfn/0.root</PFN>\n</Input>\n</Inputs>\n")
+        handle.write("<Runs>\n")
+        for i in range(200):
+            handle.write("<Run ID=\"%i\">\n" % (160000 + i))
+            for lumi in range(500):
+                handle.write("<LumiSection ID=\"%i\"/>\n" % lumi)
+            handle.write("</Run>\n")
+        handle.write("</Runs>\n")
+        handle.write("</File>\n")
+        handle.write("</FrameworkJobReport>\n")
+        handle.close()
+
+        report = self.compareParsers(xmlPath)
+        self.assertEqual(len(report.getAllInputFiles()), 200)
+        outputFiles = report.getAllFiles()
+        self.assertEqual(len(outputFiles), 1)
+        self.assertEqual(len(outputFiles[0]["runs"]), 200)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,7 @@ import threading
 import time
 import urllib
 import types
+import cPickle
 
 from WMQuality.TestInitCouchApp import TestInitCouchApp
 
@@ -667,6 +668,17 @@ class TestChangeState(unittest.TestCase):
                          "Error: Wrong exit code.")
         return
 
+    def testDashboardTransitionsNoBulk(self):
+        """
+        _testDashboardTransitionsNoBulk_
+
+        Run the dashboard transitions test with one view query and one update
+        per transition instead of the bulk couch requests.
+        """
+        self.config.JobStateMachine.couchBulkTransitions = False
+        self.testDashboardTransitions()
+        return
+
 
     def testJobKilling(self):
         """
@@ -813,6 +825,333 @@ class TestChangeState(unittest.TestCase):
 
 
         return
-    
+
+    def testBulkTransitions(self):
+        """
+        _testBulkTransitions_
+
+        Verify that state transitions recorded through the bulk docs API end
+        up in couch in the same form as those recorded by the per document
+        update handler, including when the transitions span several chunks.
+        """
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", seName = "somese.cern.ch")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = "Test")
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+
+        for i in range(5):
+            newFile = File(lfn = "File%s" % i, locations = set(["somese.cern.ch"]))
+            newFile.create()
+            testFileset.addFile(newFile)
+
+        testFileset.commit()
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow,
+                                        split_algo = "FileBased")
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+
+        self.assertEqual(len(jobGroup.jobs), 5,
+                         "Error: Splitting should have created five jobs.")
+
+        for testJob in jobGroup.jobs:
+            testJob["user"] = "sfoulkes"
+            testJob["group"] = "DMWM"
+            testJob["taskType"] = "Processing"
+
+        self.config.JobStateMachine.couchBulkChunkSize = 2
+        bulkChange = ChangeState(self.config, "changestate_t")
+        self.config.JobStateMachine.couchBulkTransitions = False
+        singleChange = ChangeState(self.config, "changestate_t")
+
+        bulkChange.propagate(jobGroup.jobs, "created", "new")
+        bulkChange.propagate(jobGroup.jobs, "executing", "created")
+        singleChange.propagate(jobGroup.jobs, "complete", "executing")
+        bulkChange.propagate(jobGroup.jobs, "success", "complete")
+
+        goldenStates = [("new", "created"), ("created", "executing"),
+                        ("executing", "complete"), ("complete", "success")]
+        for testJob in jobGroup.jobs:
+            jobDoc = bulkChange.jobsdatabase.document(testJob["couch_record"])
+            self.assertEqual(len(jobDoc["states"]), 4,
+                             "Error: Wrong number of transitions.")
+
+            for index in range(4):
+                transition = jobDoc["states"][str(index)]
+                self.assertEqual((transition["oldstate"], transition["newstate"]),
+                                 goldenStates[index],
+                                 "Error: Wrong transition: %s" % transition)
+                self.assertTrue(type(transition["timestamp"]) in (types.IntType,
+                                                                 types.LongType))
+                self.assertEqual(transition["location"], "Agent",
+                                 "Error: Wrong location.")
+
+        return
+
+    def testWriteBehind(self):
+        """
+        _testWriteBehind_
+
+        Verify that in write behind mode the couch documents are only written
+        to couch once the journal is flushed.
+        """
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", seName = "somese.cern.ch")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = "Test")
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+
+        testFile = File(lfn = "SomeLFNC", locations = set(["somese.cern.ch"]))
+        testFile.create()
+        testFileset.addFile(testFile)
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow)
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+
+        testJobA = jobGroup.jobs[0]
+        testJobA["user"] = "sfoulkes"
+        testJobA["group"] = "DMWM"
+        testJobA["taskType"] = "Processing"
+
+        self.config.JobStateMachine.couchWriteBehind = True
+        self.config.JobStateMachine.journalDir = self.testInit.generateWorkDir()
+        self.config.JobStateMachine.journalFlushInterval = 3600
+        change = ChangeState(self.config, "changestate_t")
+
+        # Stop the journal thread so that we control when it's flushed.
+        change.journal.stop()
+        change.journal.join()
+
+        change.propagate([testJobA], "created", "new")
+        change.propagate([testJobA], "executing", "created")
+
+        stateDAO = self.daoFactory(classname = "Jobs.GetState")
+        self.assertEqual(stateDAO.execute(id = testJobA["id"]), "executing",
+                         "Error: Job didn't change state.")
+        self.assertFalse(change.jobsdatabase.documentExists(testJobA["couch_record"]),
+                         "Error: Job document should not be in couch yet.")
+        self.assertEqual(len(change.journal.pendingEntries()), 2,
+                         "Error: Wrong number of journal entries.")
+
+        change.journal.flush()
+
+        jobDoc = change.jobsdatabase.document(testJobA["couch_record"])
+        self.assertEqual(len(jobDoc["states"]), 2,
+                         "Error: Wrong number of transitions.")
+        self.assertEqual(jobDoc["states"]["1"]["newstate"], "executing",
+                         "Error: Wrong transition.")
+        return
+
+    def testWriteBehindCommit(self):
+        """
+        _testWriteBehindCommit_
+
+        Verify that in write behind mode transitions are only journaled once
+        the transaction commits, and that replaying a journal entry doesn't
+        record its transitions twice.
+        """
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", seName = "somese.cern.ch")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = "Test")
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+
+        testFile = File(lfn = "SomeLFNC", locations = set(["somese.cern.ch"]))
+        testFile.create()
+        testFileset.addFile(testFile)
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow)
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+        testJobA = jobGroup.jobs[0]
+
+        self.config.JobStateMachine.couchWriteBehind = True
+        self.config.JobStateMachine.journalDir = self.testInit.generateWorkDir()
+        self.config.JobStateMachine.journalFlushInterval = 3600
+        change = ChangeState(self.config, "changestate_t")
+        change.journal.stop()
+        change.journal.join()
+
+        change.propagate([testJobA], "created", "new")
+        change.journal.flush()
+
+        myThread = threading.currentThread()
+        myThread.transaction.begin()
+        change.propagate([testJobA], "executing", "created")
+        self.assertEqual(len(change.journal.pendingEntries()), 0,
+                         "Error: Transition journaled before the commit.")
+        myThread.transaction.rollback()
+        self.assertEqual(len(change.journal.pendingEntries()), 0,
+                         "Error: Rolled back transition was journaled.")
+
+        myThread.transaction.begin()
+        change.propagate([testJobA], "executing", "created")
+        myThread.transaction.commit()
+        self.assertEqual(len(change.journal.pendingEntries()), 1,
+                         "Error: Committed transition wasn't journaled.")
+
+        # Replay the same entry twice, as after a crash between the flush and
+        # the removal of the journal file.
+        entryPath = os.path.join(change.journal.journalDir,
+                                 change.journal.pendingEntries()[0])
+        entryData = open(entryPath, "rb").read()
+        change.journal.flush()
+        replayFile = open(entryPath, "wb")
+        replayFile.write(entryData)
+        replayFile.close()
+        change.journal.flush()
+
+        jobDoc = change.jobsdatabase.document(testJobA["couch_record"])
+        self.assertEqual(len(jobDoc["states"]), 2,
+                         "Error: Wrong number of transitions.")
+        self.assertEqual(jobDoc["states"]["1"]["newstate"], "executing",
+                         "Error: Wrong transition.")
+        return
+
+    def testWriteBehindRecovery(self):
+        """
+        _testWriteBehindRecovery_
+
+        Verify that a failure to write the journal fails the state change,
+        that a failure to activate the journal entry is raised from the
+        commit and that pending entries left behind by a crash are resolved
+        from the state of their jobs.
+        """
+        locationAction = self.daoFactory(classname = "Locations.New")
+        locationAction.execute("site1", seName = "somese.cern.ch")
+
+        testWorkflow = Workflow(spec = "spec.xml", owner = "Steve",
+                                name = "wf001", task = "Test")
+        testWorkflow.create()
+        testFileset = Fileset(name = "TestFileset")
+        testFileset.create()
+
+        testFile = File(lfn = "SomeLFNC", locations = set(["somese.cern.ch"]))
+        testFile.create()
+        testFileset.addFile(testFile)
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = testWorkflow)
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroup = jobFactory(files_per_job = 1)[0]
+        testJobA = jobGroup.jobs[0]
+
+        self.config.JobStateMachine.couchWriteBehind = True
+        self.config.JobStateMachine.journalDir = self.testInit.generateWorkDir()
+        self.config.JobStateMachine.journalFlushInterval = 3600
+        change = ChangeState(self.config, "changestate_t")
+        change.journal.stop()
+        change.journal.join()
+        getState = self.daoFactory(classname = "Jobs.GetState")
+
+        change.propagate([testJobA], "created", "new")
+        change.journal.flush()
+
+        def failingEnqueue(entry, pending = False):
+            raise IOError("No space left on device")
+        journal = change.journal
+        journal.enqueue, originalEnqueue = failingEnqueue, journal.enqueue
+
+        myThread = threading.currentThread()
+        myThread.transaction.begin()
+        self.assertRaises(IOError, change.propagate, [testJobA], "executing", "created")
+        myThread.transaction.rollback()
+        journal.enqueue = originalEnqueue
+        self.assertEqual(getState.execute(testJobA["id"]), "created",
+                         "Error: State changed without a journal entry.")
+
+        def failingActivate(entryName):
+            raise OSError("Read-only file system")
+        journal.activate, originalActivate = failingActivate, journal.activate
+
+        myThread.transaction.begin()
+        change.propagate([testJobA], "executing", "created")
+        self.assertRaises(OSError, myThread.transaction.commit)
+        journal.activate = originalActivate
+        self.assertEqual(getState.execute(testJobA["id"]), "executing",
+                         "Error: State change wasn't committed.")
+        self.assertEqual(journal.pendingEntries(), [],
+                         "Error: Entry activated.")
+
+        # The entry is left pending, as after a crash right after the commit
+        pendingNames = [x for x in os.listdir(journal.journalDir) if x.endswith(".pending")]
+        self.assertEqual(len(pendingNames), 1,
+                         "Error: Pending entry missing.")
+        pendingFile = open(os.path.join(journal.journalDir, pendingNames[0]), "rb")
+        entry = cPickle.load(pendingFile)
+        pendingFile.close()
+        self.assertTrue(change.resolveJournalEntry(entry),
+                        "Error: Committed transition should be replayed.")
+
+        entry["oldstate"] = "executing"
+        self.assertFalse(change.resolveJournalEntry(entry),
+                         "Error: Rolled back transition should be dropped.")
+        entry["jobids"] = [testJobA["id"] + 1000]
+        entry["oldstate"] = "none"
+        self.assertFalse(change.resolveJournalEntry(entry),
+                         "Error: Rolled back job creation should be dropped.")
+        return
+
+    def testTransitionErrors(self):
+        """
+        _testTransitionErrors_
+
+        Verify that without a journal a transition that can't be recorded
+        raises once all the other transitions have been tried.
+        """
+        class FailingDatabase:
+            name = "changestate_t%2Fjobs"
+            def __init__(self):
+                self.requests = []
+            def allDocs(self, options = {}, keys = []):
+                return {"rows": [{"key": x, "error": "not_found"} for x in keys]}
+            def makeRequest(self, uri, type, decode):
+                self.requests.append(uri)
+                raise RuntimeError("Couch is down")
+
+        change = ChangeState(self.config, "changestate_t")
+        database = FailingDatabase()
+        transitions = [("1", {"oldstate": "new", "newstate": "created",
+                              "location": "Agent", "timestamp": 1}),
+                       ("2", {"oldstate": "new", "newstate": "created",
+                              "location": "Agent", "timestamp": 1})]
+        self.assertRaises(RuntimeError, change.recordTransitionsInBulk,
+                          transitions, database)
+        self.assertEqual(len(database.requests), 2,
+                         "Error: Not all transitions were tried.")
+        return
+
 if __name__ == "__main__":
     unittest.main()
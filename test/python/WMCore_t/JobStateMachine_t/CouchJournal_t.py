@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+_CouchJournal_t_
+
+Unit tests for the couch write-behind journal.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from WMCore.JobStateMachine.CouchJournal import CouchJournal, getJournal
+
+class CouchJournalTest(unittest.TestCase):
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a scratch directory for the journal and a callback that keeps
+        track of everything that was flushed.
+        """
+        self.journalDir = tempfile.mkdtemp()
+        self.flushed = []
+        self.failFlush = False
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        Remove the scratch directory.
+        """
+        shutil.rmtree(self.journalDir)
+        return
+
+    def flushCallback(self, entries):
+        """
+        _flushCallback_
+
+        Record flushed entries, fail if asked to.
+        """
+        if self.failFlush:
+            raise Exception("Couch is down")
+
+        self.flushed.append(entries)
+        return
+
+    def testEnqueueFlush(self):
+        """
+        _testEnqueueFlush_
+
+        Verify that entries are flushed in the order they were enqueued, in
+        batches of at most maxEntries, and removed from disk afterwards.
+        """
+        journal = CouchJournal(self.journalDir, self.flushCallback, maxEntries = 2)
+
+        for i in range(5):
+            journal.enqueue({"jobs": [{"_id": str(i)}], "transitions": [],
+                             "fwjrs": []})
+
+        self.assertEqual(len(journal.pendingEntries()), 5,
+                         "Error: Wrong number of pending entries.")
+        self.assertEqual(journal.flush(), 5,
+                         "Error: Wrong number of entries flushed.")
+        self.assertEqual(len(journal.pendingEntries()), 0,
+                         "Error: Entries left in the journal.")
+
+        self.assertEqual([len(x) for x in self.flushed], [2, 2, 1],
+                         "Error: Entries not flushed in batches.")
+        flushedIDs = []
+        for batch in self.flushed:
+            for entry in batch:
+                flushedIDs.append(entry["jobs"][0]["_id"])
+        self.assertEqual(flushedIDs, ["0", "1", "2", "3", "4"],
+                         "Error: Entries flushed out of order.")
+        return
+
+    def testFailedFlush(self):
+        """
+        _testFailedFlush_
+
+        Verify that entries stay in the journal if the flush fails and that
+        they are replayed by a new journal on the same directory.
+        """
+        journal = CouchJournal(self.journalDir, self.flushCallback)
+        journal.enqueue({"jobs": [], "transitions": [("1", {"newstate": "created"})],
+                         "fwjrs": []})
+
+        self.failFlush = True
+        self.assertRaises(Exception, journal.flush)
+        self.assertEqual(len(journal.pendingEntries()), 1,
+                         "Error: Entry removed after a failed flush.")
+
+        self.failFlush = False
+        recoveredJournal = CouchJournal(self.journalDir, self.flushCallback)
+        self.assertEqual(recoveredJournal.flush(), 1,
+                         "Error: Entry was not replayed.")
+        self.assertEqual(self.flushed[0][0]["transitions"][0][0], "1",
+                         "Error: Wrong entry replayed.")
+        return
+
+    def testBackgroundFlush(self):
+        """
+        _testBackgroundFlush_
+
+        Verify that the journal thread flushes pending entries on start up and
+        when it is stopped.
+        """
+        journal = CouchJournal(self.journalDir, self.flushCallback)
+        journal.enqueue({"jobs": [{"_id": "1"}], "transitions": [], "fwjrs": []})
+
+        journal = getJournal(self.journalDir, self.flushCallback,
+                             flushInterval = 3600)
+        journal.enqueue({"jobs": [{"_id": "2"}], "transitions": [], "fwjrs": []})
+        self.assertTrue(getJournal(self.journalDir, self.flushCallback) is journal,
+                        "Error: Journal should be shared within a process.")
+
+        journal.stop()
+        journal.join(10)
+
+        self.assertFalse(journal.isAlive(), "Error: Journal thread didn't stop.")
+        self.assertEqual(len(journal.pendingEntries()), 0,
+                         "Error: Entries left in the journal.")
+        flushedIDs = []
+        for batch in self.flushed:
+            for entry in batch:
+                flushedIDs.append(entry["jobs"][0]["_id"])
+        self.assertEqual(flushedIDs, ["1", "2"],
+                         "Error: Wrong entries flushed.")
+        return
+
+    def testPendingEntries(self):
+        """
+        _testPendingEntries_
+
+        Verify that pending entries are only flushed once they are activated
+        and that discarded entries are never flushed.
+        """
+        journal = CouchJournal(self.journalDir, self.flushCallback)
+        entryA = journal.enqueue({"jobs": [{"_id": "A"}], "transitions": [],
+                                  "fwjrs": []}, pending = True)
+        entryB = journal.enqueue({"jobs": [{"_id": "B"}], "transitions": [],
+                                  "fwjrs": []}, pending = True)
+
+        self.assertEqual(journal.pendingEntries(), [],
+                         "Error: Pending entries should not be flushed.")
+        self.assertEqual(journal.flush(), 0,
+                         "Error: Pending entries were flushed.")
+
+        journal.activate(entryA)
+        journal.discard(entryB)
+        self.assertEqual(journal.flush(), 1,
+                         "Error: Activated entry was not flushed.")
+        self.assertEqual(self.flushed[0][0]["jobs"][0]["_id"], "A",
+                         "Error: Wrong entry flushed.")
+        self.assertEqual(os.listdir(self.journalDir), ["journal.lock"],
+                         "Error: Files left in the journal.")
+        return
+
+    def testOrphanedEntries(self):
+        """
+        _testOrphanedEntries_
+
+        Verify that pending entries of processes that died are resolved
+        through the resolvePending callback, and activated without one.
+        Pending entries of live processes are left alone.
+        """
+        deadProcess = subprocess.Popen(["true"])
+        deadProcess.wait()
+
+        journal = CouchJournal(self.journalDir, self.flushCallback,
+                               resolvePending = lambda x: x["committed"])
+        entryNames = []
+        for (name, committed) in [("A", True), ("B", False), ("C", True)]:
+            entryNames.append(journal.enqueue({"jobs": [{"_id": name}], "transitions": [],
+                                               "fwjrs": [], "committed": committed},
+                                              pending = True))
+
+        # A and B were written by a process that died, C is still in flight
+        for entryName in entryNames[:2]:
+            (entryTime, pid, sequence) = entryName.split("-")
+            os.rename(os.path.join(self.journalDir, "%s.pending" % entryName),
+                      os.path.join(self.journalDir, "%s-%d-%s.pending" % (entryTime, deadProcess.pid,
+                                                                          sequence)))
+
+        self.assertEqual(len(journal.orphanedEntries()), 2,
+                         "Error: Wrong number of orphaned entries.")
+        self.assertEqual(journal.flush(), 1,
+                         "Error: Wrong number of entries flushed.")
+        self.assertEqual(self.flushed[0][0]["jobs"][0]["_id"], "A",
+                         "Error: Wrong entry flushed.")
+        self.assertEqual(journal.orphanedEntries(), [],
+                         "Error: Orphaned entries left in the journal.")
+        self.assertTrue(os.path.exists(os.path.join(self.journalDir,
+                                                    "%s.pending" % entryNames[2])),
+                        "Error: Entry of a live process was resolved.")
+
+        journal.discard(entryNames[2])
+        entryName = journal.enqueue({"jobs": [{"_id": "D"}], "transitions": [],
+                                     "fwjrs": []}, pending = True)
+        (entryTime, pid, sequence) = entryName.split("-")
+        os.rename(os.path.join(self.journalDir, "%s.pending" % entryName),
+                  os.path.join(self.journalDir, "%s-%d-%s.pending" % (entryTime, deadProcess.pid,
+                                                                      sequence)))
+        recoveredJournal = CouchJournal(self.journalDir, self.flushCallback)
+        self.assertEqual(recoveredJournal.flush(), 1,
+                         "Error: Orphaned entry was not replayed.")
+        self.assertEqual(self.flushed[1][0]["jobs"][0]["_id"], "D",
+                         "Error: Wrong entry replayed.")
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -122,7 +122,41 @@ class ProcessPoolTest(unittest.TestCase):
             self.assertEqual(len(result), len(input),
                              "Error: Wrong number of results returned.")
 
+        return
+
+    def testD_IPCPickleBatches(self):
+        """
+        _testIPCPickleBatches_
 
+        Run a pool over IPC sockets with batched, pickled work and verify
+        that all of the work comes back, even when it is dequeued in pieces
+        that don't line up with the batches.
+        """
+        config = self.testInit.getConfiguration()
+        config.Agent.useHeartbeat = False
+        self.testInit.generateWorkDir(config)
+
+        processPool = ProcessPool("ProcessPool_t.ProcessPoolTestWorker",
+                                  totalSlaves = 2,
+                                  componentDir = config.General.workDir,
+                                  namespace = "WMCore_t",
+                                  config = config,
+                                  transport = 'ipc',
+                                  serializer = 'pickle',
+                                  batchSize = 7)
+
+        input = [{'id': i, 'lfn': "/some/file/%i" % i} for i in range(100)]
+        processPool.enqueue(input)
+
+        result = processPool.dequeue(10)
+        result.extend(processPool.dequeue(90))
+
+        self.assertEqual(len(result), len(input),
+                         "Error: Wrong number of results returned.")
+        self.assertEqual(sorted([x['id'] for x in result]), range(100))
+
+        processPool.close()
+        return
 
         
 
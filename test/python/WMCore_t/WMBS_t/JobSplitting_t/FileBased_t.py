@@ -336,9 +336,60 @@ class FileBasedTest(unittest.TestCase):
         for j in jobGroups[0].jobs: 
             for f in j['input_files']: 
                 self.assertEqual(len(f['parents']), 1) 
-                self.assertEqual(list(f['parents'])[0]['lfn'], '/parent/lfn/') 
-                
-        return 
+                self.assertEqual(list(f['parents'])[0]['lfn'], '/parent/lfn/')
+
+        return
+
+    def testGetParentsUnmerged(self):
+        """
+        _testGetParentsUnmerged_
+
+        Verify that the bulk parentage lookup walks up through unmerged
+        parents and grandparents to the first merged ancestor.
+        """
+        mergedFile = File('/merged/lfn/', size = 1000, events = 100,
+                          locations = set(["somese.cern.ch"]))
+        mergedFile.create()
+        grandParentFile = File('/unmerged/grandparent/lfn/', size = 1000,
+                               events = 100, merged = False,
+                               locations = set(["somese.cern.ch"]))
+        grandParentFile.create()
+        grandParentFile.addParent(lfn = mergedFile['lfn'])
+
+        testFileset = Fileset(name = "TestFileset4")
+        testFileset.create()
+        for i in range(10):
+            parentFile = File(makeUUID(), size = 1000, events = 100,
+                              merged = False, locations = set(["somese.cern.ch"]))
+            parentFile.create()
+            parentFile.addParent(lfn = grandParentFile['lfn'])
+
+            newFile = File(makeUUID(), size = 1000, events = 100,
+                           locations = set(["somese.cern.ch"]))
+            newFile.create()
+            newFile.addParent(lfn = parentFile['lfn'])
+            testFileset.addFile(newFile)
+        testFileset.commit()
+
+        testSubscription = Subscription(fileset = testFileset,
+                                        workflow = self.multipleFileSubscription["workflow"],
+                                        split_algo = "FileBased",
+                                        type = "Processing")
+        testSubscription.create()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package = "WMCore.WMBS",
+                              subscription = testSubscription)
+        jobGroups = jobFactory(files_per_job = 2, include_parents = True)
+
+        self.assertEqual(len(jobGroups), 1)
+        self.assertEqual(len(jobGroups[0].jobs), 5)
+        for job in jobGroups[0].jobs:
+            for f in job['input_files']:
+                self.assertEqual(len(f['parents']), 1)
+                self.assertEqual(list(f['parents'])[0]['lfn'], '/merged/lfn/')
+
+        return
 
 
 
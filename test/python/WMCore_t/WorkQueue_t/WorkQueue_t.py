@@ -8,8 +8,10 @@ WorkQueue tests
 import unittest
 import os
 import pickle
+import sys
 import threading
 import time
+import traceback
 
 from WMCore.Configuration import Configuration
 from WMCore.WorkQueue.WorkQueue import WorkQueue, globalQueue, localQueue
@@ -41,6 +43,7 @@ from WMCore.DataStructs.File import File as WMFile
 from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
 from WMCore.ResourceControl.ResourceControl import ResourceControl
 from WMCore.Lexicon import sanitizeURL
+from WMCore.WorkQueue.WorkQueueUtils import get_dbs, release_dbs
 
 
 rerecoArgs = getRerecoArgs()
@@ -365,6 +368,78 @@ class WorkQueueTest(WorkQueueTestCase):
         self.assertEqual(0, len(self.queue.getWork({'T2_XX_SiteA' : total})))
 
 
+    def testBlockFetchThreads(self):
+        """
+        Fetch blocks from the emulated DBS concurrently and serially, and
+        check that a failing fetch is re-raised with its traceback
+        """
+        wmspec = self.processingSpec
+        task = getFirstTask(wmspec)
+        blocks = ["%s#%i" % (self.dataset, i + 1) for i in range(10)]
+        work = [({'Inputs' : {}, 'ACDC' : None}, wmspec)]
+        for block in blocks:
+            work.append(({'Inputs' : {block : []}, 'ACDC' : None,
+                          'Dbs' : task.dbsUrl(), 'TaskName' : task.name()},
+                         wmspec))
+
+        fetchBlock = self.queue._getDBSBlock
+        fetches = []
+        def slowFetch(match, wmspec, dbs = None):
+            """Fetch blocks out of order, fail on request"""
+            blockName = match['Inputs'].keys()[0]
+            fetches.append((blockName, threading.currentThread(), dbs))
+            if blockName == failBlock:
+                raise RuntimeError("DBS is down")
+            time.sleep(0.1 * (len(blocks) - blocks.index(blockName)) / len(blocks))
+            return fetchBlock(match, wmspec, dbs)
+        self.queue._getDBSBlock = slowFetch
+        failBlock = None
+
+        # Blocks come back in order, the element without inputs first
+        self.queue.params['BlockFetchThreads'] = 3
+        results = list(self.queue._getDBSBlocks(work))
+        self.assertEqual([x[0] for x in results], [x[0] for x in work])
+        self.assertEqual(results[0][2:], (None, None))
+        self.assertEqual([x[2] for x in results[1:]], blocks)
+        for (match, wmspec, blockName, block) in results[1:]:
+            self.assertEqual(len(block['Files']), GlobalParams.numOfFilesPerBlock())
+
+        # Fetching threads take readers from the pool that nobody else uses
+        self.assertEqual(len(fetches), len(blocks))
+        self.assertFalse(threading.currentThread() in [x[1] for x in fetches])
+        readers = set([x[2] for x in fetches])
+        self.assertTrue(len(readers) <= 3)
+        self.assertFalse(get_dbs(task.dbsUrl()) in readers)
+        reader = get_dbs(task.dbsUrl(), exclusive = True)
+        self.assertTrue(reader in readers)
+        self.assertNotEqual(get_dbs(task.dbsUrl(), exclusive = True), reader)
+        release_dbs(task.dbsUrl(), reader)
+
+        # A single thread fetches serially in this thread
+        fetches = []
+        self.queue.params['BlockFetchThreads'] = 1
+        results = list(self.queue._getDBSBlocks(work))
+        self.assertEqual([x[2] for x in results[1:]], blocks)
+        self.assertEqual(set([x[1] for x in fetches]), set([threading.currentThread()]))
+
+        # A failed fetch is raised with its traceback, pending fetches are dropped
+        fetches = []
+        failBlock = blocks[1]
+        self.queue.params['BlockFetchThreads'] = 2
+        results = []
+        try:
+            for result in self.queue._getDBSBlocks(work):
+                results.append(result)
+            self.fail("The failed fetch wasn't raised")
+        except RuntimeError:
+            functions = [x[2] for x in traceback.extract_tb(sys.exc_info()[2])]
+            self.assertTrue('slowFetch' in functions)
+        self.assertEqual([x[2] for x in results[1:]], blocks[:len(results) - 1])
+        self.assertFalse(failBlock in [x[2] for x in results])
+        time.sleep(1)
+        self.assertTrue(len(fetches) < len(blocks))
+        return
+
     def testBlackList(self):
         """
         Black & White list functionality
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+_CycleStats_t_
+
+Tests for the per-cycle instrumentation of worker threads.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+
+from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
+from WMCore.WorkerThreads.CycleStats import CycleStats, startTimer, stopTimer
+from WMCore.WorkerThreads.CycleStats import currentStats, runWithStats
+
+class TimedWorker(BaseWorkerThread):
+    """
+    _TimedWorker_
+
+    Worker that pretends to talk to the database and to a web service.
+    """
+    def __init__(self, cycleTimes):
+        BaseWorkerThread.__init__(self)
+        self.cycleTimes = cycleTimes
+        return
+
+    def algorithm(self, parameters):
+        stats = startTimer("db")
+        time.sleep(0.05)
+        stopTimer(stats, "db")
+
+        stats = startTimer("http")
+        time.sleep(self.cycleTimes.pop(0))
+        stopTimer(stats, "http")
+
+        self.reportWork(10)
+        return
+
+def timedCall(category, duration):
+    """
+    _timedCall_
+
+    Pretend to make a call that takes duration seconds.
+    """
+    stats = startTimer(category)
+    time.sleep(duration)
+    stopTimer(stats, category)
+    return currentStats()
+
+class CycleStatsTest(unittest.TestCase):
+    """
+    _CycleStatsTest_
+
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        """
+        self.testDir = tempfile.mkdtemp()
+
+        myThread = threading.currentThread()
+        myThread.dbFactory = None
+        myThread.logger = logging.getLogger()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        """
+        shutil.rmtree(self.testDir)
+        return
+
+    def testA_Timers(self):
+        """
+        _Timers_
+
+        Verify that nested timers only count once and that timers do nothing
+        in threads that aren't instrumented.
+        """
+        self.assertEqual(startTimer("db"), None)
+        stopTimer(None, "db")
+
+        stats = CycleStats()
+        stats.start()
+        stats.startTimer("db")
+        stats.startTimer("db")
+        time.sleep(0.1)
+        stats.stopTimer("db")
+        stats.stopTimer("db")
+        stats.stopTimer("db")
+        stats.stop()
+
+        self.assertEqual(stats.getCalls("db"), 1)
+        self.assertEqual(stats.getCalls("http"), 0)
+        self.assertTrue(stats.getTime("db") >= 0.1)
+        self.assertTrue(stats.wallTime >= stats.getTime("db"))
+        self.assertEqual(stats.summary()["http_time"], 0.0)
+        return
+
+    def testB_RunCycle(self):
+        """
+        _RunCycle_
+
+        Verify that the worker records the stats of its cycles and keeps the
+        profiles of the slowest ones.
+        """
+        worker = TimedWorker([0.1, 0.3, 0.0, 0.2])
+        worker.componentDir = self.testDir
+        worker.profileCycles = 2
+
+        for i in range(4):
+            worker.runCycle(None)
+            self.assertEqual(getattr(threading.currentThread(), "cycleStats", None), None)
+
+        cycle = worker.lastCycle.summary()
+        self.assertEqual(cycle["cycle_items"], 10)
+        self.assertTrue(cycle["db_time"] >= 0.05)
+        self.assertTrue(cycle["http_time"] >= 0.2)
+        self.assertTrue(cycle["cycle_time"] >= cycle["db_time"] + cycle["http_time"])
+
+        profiles = os.listdir(os.path.join(self.testDir, "profiles"))
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(sorted([x[1] for x in worker.profiles]),
+                         sorted([os.path.join(self.testDir, "profiles", x) for x in profiles]))
+        self.assertTrue(min([x[0] for x in worker.profiles]) >= 0.2)
+        return
+
+    def testC_HelperThreads(self):
+        """
+        _HelperThreads_
+
+        Verify that helper threads started with runWithStats add their calls
+        to the stats of the cycle, concurrently with the cycle thread, and
+        that other threads don't.
+        """
+        stats = CycleStats()
+        threading.currentThread().cycleStats = stats
+        try:
+            stats.start()
+            helpers = [threading.Thread(target = runWithStats,
+                                        args = (currentStats(), timedCall, "db", 0.2))
+                       for i in range(2)]
+            helpers.append(threading.Thread(target = timedCall, args = ("db", 0.2)))
+            for helper in helpers:
+                helper.start()
+            timedCall("db", 0.2)
+            for helper in helpers:
+                helper.join()
+            stats.stop()
+        finally:
+            threading.currentThread().cycleStats = None
+
+        self.assertEqual(stats.getCalls("db"), 3)
+        self.assertTrue(stats.getTime("db") >= 0.6)
+        self.assertTrue(stats.wallTime < stats.getTime("db"))
+        self.assertEqual(runWithStats(stats, currentStats), stats)
+        self.assertEqual(currentStats(), None)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+_WakeupChannel_t_
+
+Tests for the wakeup channel and the adaptive scheduling of worker threads.
+"""
+
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+
+from WMCore.Configuration import Configuration
+from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
+from WMCore.WorkerThreads.WakeupChannel import WakeupChannel, wakeComponent
+
+class WakeupChannelTest(unittest.TestCase):
+    """
+    _WakeupChannelTest_
+
+    """
+    def setUp(self):
+        """
+        _setUp_
+
+        """
+        self.testDir = tempfile.mkdtemp()
+
+        self.config = Configuration()
+        self.config.section_("Agent")
+        self.config.Agent.componentName = "JobCreator"
+        self.config.component_("JobSubmitter")
+        self.config.JobSubmitter.componentDir = self.testDir
+
+        myThread = threading.currentThread()
+        myThread.dbFactory = None
+        myThread.logger = logging.getLogger()
+        return
+
+    def tearDown(self):
+        """
+        _tearDown_
+
+        """
+        shutil.rmtree(self.testDir)
+        return
+
+    def testA_WakeComponent(self):
+        """
+        _WakeComponent_
+
+        Verify that waking up a component notifies all of its listening
+        workers once, and that nothing breaks if nobody is listening.
+        """
+        self.assertEqual(wakeComponent(self.config, "JobSubmitter"), 0)
+        self.assertEqual(wakeComponent(self.config, "NotAComponent"), 0)
+
+        channelA = WakeupChannel(self.testDir, "WorkerA")
+        channelB = WakeupChannel(self.testDir, "WorkerB")
+        try:
+            self.assertFalse(channelA.wait(0))
+
+            self.assertEqual(wakeComponent(self.config, "JobSubmitter"), 2)
+            self.assertEqual(wakeComponent(self.config, "JobSubmitter"), 2)
+            self.assertTrue(channelA.wait(1))
+            self.assertTrue(channelB.wait(1))
+
+            # Both notifications were consumed by the first wait
+            self.assertFalse(channelA.wait(0))
+            self.assertFalse(channelB.wait(0))
+        finally:
+            channelA.close()
+            channelB.close()
+
+        self.assertEqual(wakeComponent(self.config, "JobSubmitter"), 0)
+        return
+
+    def testB_AdaptiveIdleTime(self):
+        """
+        _AdaptiveIdleTime_
+
+        Verify the backoff on empty cycles and the immediate rerun after full
+        cycles.
+        """
+        worker = BaseWorkerThread()
+        worker.idleTime = 10
+        worker.maxIdleTime = 60
+
+        worker.reportWork(0)
+        self.assertEqual(worker.nextIdleTime(), 10)
+
+        worker.adaptive = True
+        idleTimes = []
+        for i in range(5):
+            worker.reportWork(0)
+            idleTimes.append(worker.nextIdleTime())
+        self.assertEqual(idleTimes, [10, 20, 40, 60, 60])
+
+        worker.reportWork(100, full = True)
+        self.assertEqual(worker.nextIdleTime(), 0)
+        worker.reportWork(5)
+        self.assertEqual(worker.nextIdleTime(), 10)
+
+        # Cycles that don't report anything keep the regular interval
+        self.assertEqual(worker.nextIdleTime(), 10)
+        self.assertEqual(worker.nextIdleTime(), 10)
+        return
+
+    def testC_WakeupSleep(self):
+        """
+        _WakeupSleep_
+
+        Verify that an adaptive worker sleeping on its channel wakes up when
+        notified and goes back to the regular interval.
+        """
+        worker = BaseWorkerThread()
+        worker.idleTime = 1
+        worker.maxIdleTime = 60
+        worker.adaptive = True
+        worker.componentDir = self.testDir
+        worker.notifyTerminate = threading.Event()
+        worker.initWakeupChannel()
+        self.assertNotEqual(worker.wakeupChannel, None)
+
+        try:
+            for i in range(5):
+                worker.reportWork(0)
+                worker.nextIdleTime()
+            self.assertEqual(worker.currentIdleTime, 32)
+
+            timer = threading.Timer(0.5, wakeComponent,
+                                    [self.config, "JobSubmitter"])
+            timer.start()
+            startTime = time.time()
+            worker.sleep(30)
+            timer.join()
+            self.assertTrue(time.time() - startTime < 10)
+            self.assertEqual(worker.currentIdleTime, 1)
+        finally:
+            worker.wakeupChannel.close()
+
+        return
+
+if __name__ == "__main__":
+    unittest.main()